@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 import os
+import sys
+import tempfile
 from pathlib import Path
 import dj_database_url
 
@@ -53,14 +55,16 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    # Cloudinary
-    'cloudinary_storage',
-    'cloudinary',
     # Custom apps
     'store',
     'users',
 ]
 
+# Cloudinary - only when media is stored there (see below); the SDK pulls in
+# urllib3 and adds ~45ms to every worker boot
+if os.environ.get('CLOUDINARY_CLOUD_NAME'):
+    INSTALLED_APPS[6:6] = ['cloudinary_storage', 'cloudinary']
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # WhiteNoise for static files
@@ -68,6 +72,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'store.middleware.GuestCartMiddleware',  # Guest cart cookie (no session/DB rows for visitors)
+    'store.middleware.GuestWishlistMiddleware',  # Guest wishlist cookie, merged on login
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'store.middleware.ComingSoonMiddleware',  # Coming Soon page for non-superusers
@@ -99,13 +105,18 @@ WSGI_APPLICATION = 'boutique_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Persistent connections: every worker thread reuses its connection for DB_CONN_MAX_AGE
+# seconds, checked with a cheap query before reuse after an error (health checks).
+# Set DB_CONN_MAX_AGE=0 under the ASGI profile - there each request may run on a different thread.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '600'))
+
 # Use DATABASE_URL environment variable for production (PostgreSQL)
 # Falls back to SQLite for local development
 if os.environ.get('DATABASE_URL'):
     DATABASES = {
         'default': dj_database_url.config(
             default=os.environ.get('DATABASE_URL'),
-            conn_max_age=600,
+            conn_max_age=DB_CONN_MAX_AGE,
             conn_health_checks=True,
         )
     }
@@ -114,6 +125,8 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
         }
     }
 
@@ -166,6 +179,42 @@ if DEBUG:
 else:
     STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Static build (python manage.py build_static, run by `boot`) - see store/services/static_build.py
+# Output goes to static/dist; templates use it when it exists and STATIC_USE_BUILD is on.
+STATIC_USE_BUILD = os.environ.get('STATIC_USE_BUILD', str(not DEBUG)).lower() == 'true'
+STATIC_BUNDLES = {
+    'site.css': ['css/style.css'],
+    'site.js': [
+        'js/accessibility-toolbar.js',
+        'js/cart-sidebar.js',
+        'js/mobile-nav.js',
+        'js/footer-accordion.js',
+        'js/product-options-panel.js',
+        'js/live-search.js',
+    ],
+}
+# Classes/ids of the part of the page visible before scrolling (top bar, header, navigation)
+# - their rules are inlined in <head> and the rest of site.css loads without blocking
+CRITICAL_CSS_BUNDLE = 'site.css'
+CRITICAL_CSS_NAMES = [
+    'skip-link', 'visually-hidden', 'container', 'desktop-only', 'mobile-only', 'icon',
+    'accessibility-toolbar', 'accessibility-toggle', 'accessibility-icon', 'accessibility-panel',
+    'top-bar', 'top-bar-content', 'top-bar-spacer', 'welcome-text', 'social-links', 'social-link',
+    'social-icon-svg', 'sticky-header-wrapper', 'main-header', 'header-content', 'logo', 'logo-img',
+    'header-icons', 'icon-link', 'cart-link', 'cart-count', 'header-icon-svg', 'menu-toggle',
+    'menu-toggle-bar', 'search-container', 'search-box', 'search-input', 'search-button',
+    'search-icon-svg', 'main-nav', 'nav-menu', 'desktop-nav', 'nav-item', 'nav-link',
+    'hero-banner', 'hero-image', 'hero-content', 'hero-title', 'hero-subtitle',
+    'messages-container', 'message',
+]
+STATIC_SPRITE_SOURCES = ['images/*.svg', 'images/fontawesome/*.svg']
+# Heebo variable font (SIL OFL) - subset to Hebrew + Latin and served from /static
+HEEBO_FONT_SOURCE = BASE_DIR / 'assets' / 'fonts' / 'Heebo[wght].ttf'
+# build_static --fetch-fonts downloads the font only from a pinned google/fonts commit with a known sha256
+HEEBO_FONT_REVISION = os.environ.get('HEEBO_FONT_REVISION', '')
+HEEBO_FONT_SHA256 = os.environ.get('HEEBO_FONT_SHA256', '')
+HEEBO_FONT_URL = f'https://raw.githubusercontent.com/google/fonts/{HEEBO_FONT_REVISION}/ofl/heebo/Heebo%5Bwght%5D.ttf'
+
 
 # Media files (User uploaded files)
 # Use Cloudinary in production, local storage in development
@@ -189,10 +238,75 @@ else:
 AUTH_USER_MODEL = 'users.CustomUser'
 
 
+# Cache: an in-process LRU ('default') in front of a shared backend ('shared')
+# CACHE_SHARED: 'redis' (REDIS_URL, shared by all machines), 'file' (shared by the workers of one machine)
+# or 'locmem' (per process - the default for DEBUG/runserver, and always used by `manage.py test`)
+REDIS_URL = os.environ.get('REDIS_URL', '')
+CACHE_SHARED = os.environ.get('CACHE_SHARED', 'redis' if REDIS_URL else ('locmem' if DEBUG else 'file'))
+if len(sys.argv) > 1 and sys.argv[1] == 'test':
+    CACHE_SHARED = 'locmem'
+
+SHARED_CACHE_BACKENDS = {
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'arye_boutique_cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'store.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 2000,
+            # Upper bound on how long another worker may serve a value after it changed
+            'LOCAL_TIMEOUT': int(os.environ.get('CACHE_LOCAL_TIMEOUT', '30')),
+            # Per-user state must be consistent across workers - never kept in the local tier
+            'LOCAL_EXCLUDE': ['wishlist:', 'guest_cart:'],
+        },
+    },
+    'shared': {
+        **SHARED_CACHE_BACKENDS[CACHE_SHARED],
+        # Namespace for all keys; bump CACHE_VERSION to drop every cached value at once
+        'KEY_PREFIX': 'arye',
+        'VERSION': int(os.environ.get('CACHE_VERSION', '1')),
+        'TIMEOUT': 60 * 10,
+    },
+}
+
+
+# Guest cart storage: 'cookie' (signed cookie), 'cache' (needs a shared cache) or 'db'
+# עגלת אורח נשמרת במסד הנתונים רק בצ'קאאוט
+GUEST_CART_STORAGE = os.environ.get('GUEST_CART_STORAGE', 'cookie')
+
+# Conditional GET (ETag / Last-Modified) on product, category and blog pages and the catalog APIs
+# - see store/services/conditional.py. Off by default under DEBUG, where templates change without a deploy.
+# RELEASE_VERSION is part of every ETag, so a deploy (new templates/static) invalidates them all.
+CONDITIONAL_GET_ENABLED = os.environ.get('CONDITIONAL_GET_ENABLED', str(not DEBUG)).lower() == 'true'
+RELEASE_VERSION = os.environ.get('RELEASE_VERSION') or os.environ.get('RAILWAY_GIT_COMMIT_SHA', '')
+
+
 # Email Configuration (Resend API)
 RESEND_API_KEY = os.environ.get('RESEND_API_KEY', '')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'info@arye-boutique.co.il')
 CONTACT_EMAIL = os.environ.get('CONTACT_EMAIL', 'arye.boutique@gmail.com')
+SITE_URL = os.environ.get('SITE_URL', 'https://arye-boutique.co.il')
+
+# Newsletter broadcasts - Resend batch endpoint (up to 100 emails per request)
+NEWSLETTER_BATCH_SIZE = int(os.environ.get('NEWSLETTER_BATCH_SIZE', '100'))
+NEWSLETTER_RATE_LIMIT = float(os.environ.get('NEWSLETTER_RATE_LIMIT', '2'))  # batch requests per second
+
+# Bestseller ranking - sales lose half their weight every N days
+BESTSELLER_HALF_LIFE_DAYS = float(os.environ.get('BESTSELLER_HALF_LIFE_DAYS', '14'))
 
 
 # iCredit Payment Gateway Configuration
@@ -0,0 +1,51 @@
+"""
+Gunicorn production profile.
+
+Loaded automatically by `gunicorn boutique_project.wsgi` from the project root
+(and explicitly by the Procfile / railway.json start commands).
+Every value can be overridden from the environment without a deploy:
+
+    WEB_CONCURRENCY         worker processes (default: 2 * CPU + 1, capped at 8)
+    GUNICORN_THREADS        threads per worker (default: 4) - gthread workers only
+    GUNICORN_WORKER_CLASS   'gthread' (default), or 'uvicorn.workers.UvicornWorker'
+                            together with boutique_project.asgi:application for the ASGI profile
+    GUNICORN_MAX_REQUESTS   recycle a worker after N requests (default: 1000)
+    GUNICORN_TIMEOUT        seconds before a silent worker is killed (default: 30)
+
+Each gthread thread keeps its own persistent DB connection (DB_CONN_MAX_AGE in
+settings.py) and requests never open threads of their own, so the database must
+allow workers * threads connections.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# The site is mostly I/O bound (database, cache, external APIs): a few processes
+# per core plus threads inside each process keep the CPU busy while requests wait.
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+# Recycle workers periodically to contain slow memory growth; the jitter keeps
+# all workers from restarting at the same moment.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = max(max_requests // 10, 1)
+
+# Import Django once in the master and fork the workers from it: faster boot and
+# shared copy-on-write memory for the code.
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # Never share a database connection opened in the master (preload) between workers
+    from django.db import connections
+    connections.close_all()
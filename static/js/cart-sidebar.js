@@ -224,29 +224,52 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
-    // Update cart item quantity
-    function updateCartItemQuantity(itemId, newQuantity) {
-        const formData = new FormData();
-        formData.append('quantity', newQuantity);
-        
-        fetch(`/cart/update/${itemId}/`, {
+    // Send batched cart operations - the response holds only what changed plus the new totals
+    function mutateCart(ops) {
+        return fetch('/cart/mutate/', {
             method: 'POST',
             headers: {
+                'Content-Type': 'application/json',
                 'X-CSRFToken': getCookie('csrftoken')
             },
-            body: formData
+            body: JSON.stringify({ ops: ops })
         })
-        .then(response => response.json())
+        .then(response => response.json());
+    }
+    
+    // Apply a mutation delta to the rendered sidebar without refetching the whole cart
+    function applyCartDelta(data) {
+        data.updated.forEach(item => {
+            const input = document.querySelector(`.sidebar-quantity-input[data-item-id="${item.id}"]`);
+            if (input) {
+                input.value = item.quantity;
+            }
+        });
+        
+        data.removed.forEach(itemId => {
+            const element = document.querySelector(`.cart-sidebar-item[data-item-id="${itemId}"]`);
+            if (element) {
+                element.remove();
+            }
+        });
+        
+        document.getElementById('sidebar-cart-count').textContent = data.total_items;
+        
+        if (data.added.length > 0 || (data.total_items === 0 && data.removed.length > 0)) {
+            // New lines or an emptied cart change the layout - render the full list once
+            loadCartData();
+            return;
+        }
+        
+        updateCartSummary(data);
+    }
+    
+    // Update cart item quantity
+    function updateCartItemQuantity(itemId, newQuantity) {
+        mutateCart([{ op: 'set', item_id: parseInt(itemId), quantity: newQuantity }])
         .then(data => {
             if (data.success) {
-                // Update the input value
-                const input = document.querySelector(`.sidebar-quantity-input[data-item-id="${itemId}"]`);
-                if (input) {
-                    input.value = newQuantity;
-                }
-                
-                // Reload cart data to update totals
-                loadCartData();
+                applyCartDelta(data);
             } else {
                 showMessage(data.error || 'אירעה שגיאה בעדכון הכמות', 'error');
             }
@@ -263,18 +286,11 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
         
-        fetch(`/cart/remove/${itemId}/`, {
-            method: 'POST',
-            headers: {
-                'X-CSRFToken': getCookie('csrftoken')
-            }
-        })
-        .then(response => response.json())
+        mutateCart([{ op: 'remove', item_id: parseInt(itemId) }])
         .then(data => {
             if (data.success) {
-                showMessage(data.message, 'success');
-                // Reload cart data
-                loadCartData();
+                showMessage('המוצר הוסר מהעגלה', 'success');
+                applyCartDelta(data);
             } else {
                 showMessage(data.error || 'אירעה שגיאה בהסרת המוצר', 'error');
             }
@@ -366,6 +382,7 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Make function globally accessible for add to cart
     window.openCartSidebar = openCartSidebar;
+    window.mutateCart = mutateCart;
 });
 
 
@@ -2,15 +2,25 @@ from django.contrib import admin
 from django.urls import path, reverse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db.models import Sum
 from django.utils.html import format_html
+from django.http import StreamingHttpResponse
+from datetime import timedelta
 from .models import (
     SiteSettings, Category, Subcategory, Product, ProductImage, 
-    Order, OrderItem, Cart, CartItem, ContactMessage, WishlistItem, 
+    Order, OrderItem, Cart, CartItem, ContactMessage, WishlistItem, ProductRecommendation, ProductSalesScore,
     BelowBestsellersGallery, RetailerStore, InstagramGallery, AboutPageSettings,
     GalleriesHub, Size, SizeGroup, FabricType, ProductVariant, FAQ, BlogPost, BlogSection,
-    MaterialCareInfo, NewsletterSubscriber, Coupon
+    MaterialCareInfo, NewsletterSubscriber, NewsletterBroadcast, BroadcastDelivery, Coupon, CouponCampaign, CouponRedemption, SalesDashboard, DailySalesRollup,
+    ProductSalesRollup, CouponRedemptionRollup, RollupWatermark, cart_summary_aggregates
 )
-from .forms import BulkVariantCreationForm, ProductAdminForm
+from .forms import BulkVariantCreationForm, ProductAdminForm, PickListForm
+from .services.picking import get_pick_list, mark_orders_processing
+from .services.analytics import WATERMARK_NAME
+from .services.campaigns import create_campaign_coupons, stream_campaign_csv
+from .services.wishlist import invalidate_wishlists
 
 
 @admin.register(SiteSettings)
@@ -481,6 +491,56 @@ class OrderAdmin(admin.ModelAdmin):
             return format_html('<span style="color: #2e7d32;">-{}₪ ({})</span>', obj.discount_amount, obj.coupon_code)
         return '-'
     get_discount_display.short_description = 'הנחה'
+    
+    def get_urls(self):
+        """הוספת URL מותאם לרשימת ליקוט"""
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                'pick-list/',
+                self.admin_site.admin_view(self.pick_list_view),
+                name='store_order_pick_list',
+            ),
+        ]
+        return custom_urls + urls
+    
+    def pick_list_view(self, request):
+        """רשימת ליקוט להדפסה - כל ההזמנות ששולמו בחלון הזמן, ממוינות לפי מיקום במחסן"""
+        if request.method == 'POST':
+            form = PickListForm(request.POST)
+            generated_at = parse_datetime(request.POST.get('generated_at', ''))
+            if form.is_valid():
+                updated_count = mark_orders_processing(
+                    form.cleaned_data['date_from'],
+                    form.cleaned_data['date_to'],
+                    generated_at=generated_at,
+                )
+                messages.success(request, f'{updated_count} הזמנות סומנו כ"בליקוט"')
+                return redirect('admin:store_order_changelist')
+        elif 'date_from' in request.GET:
+            form = PickListForm(request.GET)
+        else:
+            now = timezone.localtime()
+            form = PickListForm(initial={
+                'date_from': now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1),
+                'date_to': now,
+            })
+        
+        pick_list = None
+        if form.is_bound and form.is_valid():
+            pick_list = get_pick_list(form.cleaned_data['date_from'], form.cleaned_data['date_to'])
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'form': form,
+            'pick_list': pick_list,
+            'total_units': sum(row['quantity'] for row in pick_list) if pick_list else 0,
+            'generated_at': timezone.now().isoformat(),
+            'opts': self.model._meta,
+            'title': 'רשימת ליקוט',
+        }
+        
+        return render(request, 'admin/store/pick_list.html', context)
 
 
 class CartItemInline(admin.TabularInline):
@@ -497,12 +557,27 @@ class CartAdmin(admin.ModelAdmin):
     """
     ניהול סלי קניות
     """
-    list_display = ['id', 'get_owner', 'total_items', 'total_price', 'created_at']
+    list_display = ['id', 'get_owner', 'get_total_items', 'get_total_price', 'created_at']
     list_filter = ['created_at']
     search_fields = ['user__username', 'session_key']
     readonly_fields = ['created_at', 'updated_at', 'total_price', 'total_items']
+    list_select_related = ['user']
     inlines = [CartItemInline]
     
+    def get_queryset(self, request):
+        """סיכומי הסלים מחושבים בשאילתת הרשימה עצמה (annotate)"""
+        return super().get_queryset(request).annotate(**cart_summary_aggregates('items__'))
+    
+    def get_total_items(self, obj):
+        return obj.total_items
+    get_total_items.short_description = 'כמות פריטים'
+    get_total_items.admin_order_field = 'summary_total_items'
+    
+    def get_total_price(self, obj):
+        return obj.total_price
+    get_total_price.short_description = 'סכום כולל'
+    get_total_price.admin_order_field = 'summary_total_price'
+    
     def get_owner(self, obj):
         """החזרת בעלים של הסל"""
         if obj.user:
@@ -597,6 +672,49 @@ class WishlistItemAdmin(admin.ModelAdmin):
             'fields': ('user', 'product', 'added_at')
         }),
     )
+    
+    # שינויים מהאדמין לא עוברים דרך שירות הרשימה - מחיקת הקבוצה השמורה של המשתמש
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_wishlists([obj.user_id] + ([form.initial['user']] if change and form.initial.get('user') else []))
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_wishlists([obj.user_id])
+    
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        invalidate_wishlists(user_ids)
+
+
+@admin.register(ProductRecommendation)
+class ProductRecommendationAdmin(admin.ModelAdmin):
+    """
+    מוצרים מומלצים - לקריאה בלבד (מחושב ע"י build_recommendations)
+    """
+    list_display = ['product', 'rank', 'recommended', 'score']
+    search_fields = ['product__name', 'recommended__name']
+    list_select_related = ['product', 'recommended']
+    readonly_fields = ['product', 'recommended', 'rank', 'score']
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ProductSalesScore)
+class ProductSalesScoreAdmin(admin.ModelAdmin):
+    """
+    ציוני מכירות לדירוג "הכי נמכרים" - לקריאה בלבד (מחושב ע"י refresh_bestsellers)
+    להצגה קבועה ב"הכי נמכרים" יש לסמן את המוצר כ"הכי נמכר" בעריכת המוצר
+    """
+    list_display = ['product', 'score', 'scored_at']
+    search_fields = ['product__name']
+    list_select_related = ['product']
+    readonly_fields = ['product', 'score', 'scored_at']
+    
+    def has_add_permission(self, request):
+        return False
 
 
 @admin.register(RetailerStore)
@@ -1068,13 +1186,41 @@ class NewsletterSubscriberAdmin(admin.ModelAdmin):
         return False
 
 
+class BroadcastDeliveryInline(admin.TabularInline):
+    """נמענים שהשליחה אליהם נכשלה"""
+    model = BroadcastDelivery
+    extra = 0
+    fields = ['subscriber', 'status', 'error', 'sent_at']
+    readonly_fields = ['subscriber', 'status', 'error', 'sent_at']
+    verbose_name_plural = 'שליחות שנכשלו'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(status='failed').select_related('subscriber')
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(NewsletterBroadcast)
+class NewsletterBroadcastAdmin(admin.ModelAdmin):
+    """
+    ניהול דיוורים לניוזלטר
+    השליחה עצמה: python manage.py send_newsletter_broadcast <id>
+    """
+    list_display = ['subject', 'status', 'recipients_total', 'sent_count', 'failed_count', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject']
+    readonly_fields = ['status', 'recipients_total', 'sent_count', 'failed_count', 'created_at', 'started_at', 'finished_at']
+    inlines = [BroadcastDeliveryInline]
+
+
 @admin.register(Coupon)
 class CouponAdmin(admin.ModelAdmin):
     """
     ניהול קופונים כלליים
     """
     list_display = ['code', 'discount_type', 'discount_value', 'times_used', 'max_uses', 'is_valid_display', 'is_active', 'valid_until']
-    list_filter = ['discount_type', 'is_active', 'valid_from', 'valid_until']
+    list_filter = ['discount_type', 'is_active', 'campaign', 'valid_from', 'valid_until']
     search_fields = ['code']
     list_editable = ['is_active']
     list_per_page = 50
@@ -1107,3 +1253,149 @@ class CouponAdmin(admin.ModelAdmin):
         return format_html('<span style="color: #c62828;">✗ לא תקף</span>')
     is_valid_display.short_description = 'סטטוס'
     is_valid_display.admin_order_field = 'is_active'
+
+
+@admin.register(CouponCampaign)
+class CouponCampaignAdmin(admin.ModelAdmin):
+    """
+    ניהול קמפייני קופונים - הקודים נוצרים בשמירה, והורדה כקובץ CSV
+    """
+    list_display = ['name', 'quantity', 'codes_generated', 'discount_type', 'discount_value', 'valid_until', 'csv_link']
+    search_fields = ['name', 'prefix']
+    readonly_fields = ['codes_generated', 'created_at']
+    
+    # מעל כמות זו הקודים נוצרים דרך generate_coupon_campaign ולא בבקשת האדמין
+    # (~2 שניות ב-SQLite - רחוק מה-timeout של gunicorn גם מול מסד נתונים ברשת)
+    ADMIN_GENERATION_LIMIT = 10_000
+    
+    fieldsets = (
+        ('פרטי קמפיין', {
+            'fields': ('name', 'prefix', 'code_length', 'quantity', 'codes_generated')
+        }),
+        ('הגדרות הנחה', {
+            'fields': ('discount_type', 'discount_value', 'minimum_order_amount')
+        }),
+        ('תקופת תוקף', {
+            'fields': ('valid_from', 'valid_until')
+        }),
+    )
+    
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                '<int:campaign_id>/csv/',
+                self.admin_site.admin_view(self.csv_view),
+                name='store_couponcampaign_csv',
+            ),
+        ]
+        return custom_urls + urls
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if obj.quantity - obj.codes_generated > self.ADMIN_GENERATION_LIMIT:
+            messages.warning(
+                request,
+                f'הקמפיין נשמר. ליצירת {obj.quantity} קודים הריצו: python manage.py generate_coupon_campaign {obj.pk}'
+            )
+            return
+        created = create_campaign_coupons(obj)
+        if created:
+            messages.success(request, f'נוצרו {created} קודי קופון לקמפיין')
+    
+    def csv_link(self, obj):
+        """קישור להורדת הקודים"""
+        url = reverse('admin:store_couponcampaign_csv', args=[obj.pk])
+        return format_html('<a href="{}">הורדת CSV</a>', url)
+    csv_link.short_description = 'קודים'
+    
+    def csv_view(self, request, campaign_id):
+        """הורדת קודי הקמפיין כ-CSV בהזרמה"""
+        campaign = get_object_or_404(CouponCampaign, pk=campaign_id)
+        response = StreamingHttpResponse(stream_campaign_csv(campaign), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="campaign-{campaign.pk}.csv"'
+        return response
+
+
+@admin.register(CouponRedemption)
+class CouponRedemptionAdmin(admin.ModelAdmin):
+    """
+    יומן מימושי קופונים - לקריאה בלבד
+    """
+    list_display = ['code', 'order', 'status', 'over_limit', 'discount_amount', 'reserved_at', 'expires_at', 'redeemed_at']
+    list_filter = ['status', 'over_limit', 'reserved_at']
+    search_fields = ['code', 'order__id']
+    list_select_related = ['order']
+    readonly_fields = [
+        'order', 'coupon', 'newsletter_subscriber', 'code', 'discount_amount', 'status',
+        'reserved_at', 'expires_at', 'redeemed_at', 'released_at', 'over_limit'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(SalesDashboard)
+class SalesDashboardAdmin(admin.ModelAdmin):
+    """
+    דשבורד מכירות - קורא רק מטבלאות הסיכום (ללא סריקת ההזמנות)
+    """
+    
+    def has_add_permission(self, request):
+        """לא ניתן להוסיף - זה רק דף תצוגה"""
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        """לא ניתן למחוק - זה רק דף תצוגה"""
+        return False
+    
+    def changelist_view(self, request, extra_context=None):
+        """תצוגה מותאמת אישית - סיכומי מכירות לטווח תאריכים"""
+        extra_context = extra_context or {}
+        
+        # טווח תאריכים - ברירת מחדל: החודש הנוכחי
+        today = timezone.localdate()
+        date_from = parse_date(request.GET.get('date_from', '')) or today.replace(day=1)
+        date_to = parse_date(request.GET.get('date_to', '')) or today
+        
+        daily = DailySalesRollup.objects.filter(date__range=(date_from, date_to))
+        products = ProductSalesRollup.objects.filter(date__range=(date_from, date_to))
+        coupons = CouponRedemptionRollup.objects.filter(date__range=(date_from, date_to))
+        
+        totals = daily.aggregate(
+            orders_count=Sum('orders_count'),
+            units=Sum('units'),
+            revenue=Sum('revenue'),
+            discount_total=Sum('discount_total'),
+        )
+        average_order_value = None
+        if totals['orders_count']:
+            average_order_value = totals['revenue'] / totals['orders_count']
+        
+        watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).first()
+        
+        extra_context.update({
+            **self.admin_site.each_context(request),
+            'title': 'דשבורד מכירות',
+            'opts': self.model._meta,
+            'date_from': date_from,
+            'date_to': date_to,
+            'totals': totals,
+            'average_order_value': average_order_value,
+            'daily': daily.order_by('date'),
+            'by_category': products.values('category__name').annotate(
+                units=Sum('units'), revenue=Sum('revenue')
+            ).order_by('-revenue'),
+            'by_product': products.values('product__name').annotate(
+                units=Sum('units'), revenue=Sum('revenue')
+            ).order_by('-units')[:10],
+            'by_variant': products.filter(variant__isnull=False).values(
+                'product__name', 'variant__fabric_type__name', 'variant__size__display_name'
+            ).annotate(units=Sum('units'), revenue=Sum('revenue')).order_by('-units')[:10],
+            'by_coupon': coupons.values('coupon_code').annotate(
+                redemptions=Sum('redemptions'), discount_total=Sum('discount_total')
+            ).order_by('-redemptions'),
+            'last_processed_at': watermark.last_processed_at if watermark else None,
+        })
+        
+        return render(request, 'admin/store/sales_dashboard.html', extra_context)
@@ -0,0 +1,298 @@
+"""
+Cache layer - שכבת cache דו-שלבית, מפתחות עם namespace וגרסה, והגנה מפני stampede
+
+TieredCache (ה-cache הראשי, 'default'):
+    LRU בזיכרון התהליך מול backend משותף ('shared' - Redis, קבצים, או LocMem בבדיקות).
+    קריאה חוזרת של אותו מפתח באותו worker לא יוצאת מהתהליך. העותק המקומי נשמר לכל
+    היותר LOCAL_TIMEOUT שניות - זה זמן ההשהיה המקסימלי עד ששינוי מ-worker אחר נראה.
+    מפתחות שחייבים להיות עקביים בין workers (רשימת משאלות, עגלת אורח) מוחרגים
+    מהשכבה המקומית ב-LOCAL_EXCLUDE.
+
+CacheNamespace:
+    קבוצת מפתחות עם גרסה משותפת - "facets:v3:c12:..." - ביטול כל הקבוצה הוא incr אחד
+    של הגרסה (המפתחות הישנים פשוט פגים). גרסה ראשונה היא חותמת זמן, כך שגם אם מפתח
+    הגרסה נמחק מה-cache המשותף לא חוזרים לגרסה ישנה.
+
+get_or_compute:
+    כשמפתח חסר רק קורא אחד מחשב אותו (lock בתהליך + cache.add בין תהליכים),
+    והשאר ממתינים לערך במקום להריץ את אותה שאילתה כבדה במקביל.
+"""
+import pickle
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+_MISSING = object()
+
+
+class LocalLRU:
+    """
+    מטמון LRU בזיכרון התהליך - thread-safe, עם תפוגה לכל ערך
+    הערכים נשמרים כ-pickle (כמו LocMemCache), כך ששינוי של אובייקט שהוחזר לא משנה את ה-cache
+    """
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, data = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+        return pickle.loads(data)
+    
+    def set(self, key, value, timeout):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, data)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TieredCache(BaseCache):
+    """
+    Cache backend דו-שלבי: LRU מקומי מול cache משותף
+    
+    OPTIONS:
+        SHARED: שם ה-cache המשותף ב-CACHES (ברירת מחדל 'shared')
+        LOCAL_MAX_ENTRIES: מספר הערכים המקסימלי ב-LRU המקומי
+        LOCAL_TIMEOUT: כמה שניות ערך נשמר מקומית (גם אם ב-cache המשותף הוא ארוך יותר)
+        LOCAL_EXCLUDE: תחיליות מפתחות שלא נשמרים מקומית
+    הקידומת (KEY_PREFIX) והגרסה (VERSION) נקבעות ב-cache המשותף.
+    """
+    
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local = LocalLRU(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 30)
+        self._local_exclude = tuple(options.get('LOCAL_EXCLUDE', ()))
+    
+    @cached_property
+    def shared(self):
+        return caches[self._shared_alias]
+    
+    def _local_key(self, key, version):
+        if key.startswith(self._local_exclude):
+            return None
+        return self.shared.make_and_validate_key(key, version=version)
+    
+    def _local_set(self, local_key, value, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.shared.default_timeout
+        if timeout is not None and timeout <= 0:
+            self._local.delete(local_key)
+            return
+        self._local.set(local_key, value, self._local_timeout if timeout is None else min(timeout, self._local_timeout))
+    
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        if local_key:
+            value = self._local.get(local_key)
+            if value is not _MISSING:
+                return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        if local_key:
+            self._local.set(local_key, value, self._local_timeout)
+        return value
+    
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        for key in keys:
+            local_key = self._local_key(key, version)
+            value = self._local.get(local_key) if local_key else _MISSING
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        if remote:
+            fetched = self.shared.get_many(remote, version=version)
+            for key, value in fetched.items():
+                local_key = self._local_key(key, version)
+                if local_key:
+                    self._local.set(local_key, value, self._local_timeout)
+            found.update(fetched)
+        return found
+    
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout=timeout, version=version)
+        local_key = self._local_key(key, version)
+        if local_key:
+            self._local_set(local_key, value, timeout)
+    
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            local_key = self._local_key(key, version)
+            if local_key and key not in failed:
+                self._local_set(local_key, value, timeout)
+        return failed
+    
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        local_key = self._local_key(key, version)
+        if local_key:
+            if added:
+                self._local_set(local_key, value, timeout)
+            else:
+                self._local.delete(local_key)
+        return added
+    
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout=timeout, version=version)
+    
+    def delete(self, key, version=None):
+        local_key = self._local_key(key, version)
+        if local_key:
+            self._local.delete(local_key)
+        return self.shared.delete(key, version=version)
+    
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            local_key = self._local_key(key, version)
+            if local_key:
+                self._local.delete(local_key)
+        self.shared.delete_many(keys, version=version)
+    
+    def has_key(self, key, version=None):
+        local_key = self._local_key(key, version)
+        if local_key and self._local.get(local_key) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+    
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        local_key = self._local_key(key, version)
+        if local_key:
+            self._local.set(local_key, value, self._local_timeout)
+        return value
+    
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+    
+    def clear(self):
+        self._local.clear()
+        self.shared.clear()
+    
+    def clear_local(self):
+        """ניקוי השכבה המקומית בלבד (בבדיקות / אחרי פריסה)"""
+        self._local.clear()
+
+
+# locks לפי מפתח בתוך התהליך - נמחקים אוטומטית כשאף thread לא מחזיק בהם
+_key_locks = weakref.WeakValueDictionary()
+_key_locks_guard = threading.Lock()
+
+
+def _key_lock(key):
+    with _key_locks_guard:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _key_locks[key] = lock
+        return lock
+
+
+def get_or_compute(key, compute, timeout=DEFAULT_TIMEOUT, lock_timeout=30, poll_interval=0.05):
+    """
+    הערך מה-cache, ואם חסר - מחושב פעם אחת בלבד גם כשהרבה בקשות מבקשות אותו יחד
+    
+    threads באותו תהליך ממתינים על lock מקומי; תהליכים אחרים רואים את מפתח הנעילה
+    (cache.add אטומי ב-backend המשותף) וממתינים שהערך יופיע. אם המחשב לא סיים תוך
+    lock_timeout שניות (למשל נפל) - הממתין מחשב בעצמו.
+    """
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+    
+    with _key_lock(key):
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        
+        lock_key = f'{key}:lock'
+        if not cache.add(lock_key, 1, lock_timeout):
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(poll_interval)
+                value = cache.get(key, _MISSING)
+                if value is not _MISSING:
+                    return value
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+
+class CacheNamespace:
+    """
+    קבוצת מפתחות cache עם שם וגרסה משותפת
+    
+    Args:
+        name: שם ה-namespace - תחילית כל המפתחות
+        timeout: זמן שמירה ברירת מחדל למפתחות
+        versioned: האם המפתחות כוללים גרסה (ואז invalidate מבטל את כולם)
+    """
+    
+    def __init__(self, name, timeout=DEFAULT_TIMEOUT, versioned=True):
+        self.name = name
+        self.timeout = timeout
+        self.versioned = versioned
+    
+    @property
+    def version_key(self):
+        return f'{self.name}:version'
+    
+    def version(self):
+        return cache.get_or_set(self.version_key, lambda: int(time.time()), None)
+    
+    def key(self, *parts):
+        prefix = f'{self.name}:v{self.version()}' if self.versioned else self.name
+        return ':'.join([prefix, *map(str, parts)])
+    
+    def get(self, *parts, default=None):
+        return cache.get(self.key(*parts), default)
+    
+    def set(self, parts, value, timeout=DEFAULT_TIMEOUT):
+        cache.set(self.key(*parts), value, self.timeout if timeout is DEFAULT_TIMEOUT else timeout)
+    
+    def delete(self, *parts):
+        cache.delete(self.key(*parts))
+    
+    def get_or_compute(self, parts, compute, timeout=DEFAULT_TIMEOUT):
+        """הערך של המפתח, מחושב פעם אחת בלבד כשחסר (ראו get_or_compute)"""
+        return get_or_compute(self.key(*parts), compute, self.timeout if timeout is DEFAULT_TIMEOUT else timeout)
+    
+    def invalidate(self):
+        """ביטול כל המפתחות של ה-namespace - העלאת הגרסה"""
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, int(time.time()), None)
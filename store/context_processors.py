@@ -1,4 +1,5 @@
-from .models import Cart, WishlistItem
+from .services.cart import get_cart
+from .services.wishlist import get_wishlist_ids
 
 
 def cart_items_count(request):
@@ -8,19 +9,8 @@ def cart_items_count(request):
     cart_count = 0
     
     try:
-        if request.user.is_authenticated:
-            # משתמש מחובר - חיפוש סל לפי משתמש
-            cart = Cart.objects.filter(user=request.user).first()
-        else:
-            # משתמש לא מחובר - חיפוש סל לפי session_key
-            session_key = request.session.session_key
-            if session_key:
-                cart = Cart.objects.filter(session_key=session_key, user__isnull=True).first()
-            else:
-                cart = None
-        
-        if cart:
-            cart_count = cart.total_items
+        # העגלה של הבקשה (נשמרת על ה-request) - לעגלת אורח ב-cookie אין גישה למסד הנתונים
+        cart_count = get_cart(request).total_items
     except:
         # במקרה של שגיאה, נחזיר 0
         pass
@@ -37,8 +27,8 @@ def wishlist_count(request):
     count = 0
     
     try:
-        if request.user.is_authenticated:
-            count = WishlistItem.objects.filter(user=request.user).count()
+        # קבוצת המוצרים השמורה (cache) - בלי שאילתת COUNT בכל עמוד
+        count = len(get_wishlist_ids(request))
     except:
         pass
     
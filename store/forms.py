@@ -292,3 +292,29 @@ class ProductAdminForm(forms.ModelForm):
                 return list(size_group.sizes.all())
         
         return []
+
+
+class PickListForm(forms.Form):
+    """
+    טופס הפקת רשימת ליקוט - חלון זמן של הזמנות ששולמו
+    """
+    date_from = forms.DateTimeField(
+        label='מתאריך',
+        widget=forms.DateTimeInput(attrs={'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'),
+        input_formats=['%Y-%m-%dT%H:%M'],
+    )
+    date_to = forms.DateTimeField(
+        label='עד תאריך',
+        widget=forms.DateTimeInput(attrs={'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'),
+        input_formats=['%Y-%m-%dT%H:%M'],
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get('date_from')
+        date_to = cleaned_data.get('date_to')
+        
+        if date_from and date_to and date_from >= date_to:
+            raise forms.ValidationError('תאריך ההתחלה חייב להיות לפני תאריך הסיום')
+        
+        return cleaned_data
@@ -0,0 +1,131 @@
+"""
+Management command to benchmark concurrent checkout (initiate_payment) throughput
+under the sync (WSGI) and async (ASGI) deployment profiles.
+
+A local stub of the iCredit API answers after a fixed latency, so the numbers show
+how many checkouts each profile keeps in flight while waiting on the payment gateway:
+    - sync: a fixed pool of blocking workers (like gunicorn sync workers), each
+      request holds a worker for the whole gateway round-trip
+    - async: one event loop (like a uvicorn worker) with all requests in flight at once
+Pending orders are created for the run and deleted at the end.
+"""
+import asyncio
+import contextlib
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from store.models import Order
+
+
+def _stub_handler(latency):
+    class StubICreditHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency)
+            body = json.dumps({'Status': 0, 'URL': 'https://example.com/pay'}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    return StubICreditHandler
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent checkout throughput of the sync (WSGI) and async (ASGI) profiles'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Checkouts per profile (default: 200)')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Blocking workers for the sync profile (default: 4)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Checkouts in flight at once (default: 50)',
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.2,
+            help='Simulated payment gateway latency in seconds (default: 0.2)',
+        )
+    
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _stub_handler(options['latency']))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        stub_url = f'http://127.0.0.1:{server.server_port}/GetUrl'
+        
+        orders = [
+            Order.objects.create(
+                guest_name='Benchmark Customer', guest_email='benchmark@example.com',
+                total_price=Decimal('100.00'), status='pending',
+            )
+            for _ in range(options['concurrency'])
+        ]
+        urls = [reverse('initiate_payment', args=[order.id]) for order in orders]
+        self.stdout.write(
+            f"{options['requests']} checkouts, gateway latency {options['latency'] * 1000:.0f}ms, "
+            f"concurrency {options['concurrency']}"
+        )
+        
+        try:
+            # iCredit מחייב כתובת שאינה localhost, ו-print-ים של ה-view מושתקים בזמן המדידה
+            with override_settings(ICREDIT_API_URL=stub_url, ALLOWED_HOSTS=['*']), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                sync_elapsed = self.run_sync(urls, options['requests'], options['workers'])
+                async_elapsed = asyncio.run(self.run_async(urls, options['requests'], options['concurrency']))
+        finally:
+            server.shutdown()
+            Order.objects.filter(id__in=[order.id for order in orders]).delete()
+        
+        for label, elapsed in (
+            (f"sync ({options['workers']} workers)", sync_elapsed),
+            ('async (1 event loop)', async_elapsed),
+        ):
+            self.stdout.write(
+                f'{label:<24} {elapsed:7.2f}s  {options["requests"] / elapsed:8.1f} checkouts/s'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Async speedup: {sync_elapsed / async_elapsed:.1f}x'))
+    
+    def run_sync(self, urls, total, workers):
+        local = threading.local()
+        
+        def checkout(index):
+            if not hasattr(local, 'client'):
+                local.client = Client(SERVER_NAME='arye-boutique.co.il')
+            local.client.get(urls[index % len(urls)])
+        
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(checkout, range(total)))
+        return time.perf_counter() - start
+    
+    async def run_async(self, urls, total, concurrency):
+        client = AsyncClient(SERVER_NAME='arye-boutique.co.il')
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def checkout(index):
+            async with semaphore:
+                await client.get(urls[index % len(urls)])
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(checkout(index) for index in range(total)))
+        return time.perf_counter() - start
@@ -0,0 +1,83 @@
+"""
+Management command to measure how long a fresh worker takes to boot.
+
+Each run starts a new interpreter with `python -X importtime`, sets up Django,
+loads the WSGI application and the URL resolver (which imports every view module),
+the same work a gunicorn worker does before serving its first request.
+Reports the median wall time over the runs, the slowest imports, and the import
+time grouped by top-level package - the place to look for a library worth
+importing lazily.
+"""
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+BOOT_SCRIPT = (
+    'import os; os.environ.setdefault("DJANGO_SETTINGS_MODULE", "boutique_project.settings"); '
+    'from boutique_project.wsgi import application; '
+    'from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+
+def parse_importtime(output):
+    """
+    Parse `-X importtime` stderr into {module: (self_us, cumulative_us)}.
+    
+    Lines look like: "import time:       412 |       1873 |   django.urls"
+    """
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # the header line
+        name = parts[2].strip()
+        modules[name] = (int(parts[0]), int(parts[1]))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Measure worker boot time and report the import-time breakdown'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start (default: 5)')
+        parser.add_argument('--top', type=int, default=15, help='Rows in each table (default: 15)')
+    
+    def handle(self, *args, **options):
+        wall_times = []
+        modules = {}
+        for _ in range(options['runs']):
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+                cwd=settings.BASE_DIR, capture_output=True, text=True,
+            )
+            wall_times.append(time.perf_counter() - start)
+            if result.returncode != 0:
+                raise CommandError(f'Boot failed:\n{result.stderr[-2000:]}')
+            # the last run is reported - the earlier ones warm the OS file cache
+            modules = parse_importtime(result.stderr)
+        
+        total_self = sum(self_us for self_us, _ in modules.values())
+        self.stdout.write(
+            f"Boot: median {statistics.median(wall_times) * 1000:.0f}ms over {options['runs']} runs "
+            f"(min {min(wall_times) * 1000:.0f}ms), imports {total_self / 1000:.0f}ms in {len(modules)} modules"
+        )
+        
+        self.stdout.write('\nSlowest imports (cumulative, including what they import):')
+        slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (_, cumulative) in slowest[:options['top']]:
+            self.stdout.write(f'  {cumulative / 1000:8.1f}ms  {name}')
+        
+        by_package = defaultdict(int)
+        for name, (self_us, _) in modules.items():
+            by_package[name.split('.')[0]] += self_us
+        self.stdout.write('\nImport time by top-level package:')
+        for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:options['top']]:
+            self.stdout.write(f'  {self_us / 1000:8.1f}ms  {self_us * 100 / total_self:5.1f}%  {package}')
@@ -0,0 +1,88 @@
+"""
+Management command that prepares a deploy before the web server starts.
+
+Replaces the `migrate && collectstatic --noinput && create_superuser_if_missing`
+chain in the start command. Each step runs only when there is something to do:
+    - migrate: only when the migration plan is not empty (a full `migrate` with
+      nothing to apply still loads every migration and runs the post_migrate
+      handlers for contenttypes and permissions)
+    - build_static + collectstatic: only when the static sources changed - a hash
+      of every file the staticfiles finders see (plus the storage class and the
+      build settings) is compared with the hash saved in STATIC_ROOT by the
+      previous boot. The build output (static/dist) is not part of the hash.
+    - create_superuser_if_missing
+"""
+import hashlib
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+from store.services.static_build import BUILD_DIR_NAME
+
+STATIC_HASH_FILE = '.static-sources.sha256'
+
+
+def static_sources_hash():
+    """sha256 over the path and content of every static source file and the build settings"""
+    digest = hashlib.sha256(settings.STATICFILES_STORAGE.encode())
+    digest.update(repr((
+        settings.STATIC_BUNDLES, settings.CRITICAL_CSS_NAMES, settings.STATIC_SPRITE_SOURCES,
+        settings.HEEBO_FONT_REVISION, settings.HEEBO_FONT_SHA256,
+    )).encode())
+    files = {}
+    for finder in get_finders():
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            if path.startswith(f'{BUILD_DIR_NAME}/'):
+                continue
+            # the first finder that has a path wins, like collectstatic
+            files.setdefault(path, storage)
+    for path in sorted(files):
+        digest.update(path.encode())
+        with files[path].open(path) as source:
+            for chunk in iter(lambda: source.read(1 << 16), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = 'Run pending migrations and the static build only when needed, then ensure the superuser'
+    
+    # the migrations may not be applied yet - checks run after them (in gunicorn)
+    requires_system_checks = []
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Run migrate and collectstatic unconditionally')
+    
+    def handle(self, *args, **options):
+        self.step('migrate', self.migrate, options['force'])
+        self.step('collectstatic', self.collectstatic, options['force'])
+        self.step('superuser', lambda force: call_command('create_superuser_if_missing'), False)
+    
+    def step(self, name, run, force):
+        start = time.perf_counter()
+        message = run(force) or 'done'
+        self.stdout.write(f'{name:<14} {message} ({(time.perf_counter() - start) * 1000:.0f}ms)')
+    
+    def migrate(self, force):
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan and not force:
+            return 'up to date, skipped'
+        call_command('migrate', interactive=False, verbosity=1)
+        return f'applied {len(plan)} migrations'
+    
+    def collectstatic(self, force):
+        hash_path = Path(settings.STATIC_ROOT) / STATIC_HASH_FILE
+        current = static_sources_hash()
+        if not force and hash_path.exists() and hash_path.read_text().strip() == current:
+            return 'sources unchanged, skipped'
+        call_command('build_static', fetch_fonts=True)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        hash_path.write_text(current)
+        return f'collected (sources {current[:12]})'
@@ -0,0 +1,49 @@
+"""
+Management command to rebuild the "related products" index.
+Run it periodically (e.g. nightly cron) - the product page only reads the stored results.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.services.recommendations import DEFAULT_TOP_K, MAX_BASKET_SIZE, rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Compute item-to-item recommendations from co-purchases and co-wishlists'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=DEFAULT_TOP_K,
+            help=f'Recommendations stored per product (default: {DEFAULT_TOP_K})',
+        )
+        parser.add_argument(
+            '--purchase-weight',
+            type=float,
+            default=1.0,
+            help='Weight of co-purchase similarity (default: 1.0)',
+        )
+        parser.add_argument(
+            '--wishlist-weight',
+            type=float,
+            default=0.5,
+            help='Weight of co-wishlist similarity (default: 0.5)',
+        )
+        parser.add_argument(
+            '--max-basket-size',
+            type=int,
+            default=MAX_BASKET_SIZE,
+            help=f'Ignore orders/wishlists with more products than this (default: {MAX_BASKET_SIZE})',
+        )
+    
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        rows = rebuild_recommendations(
+            top_k=options['top_k'],
+            purchase_weight=options['purchase_weight'],
+            wishlist_weight=options['wishlist_weight'],
+            max_basket_size=options['max_basket_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Stored {rows} recommendations in {time.monotonic() - start:.1f}s.'))
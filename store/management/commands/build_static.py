@@ -0,0 +1,27 @@
+"""
+Management command to build the production static assets into static/dist.
+
+Bundles and minifies the CSS/JS in STATIC_BUNDLES, extracts the critical CSS,
+builds the SVG icon sprite and subsets the Heebo font (see
+store/services/static_build.py). Run before collectstatic - `boot` does both
+when the static sources change. collectstatic then hashes the file names and
+writes the gzip/brotli variants.
+"""
+from django.core.management.base import BaseCommand
+
+from store.services import static_build
+
+
+class Command(BaseCommand):
+    help = 'Build CSS/JS bundles, critical CSS, the SVG sprite and the Heebo subset into static/dist'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fetch-fonts',
+            action='store_true',
+            help='Download the Heebo source font if HEEBO_FONT_SOURCE is missing',
+        )
+    
+    def handle(self, *args, **options):
+        static_build.build(fetch_fonts=options['fetch_fonts'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Static build written to {static_build.build_dir()}'))
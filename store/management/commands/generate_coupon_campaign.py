@@ -0,0 +1,39 @@
+"""
+Management command to generate the coupon codes of a campaign.
+Use it for very large campaigns - generation can be split across processes.
+"""
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from store.models import CouponCampaign
+from store.services.campaigns import create_campaign_coupons
+
+
+class Command(BaseCommand):
+    help = 'Generate the missing single-use coupon codes of a coupon campaign'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('campaign_id', type=int, help='CouponCampaign id')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes used to generate codes for very large batches (default: CPU count)',
+        )
+    
+    def handle(self, *args, **options):
+        try:
+            campaign = CouponCampaign.objects.get(pk=options['campaign_id'])
+        except CouponCampaign.DoesNotExist:
+            raise CommandError(f'Campaign {options["campaign_id"]} does not exist')
+        try:
+            campaign.full_clean()
+        except ValidationError as error:
+            raise CommandError(f'Campaign {campaign.pk} is invalid: {error.messages}')
+        
+        created = create_campaign_coupons(campaign, workers=options['workers'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Created {created} coupons ({campaign.codes_generated}/{campaign.quantity}).')
+        )
@@ -0,0 +1,143 @@
+"""
+Management command to load-test the site over HTTP and report throughput and latency.
+
+Runs against a server that is already up (--base-url), or with --compare starts
+gunicorn twice on local ports and measures both:
+    - baseline: `gunicorn boutique_project.wsgi` with gunicorn defaults (1 sync worker)
+    - tuned:    the production profile in gunicorn.conf.py
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = ['/', '/search/?q=a', '/faq/']
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'Load-test the site and report requests/s and latency percentiles'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help=f'Paths to request in rotation (default: {" ".join(DEFAULT_PATHS)})',
+        )
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to test (default: %(default)s)')
+        parser.add_argument('--requests', type=int, default=500, help='Total requests (default: 500)')
+        parser.add_argument('--concurrency', type=int, default=20, help='Requests in flight at once (default: 20)')
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Start gunicorn with default settings and with gunicorn.conf.py and test both',
+        )
+    
+    def handle(self, *args, **options):
+        paths = options['paths'] or DEFAULT_PATHS
+        if not options['compare']:
+            self.report(options['base_url'], self.run(options['base_url'], paths, options))
+            return
+        
+        # an empty config - without it gunicorn would pick up gunicorn.conf.py from the project root
+        empty_config = tempfile.NamedTemporaryFile('w', suffix='.py', delete=False)
+        empty_config.close()
+        profiles = [
+            ('baseline (gunicorn defaults)', ['-c', empty_config.name]),
+            ('tuned (gunicorn.conf.py)', ['-c', str(Path(settings.BASE_DIR) / 'gunicorn.conf.py')]),
+        ]
+        results = []
+        for label, config_args in profiles:
+            port = _free_port()
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', 'boutique_project.wsgi', *config_args,
+                 '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', '--access-logfile', os.devnull],
+                cwd=settings.BASE_DIR,
+                env={**os.environ, 'PORT': str(port)},
+            )
+            try:
+                base_url = f'http://127.0.0.1:{port}'
+                self.wait_until_up(base_url, server)
+                results.append((label, self.run(base_url, paths, options)))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+        os.unlink(empty_config.name)
+        
+        for label, stats in results:
+            self.report(label, stats)
+        baseline, tuned = results[0][1], results[1][1]
+        self.stdout.write(self.style.SUCCESS(
+            f"Throughput gain: {tuned['rps'] / baseline['rps']:.1f}x"
+        ))
+    
+    def wait_until_up(self, base_url, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited with code {server.returncode}')
+            try:
+                httpx.get(base_url + '/faq/', timeout=1)
+                return
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        raise CommandError(f'Server at {base_url} did not start within {timeout}s')
+    
+    def run(self, base_url, paths, options):
+        # warm-up: per-process caches and connections are filled before measuring
+        asyncio.run(self.run_async(base_url, paths, options['concurrency'] * len(paths), options['concurrency']))
+        return asyncio.run(self.run_async(base_url, paths, options['requests'], options['concurrency']))
+    
+    async def run_async(self, base_url, paths, total, concurrency):
+        latencies = []
+        errors = 0
+        semaphore = asyncio.Semaphore(concurrency)
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            async def fetch(index):
+                nonlocal errors
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.get(paths[index % len(paths)])
+                        if response.status_code >= 400:
+                            errors += 1
+                    except httpx.HTTPError:
+                        errors += 1
+                    latencies.append(time.perf_counter() - start)
+            
+            start = time.perf_counter()
+            await asyncio.gather(*(fetch(index) for index in range(total)))
+            elapsed = time.perf_counter() - start
+        
+        latencies.sort()
+        return {
+            'requests': total,
+            'errors': errors,
+            'elapsed': elapsed,
+            'rps': total / elapsed,
+            'p50': latencies[len(latencies) // 2],
+            'p95': latencies[int(len(latencies) * 0.95) - 1],
+            'p99': latencies[int(len(latencies) * 0.99) - 1],
+        }
+    
+    def report(self, label, stats):
+        self.stdout.write(
+            f"{label:<30} {stats['rps']:8.1f} req/s  "
+            f"p50 {stats['p50'] * 1000:6.0f}ms  p95 {stats['p95'] * 1000:6.0f}ms  p99 {stats['p99'] * 1000:6.0f}ms  "
+            f"errors {stats['errors']}/{stats['requests']}"
+        )
@@ -0,0 +1,105 @@
+"""
+Management command to preview and benchmark the transactional email templates.
+Renders locally without sending anything - writes HTML files that can be opened in a browser.
+"""
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.models import ContactMessage, NewsletterSubscriber, Order
+from store.services.emails import (
+    contact_notification_message, newsletter_welcome_message, order_confirmation_messages
+)
+
+TEMPLATES = ['order_confirmation', 'newsletter_welcome', 'contact_notification']
+
+
+class Command(BaseCommand):
+    help = 'Render transactional emails to HTML files and optionally benchmark rendering'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'templates',
+            nargs='*',
+            help=f'Templates to render: {", ".join(TEMPLATES)} (default: all)',
+        )
+        parser.add_argument(
+            '--order-id',
+            type=int,
+            help='Order to render the confirmation for (default: latest order)',
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=str(Path(tempfile.gettempdir()) / 'email_previews'),
+            help='Directory for the rendered HTML files (default: <tmp>/email_previews)',
+        )
+        parser.add_argument(
+            '--benchmark',
+            type=int,
+            default=0,
+            metavar='N',
+            help='Render each template N times and report the time per email',
+        )
+    
+    def handle(self, *args, **options):
+        unknown = set(options['templates']) - set(TEMPLATES)
+        if unknown:
+            raise CommandError(f'Unknown templates: {", ".join(sorted(unknown))}')
+        
+        output_dir = Path(options['output_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        for name in options['templates'] or TEMPLATES:
+            render = self.renderer(name, options['order_id'])
+            path = output_dir / f'{name}.html'
+            path.write_text(render()['html'], encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'{name}: {path}'))
+            
+            if options['benchmark']:
+                self.benchmark(render, options['benchmark'])
+        
+        if options['benchmark'] and 'order_confirmation' in (options['templates'] or TEMPLATES):
+            self.benchmark_orders(options['benchmark'])
+    
+    def renderer(self, name, order_id):
+        """פונקציה שמרנדרת את המייל - מנתונים אמיתיים אם יש, אחרת מנתוני דוגמה"""
+        if name == 'order_confirmation':
+            orders = Order.objects.filter(pk=order_id) if order_id else Order.objects.order_by('-id')
+            order = orders.first()
+            if order is None:
+                raise CommandError('No order to render - create one or pass --order-id')
+            return lambda: order_confirmation_messages([order])[0]
+        
+        if name == 'newsletter_welcome':
+            subscriber = NewsletterSubscriber.objects.order_by('-id').first() or NewsletterSubscriber(
+                email='preview@example.com', coupon_code='ARYE-PREVIEW', discount_percent=10, unsubscribe_token='preview'
+            )
+            return lambda: newsletter_welcome_message(subscriber)
+        
+        contact_message = ContactMessage.objects.order_by('-id').first() or ContactMessage(
+            full_name='<b>ישראל ישראלי</b>', phone='050-0000000', email='preview@example.com',
+            inquiry='שורה ראשונה\nשורה שנייה',
+        )
+        return lambda: contact_notification_message(contact_message)
+    
+    def benchmark(self, render, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            render()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'  {iterations} renders: {elapsed * 1000:.1f}ms ({elapsed / iterations * 1000:.3f}ms per email)')
+    
+    def benchmark_orders(self, count):
+        """רינדור מרוכז של עד count הזמנות אחרונות (כולל טעינת הפריטים)"""
+        orders = list(Order.objects.order_by('-id')[:count])
+        if not orders:
+            return
+        start = time.perf_counter()
+        order_confirmation_messages(orders)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'order_confirmation batch of {len(orders)}: {elapsed * 1000:.1f}ms '
+            f'({elapsed / len(orders) * 1000:.3f}ms per email)'
+        )
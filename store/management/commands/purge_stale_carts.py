@@ -0,0 +1,141 @@
+"""
+Management command to delete abandoned guest carts and expired sessions.
+Deletes in small keyset-paginated batches (each in its own transaction), so it
+never holds long locks and is safe to run from cron while the site serves traffic.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from store.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned guest carts and expired sessions in bounded batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cart-days',
+            type=int,
+            default=30,
+            help='Delete guest carts with no activity for this many days (default: 30)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows deleted per batch/transaction (default: 500)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.05,
+            help='Seconds to pause between batches to let other queries through (default: 0.05)',
+        )
+        parser.add_argument(
+            '--skip-sessions',
+            action='store_true',
+            help='Do not delete expired rows from django_session',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be deleted',
+        )
+    
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cutoff = now - timedelta(days=options['cart_days'])
+        batch_size = options['batch_size']
+        
+        stale_carts = self.stale_carts(now, cutoff)
+        expired_sessions = Session.objects.filter(expire_date__lt=now)
+        purge_sessions = not options['skip_sessions'] and self.uses_db_sessions()
+        
+        if options['dry_run']:
+            self.stdout.write(f'Guest carts older than {options["cart_days"]} days: {stale_carts.count()}')
+            self.stdout.write(f'Cart items in those carts: {CartItem.objects.filter(cart__in=stale_carts).count()}')
+            if purge_sessions:
+                self.stdout.write(f'Expired sessions: {expired_sessions.count()}')
+            self.stdout.write(self.style.WARNING('Dry run - nothing was deleted.'))
+            return
+        
+        carts_deleted, items_deleted = self.purge_carts(stale_carts, batch_size, options['sleep'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {carts_deleted} guest carts ({items_deleted} items).')
+        )
+        
+        if purge_sessions:
+            sessions_deleted = self.purge_sessions(expired_sessions, batch_size, options['sleep'])
+            self.stdout.write(self.style.SUCCESS(f'Deleted {sessions_deleted} expired sessions.'))
+    
+    def stale_carts(self, now, cutoff):
+        """
+        עגלות אורח נטושות: לא עודכנו ולא נוספו אליהן פריטים מאז ה-cutoff,
+        והסשן שלהן כבר לא בתוקף (כך שאף מבקר לא יכול להגיע אליהן)
+        """
+        live_session = Session.objects.filter(session_key=OuterRef('session_key'), expire_date__gte=now)
+        recent_item = CartItem.objects.filter(cart=OuterRef('pk'), added_at__gte=cutoff)
+        return Cart.objects.filter(user__isnull=True, updated_at__lt=cutoff).exclude(
+            Exists(live_session)
+        ).exclude(
+            Exists(recent_item)
+        )
+    
+    def purge_carts(self, stale_carts, batch_size, sleep):
+        """מחיקה במנות לפי מזהה עולה (keyset) - כל מנה בטרנזקציה קצרה משלה"""
+        carts_deleted = items_deleted = 0
+        last_id = 0
+        while True:
+            ids = list(
+                stale_carts.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            
+            with transaction.atomic():
+                # התנאים נבדקים שוב בזמן המחיקה - עגלה שחזרה לפעילות בינתיים לא תימחק
+                batch = stale_carts.filter(id__in=ids)
+                items_deleted += CartItem.objects.filter(cart__in=batch).delete()[0]
+                carts_deleted += batch.delete()[0]
+            
+            self.stdout.write(f'  ...carts up to #{last_id}')
+            time.sleep(sleep)
+        
+        return carts_deleted, items_deleted
+    
+    def purge_sessions(self, expired_sessions, batch_size, sleep):
+        """מחיקת סשנים שפג תוקפם במנות לפי session_key עולה"""
+        deleted = 0
+        last_key = ''
+        while True:
+            keys = list(
+                expired_sessions.filter(session_key__gt=last_key)
+                .order_by('session_key')
+                .values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+            last_key = keys[-1]
+            
+            with transaction.atomic():
+                deleted += expired_sessions.filter(session_key__in=keys).delete()[0]
+            
+            time.sleep(sleep)
+        
+        return deleted
+    
+    def uses_db_sessions(self):
+        """django_session קיימת רק כשהסשנים נשמרים במסד הנתונים"""
+        engine = getattr(settings, 'SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+        if engine not in ('django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db'):
+            self.stdout.write(self.style.WARNING(f'SESSION_ENGINE is {engine} - skipping session cleanup.'))
+            return False
+        return True
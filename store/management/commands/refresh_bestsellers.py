@@ -0,0 +1,37 @@
+"""
+Management command to refresh the time-decayed bestseller scores and ranking.
+Run it from cron: incrementally every hour or so, and with --full nightly.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from store.services.bestsellers import refresh_bestseller_scores
+
+
+class Command(BaseCommand):
+    help = 'Refresh bestseller scores with orders paid or cancelled since the last run'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute all scores from every paid order instead of only new sales',
+        )
+        parser.add_argument(
+            '--half-life-days',
+            type=float,
+            help='Days after which a sale counts half (default: BESTSELLER_HALF_LIFE_DAYS setting)',
+        )
+    
+    def handle(self, *args, **options):
+        half_life_days = options['half_life_days']
+        if half_life_days is not None and half_life_days <= 0:
+            raise CommandError('--half-life-days must be positive')
+        
+        result = refresh_bestseller_scores(full=options['full'], half_life_days=half_life_days)
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scored {result['products']} product(s), {result['new_sales']} with new sales. "
+                f"Watermark: {result['watermark']}"
+            )
+        )
@@ -0,0 +1,27 @@
+"""
+Management command to refresh the sales analytics rollup tables.
+Run it from cron: incrementally every few minutes, and with --full nightly.
+"""
+from django.core.management.base import BaseCommand
+
+from store.services.analytics import refresh_sales_rollups
+
+
+class Command(BaseCommand):
+    help = 'Refresh sales rollup tables from orders changed since the last watermark'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild all rollups from scratch instead of processing only changed orders',
+        )
+    
+    def handle(self, *args, **options):
+        result = refresh_sales_rollups(full=options['full'])
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recomputed {result['days']} day(s). Watermark: {result['watermark'] or '-'}"
+            )
+        )
@@ -0,0 +1,15 @@
+"""
+Management command to release coupon reservations of orders that were never paid.
+Run periodically from cron so abandoned checkouts do not hold coupon uses forever.
+"""
+from django.core.management.base import BaseCommand
+
+from store.services.coupons import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Release expired coupon reservations of unpaid orders'
+    
+    def handle(self, *args, **options):
+        released = release_expired_reservations()
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired coupon reservations.'))
@@ -0,0 +1,61 @@
+"""
+Management command to send a newsletter broadcast to all active subscribers.
+Safe to interrupt and re-run - sending resumes after the last recorded recipient.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from store.models import NewsletterBroadcast
+from store.services.broadcast import BroadcastBusy, retry_failed, send_broadcast
+
+
+class Command(BaseCommand):
+    help = 'Send (or resume) a newsletter broadcast through the Resend batch API'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('broadcast_id', type=int, help='NewsletterBroadcast id')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Recipients per batch request (default: NEWSLETTER_BATCH_SIZE, max 100)',
+        )
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            default=None,
+            help='Batch requests per second (default: NEWSLETTER_RATE_LIMIT)',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Stop after this many batches (send in stages)',
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Re-send only to recipients whose delivery failed',
+        )
+    
+    def handle(self, *args, **options):
+        try:
+            broadcast = NewsletterBroadcast.objects.get(pk=options['broadcast_id'])
+        except NewsletterBroadcast.DoesNotExist:
+            raise CommandError(f'Broadcast {options["broadcast_id"]} does not exist')
+        
+        try:
+            if options['retry_failed']:
+                result = retry_failed(broadcast, options['batch_size'], options['rate_limit'])
+            else:
+                if broadcast.status == 'sent':
+                    self.stdout.write(self.style.WARNING('Broadcast was already sent - use --retry-failed for failures.'))
+                    return
+                result = send_broadcast(broadcast, options['batch_size'], options['rate_limit'], options['max_batches'])
+        except BroadcastBusy as error:
+            raise CommandError(str(error))
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {result["sent"]}, failed {result["failed"]} in this run. '
+            f'Total: {broadcast.sent_count} sent, {broadcast.failed_count} failed of {broadcast.recipients_total} '
+            f'({broadcast.get_status_display()}).'
+        ))
@@ -1,23 +1,22 @@
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.utils.deprecation import MiddlewareMixin
 
 from .models import SiteSettings
 
 
-class ComingSoonMiddleware:
+class ComingSoonMiddleware(MiddlewareMixin):
     """
     Middleware שמציג עמוד "בקרוב" לכל המשתמשים שאינם סופר-אדמין.
     מחריג את פאנל הניהול ודף ההתחברות.
+    MiddlewareMixin - תומך גם ב-ASGI בלי להפוך את כל הבקשה לסינכרונית
     """
     
-    def __init__(self, get_response):
-        self.get_response = get_response
-    
-    def __call__(self, request):
+    def process_request(self, request):
         # בדיקה אם דף Coming Soon מופעל
         site_settings = SiteSettings.get_settings()
         if not site_settings or not site_settings.coming_soon_enabled:
-            return self.get_response(request)  # האתר פעיל, אין הפניה
+            return None  # האתר פעיל, אין הפניה
         
         # נתיבים שתמיד מותרים (גם למשתמשים לא מחוברים)
         allowed_prefixes = [
@@ -32,18 +31,44 @@ class ComingSoonMiddleware:
         
         # אפשר גישה לקבצים סטטיים ומדיה
         if path.startswith('/static/') or path.startswith('/media/'):
-            return self.get_response(request)
+            return None
         
         # אפשר גישה לנתיבים המותרים
         for allowed_prefix in allowed_prefixes:
             if path.startswith(allowed_prefix):
-                return self.get_response(request)
+                return None
         
         # אם המשתמש הוא סופר-אדמין - אפשר גישה מלאה
         if request.user.is_authenticated and request.user.is_superuser:
-            return self.get_response(request)
+            return None
         
         # כל השאר - הפניה לעמוד "בקרוב"
         return redirect('coming_soon')
 
 
+class GuestCartMiddleware(MiddlewareMixin):
+    """
+    Middleware שכותב את עגלת האורח (cookie חתום) לתגובה.
+    ה-cookie נכתב רק אם העגלה השתנתה בבקשה הנוכחית.
+    """
+    
+    def process_response(self, request, response):
+        guest_cart = getattr(request, '_guest_cart', None)
+        if guest_cart is not None and guest_cart.modified:
+            guest_cart.write(response)
+        
+        return response
+
+
+class GuestWishlistMiddleware(MiddlewareMixin):
+    """
+    Middleware שכותב את רשימת המשאלות של האורח (cookie חתום) לתגובה.
+    ה-cookie נכתב רק אם הרשימה השתנתה בבקשה הנוכחית.
+    """
+    
+    def process_response(self, request, response):
+        guest_wishlist = getattr(request, '_guest_wishlist', None)
+        if guest_wishlist is not None and guest_wishlist.modified:
+            guest_wishlist.write(response)
+        
+        return response
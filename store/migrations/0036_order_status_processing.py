@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0035_optional_fabric_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'ממתין לתשלום'), ('paid', 'שולם'), ('processing', 'בליקוט'), ('confirmed', 'אושר'), ('shipped', 'נשלח'), ('delivered', 'נמסר'), ('cancelled', 'בוטל')], default='pending', max_length=20, verbose_name='סטטוס'),
+        ),
+    ]
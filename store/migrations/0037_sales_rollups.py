@@ -0,0 +1,89 @@
+# Generated by Django 5.0 on 2026-10-19 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0036_order_status_processing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDashboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'דשבורד מכירות',
+                'verbose_name_plural': 'דשבורד מכירות',
+                'managed': False,
+                'default_permissions': ('view',),
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='תאריך')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='מספר הזמנות')),
+                ('units', models.PositiveIntegerField(default=0, verbose_name='יחידות שנמכרו')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='הכנסות')),
+                ('discount_total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='סך הנחות')),
+            ],
+            options={
+                'verbose_name': 'סיכום מכירות יומי',
+                'verbose_name_plural': 'סיכומי מכירות יומיים',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='שם')),
+                ('last_processed_at', models.DateTimeField(blank=True, null=True, verbose_name='עובד עד')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='תאריך עדכון')),
+            ],
+            options={
+                'verbose_name': 'נקודת התקדמות סיכומים',
+                'verbose_name_plural': 'נקודות התקדמות סיכומים',
+            },
+        ),
+        migrations.CreateModel(
+            name='CouponRedemptionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='תאריך')),
+                ('coupon_code', models.CharField(max_length=50, verbose_name='קוד קופון')),
+                ('redemptions', models.PositiveIntegerField(default=0, verbose_name='מספר מימושים')),
+                ('discount_total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='סך הנחות')),
+            ],
+            options={
+                'verbose_name': 'סיכום מימושי קופונים',
+                'verbose_name_plural': 'סיכומי מימושי קופונים',
+                'ordering': ['-date'],
+                'unique_together': {('date', 'coupon_code')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='תאריך')),
+                ('units', models.PositiveIntegerField(default=0, verbose_name='יחידות שנמכרו')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='הכנסות')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to='store.category', verbose_name='קטגוריה')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='store.product', verbose_name='מוצר')),
+                ('variant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='store.productvariant', verbose_name='וריאנט')),
+            ],
+            options={
+                'verbose_name': 'סיכום מכירות מוצר',
+                'verbose_name_plural': 'סיכומי מכירות מוצרים',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'category'], name='store_prodrollup_date_cat')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0 on 2026-10-19 14:05
+
+from django.db import migrations
+
+
+def normalize_coupon_codes(apps, schema_editor):
+    """
+    המרת קודי קופונים קיימים לאותיות גדולות
+    קוד שהגרסה הגדולה שלו כבר קיימת מקבל סיומת (CODE-2) - אחרת לא היה אפשר למצוא אותו
+    """
+    Coupon = apps.get_model('store', 'Coupon')
+    NewsletterSubscriber = apps.get_model('store', 'NewsletterSubscriber')
+    
+    for model, field in ((Coupon, 'code'), (NewsletterSubscriber, 'coupon_code')):
+        max_length = model._meta.get_field(field).max_length
+        existing = set(model.objects.values_list(field, flat=True))
+        for pk, code in model.objects.values_list('pk', field):
+            normalized = code.strip().upper()
+            if normalized == code:
+                continue
+            suffix = 1
+            candidate = normalized
+            while candidate in existing:
+                suffix += 1
+                candidate = f'{normalized[:max_length - len(str(suffix)) - 1]}-{suffix}'
+            if candidate != normalized:
+                print(f'\n  {model.__name__} {pk}: {code!r} renamed to {candidate!r} ({normalized!r} already exists)')
+            model.objects.filter(pk=pk).update(**{field: candidate})
+            existing.discard(code)
+            existing.add(candidate)
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('store', '0038_cart_session_key_index'),
+    ]
+    
+    operations = [
+        migrations.RunPython(normalize_coupon_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-19 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('store', '0039_normalize_coupon_codes'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='CouponRedemption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=50, verbose_name='קוד קופון')),
+                ('discount_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='סכום הנחה')),
+                ('status', models.CharField(choices=[('reserved', 'שמור'), ('redeemed', 'מומש'), ('released', 'שוחרר')], default='reserved', max_length=20, verbose_name='סטטוס')),
+                ('reserved_at', models.DateTimeField(auto_now_add=True, verbose_name='נשמר בתאריך')),
+                ('expires_at', models.DateTimeField(verbose_name='השמירה בתוקף עד')),
+                ('redeemed_at', models.DateTimeField(blank=True, null=True, verbose_name='מומש בתאריך')),
+                ('released_at', models.DateTimeField(blank=True, null=True, verbose_name='שוחרר בתאריך')),
+                ('coupon', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='redemptions', to='store.coupon', verbose_name='קופון')),
+                ('newsletter_subscriber', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='redemptions', to='store.newslettersubscriber', verbose_name='מנוי ניוזלטר')),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='coupon_redemption', to='store.order', verbose_name='הזמנה')),
+            ],
+            options={
+                'verbose_name': 'מימוש קופון',
+                'verbose_name_plural': 'מימושי קופונים',
+                'ordering': ['-reserved_at'],
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='store_redemption_status_exp')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0 on 2026-10-19 11:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('store', '0040_coupon_redemption'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='CouponCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='שם הקמפיין')),
+                ('prefix', models.CharField(blank=True, help_text='לדוגמה: SUMMER-', max_length=20, verbose_name='תחילית לקוד')),
+                ('code_length', models.PositiveSmallIntegerField(default=8, verbose_name='אורך החלק האקראי')),
+                ('quantity', models.PositiveIntegerField(verbose_name='כמות קודים')),
+                ('discount_type', models.CharField(choices=[('percent', 'אחוזים'), ('fixed', 'סכום קבוע')], default='percent', max_length=10, verbose_name='סוג הנחה')),
+                ('discount_value', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='ערך הנחה')),
+                ('minimum_order_amount', models.DecimalField(decimal_places=2, default=0, help_text='0 = ללא מינימום', max_digits=10, verbose_name='סכום מינימום להזמנה')),
+                ('valid_from', models.DateTimeField(verbose_name='תקף מתאריך')),
+                ('valid_until', models.DateTimeField(verbose_name='תקף עד תאריך')),
+                ('codes_generated', models.PositiveIntegerField(default=0, verbose_name='קודים שנוצרו')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='תאריך יצירה')),
+            ],
+            options={
+                'verbose_name': 'קמפיין קופונים',
+                'verbose_name_plural': 'קמפייני קופונים',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='campaign',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='coupons', to='store.couponcampaign', verbose_name='קמפיין'),
+        ),
+    ]
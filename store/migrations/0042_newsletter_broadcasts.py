@@ -0,0 +1,51 @@
+# Generated by Django 5.0 on 2026-10-19 11:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('store', '0041_coupon_campaigns'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterBroadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200, verbose_name='נושא')),
+                ('body_html', models.TextField(help_text='תבנית Django - זמינים המשתנים broadcast ו-site_url. קישור ביטול הרשמה נוסף אוטומטית', verbose_name='תוכן (HTML)')),
+                ('status', models.CharField(choices=[('draft', 'טיוטה'), ('sending', 'בשליחה'), ('sent', 'נשלח')], default='draft', max_length=20, verbose_name='סטטוס')),
+                ('recipients_total', models.PositiveIntegerField(default=0, verbose_name='מספר נמענים')),
+                ('sent_count', models.PositiveIntegerField(default=0, verbose_name='נשלחו')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='נכשלו')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='תאריך יצירה')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='התחלת שליחה')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='סיום שליחה')),
+            ],
+            options={
+                'verbose_name': 'דיוור ניוזלטר',
+                'verbose_name_plural': 'דיוורי ניוזלטר',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BroadcastDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('sent', 'נשלח'), ('failed', 'נכשל')], max_length=10, verbose_name='סטטוס')),
+                ('message_id', models.CharField(blank=True, max_length=100, verbose_name='מזהה הודעה')),
+                ('error', models.TextField(blank=True, verbose_name='שגיאה')),
+                ('sent_at', models.DateTimeField(auto_now=True, verbose_name='תאריך שליחה')),
+                ('subscriber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='store.newslettersubscriber', verbose_name='מנוי')),
+                ('broadcast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='store.newsletterbroadcast', verbose_name='דיוור')),
+            ],
+            options={
+                'verbose_name': 'שליחת דיוור',
+                'verbose_name_plural': 'שליחות דיוור',
+                'unique_together': {('broadcast', 'subscriber')},
+            },
+        ),
+    ]
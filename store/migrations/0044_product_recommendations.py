@@ -0,0 +1,30 @@
+# Generated by Django 5.0 on 2026-10-19 11:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('store', '0043_order_user_created_index'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='דירוג')),
+                ('score', models.FloatField(default=0, verbose_name='ציון דמיון')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='store.product', verbose_name='מוצר')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_for', to='store.product', verbose_name='מוצר מומלץ')),
+            ],
+            options={
+                'verbose_name': 'מוצר מומלץ',
+                'verbose_name_plural': 'מוצרים מומלצים',
+                'ordering': ['product', 'rank'],
+                'unique_together': {('product', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-19 11:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('store', '0044_product_recommendations'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesScore',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales_score', serialize=False, to='store.product', verbose_name='מוצר')),
+                ('score', models.FloatField(db_index=True, default=0, verbose_name='ציון')),
+                ('scored_at', models.DateTimeField(verbose_name='נכון לתאריך')),
+            ],
+            options={
+                'verbose_name': 'ציון מכירות',
+                'verbose_name_plural': 'ציוני מכירות',
+                'ordering': ['-score'],
+            },
+        ),
+    ]
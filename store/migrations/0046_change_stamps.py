@@ -0,0 +1,42 @@
+# Generated by Django 5.0 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('store', '0045_product_sales_scores'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='blogsection',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='תאריך עדכון'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='תאריך עדכון'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='תאריך עדכון'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='תאריך עדכון'),
+        ),
+        migrations.AddField(
+            model_name='subcategory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='תאריך עדכון'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at'], name='store_product_updated_at'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('store', '0046_change_stamps'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='couponredemption',
+            name='over_limit',
+            field=models.BooleanField(default=False, help_text='השמירה שוחררה, ובזמן שהתשלום עבר הקופון כבר נוצל עד הסוף - לבדיקה', verbose_name='חריגה ממגבלת השימושים'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-19 12:20
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('store', '0047_coupon_redemption_over_limit'),
+    ]
+    
+    operations = [
+        migrations.AlterField(
+            model_name='couponcampaign',
+            name='code_length',
+            field=models.PositiveSmallIntegerField(default=8, help_text='4-30 תווים - עם התחילית (עד 20) הקוד נכנס באורך המקסימלי של קוד קופון (50)', validators=[django.core.validators.MinValueValidator(4), django.core.validators.MaxValueValidator(30)], verbose_name='אורך החלק האקראי'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('store', '0048_coupon_campaign_code_length_bounds'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='newsletterbroadcast',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, help_text='הרצה שמחזיקה בדיוור מאריכה את הזמן בכל מנה; הרצה נוספת נדחית עד שהוא פג', null=True, verbose_name='בשליחה פעילה עד'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0 on 2026-10-19 12:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def mark_scored_orders(apps, schema_editor):
+    """ההזמנות שכבר נכללו בציונים הקיימים - עד נקודת ההתקדמות של החישוב האחרון"""
+    Order = apps.get_model('store', 'Order')
+    RollupWatermark = apps.get_model('store', 'RollupWatermark')
+    ScoredOrder = apps.get_model('store', 'ScoredOrder')
+    
+    watermark = RollupWatermark.objects.filter(name='bestseller_scores').values_list('last_processed_at', flat=True).first()
+    if watermark is None:
+        return
+    order_ids = (
+        Order.objects
+        .filter(status__in=['paid', 'processing', 'confirmed', 'shipped', 'delivered'])
+        .annotate(sold_at=Coalesce('paid_at', 'created_at'))
+        .filter(sold_at__lte=watermark)
+        .values_list('pk', flat=True)
+    )
+    ScoredOrder.objects.bulk_create(
+        (ScoredOrder(order_id=order_id) for order_id in order_ids.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('store', '0049_newsletter_broadcast_claim'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='ScoredOrder',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales_score_entry', serialize=False, to='store.order', verbose_name='הזמנה')),
+            ],
+            options={
+                'verbose_name': 'הזמנה שנספרה בדירוג',
+                'verbose_name_plural': 'הזמנות שנספרו בדירוג',
+            },
+        ),
+        migrations.RunPython(mark_scored_orders, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,11 @@
+from decimal import Decimal
+
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from django.db.models import Q
+from django.db.models import Q, F, Sum, Value, DecimalField, ExpressionWrapper
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.conf import settings
 from django.utils.text import slugify
 
@@ -142,6 +148,7 @@ class Category(models.Model):
     image = models.ImageField(upload_to='categories/', blank=True, verbose_name='תמונה')
     is_active = models.BooleanField(default=True, verbose_name='פעיל')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='תאריך יצירה')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='תאריך עדכון')
     
     class Meta:
         verbose_name = 'קטגוריה'
@@ -173,6 +180,7 @@ class Subcategory(models.Model):
     image = models.ImageField(upload_to='subcategories/', blank=True, verbose_name='תמונה')
     is_active = models.BooleanField(default=True, verbose_name='פעיל')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='תאריך יצירה')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='תאריך עדכון')
     
     class Meta:
         verbose_name = 'תת-קטגוריה'
@@ -267,6 +275,10 @@ class Product(models.Model):
         verbose_name = 'מוצר'
         verbose_name_plural = 'מוצרים'
         ordering = ['order', '-created_at']
+        indexes = [
+            # חותמת השינוי של הקטלוג (ETag) - MAX(updated_at) מהאינדקס בלי לסרוק את הטבלה
+            models.Index(fields=['updated_at'], name='store_product_updated_at'),
+        ]
     
     def __str__(self):
         return self.name
@@ -311,6 +323,7 @@ class ProductImage(models.Model):
     is_primary = models.BooleanField(default=False, verbose_name='תמונה ראשית')
     order = models.PositiveIntegerField(default=0, verbose_name='סדר')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='תאריך יצירה')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='תאריך עדכון')
     
     class Meta:
         verbose_name = 'תמונת מוצר'
@@ -328,11 +341,14 @@ class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'ממתין לתשלום'),
         ('paid', 'שולם'),
+        ('processing', 'בליקוט'),
         ('confirmed', 'אושר'),
         ('shipped', 'נשלח'),
         ('delivered', 'נמסר'),
         ('cancelled', 'בוטל'),
     ]
+    # סטטוסים שנספרים כמכירה (הזמנה ששולמה ולא בוטלה)
+    REVENUE_STATUSES = ['paid', 'processing', 'confirmed', 'shipped', 'delivered']
     
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
@@ -370,6 +386,19 @@ class Order(models.Model):
         verbose_name = 'הזמנה'
         verbose_name_plural = 'הזמנות'
         ordering = ['-created_at']
+        indexes = [
+            # היסטוריית ההזמנות של משתמש - דפדוף keyset לפי (created_at, id)
+            models.Index(fields=['user', 'created_at', 'id'], name='store_order_user_created'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        # מועד המכירה - גם כשהסטטוס משתנה ידנית בניהול ולא דרך ה-IPN
+        if self.paid_at is None and self.status in self.REVENUE_STATUSES:
+            self.paid_at = timezone.now()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'paid_at'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
         if self.user:
@@ -409,6 +438,25 @@ class OrderItem(models.Model):
         return self.price * self.quantity
 
 
+def cart_summary_aggregates(prefix=''):
+    """
+    ביטויי הסיכום של סל - כמות פריטים וסכום כולל, לשאילתה אחת
+    המחיר האפקטיבי של פריט: מחיר הוריאנט אם הוגדר, אחרת מחיר המוצר
+    
+    prefix='' לאגרגציה על CartItem, prefix='items__' ל-annotate על Cart
+    """
+    line_total = ExpressionWrapper(
+        Coalesce(F(f'{prefix}variant__price_override'), F(f'{prefix}product__price')) * F(f'{prefix}quantity'),
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    )
+    return {
+        'summary_total_items': Coalesce(Sum(f'{prefix}quantity'), Value(0)),
+        'summary_total_price': Coalesce(
+            Sum(line_total), Value(Decimal('0.00')), output_field=DecimalField(max_digits=12, decimal_places=2)
+        ),
+    }
+
+
 class Cart(models.Model):
     """
     סל קניות
@@ -421,7 +469,7 @@ class Cart(models.Model):
         related_name='cart',
         verbose_name='משתמש'
     )
-    session_key = models.CharField(max_length=40, blank=True, verbose_name='מפתח סשן')
+    session_key = models.CharField(max_length=40, blank=True, db_index=True, verbose_name='מפתח סשן')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='תאריך יצירה')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='תאריך עדכון')
     
@@ -434,15 +482,34 @@ class Cart(models.Model):
             return f'סל של {self.user.username}'
         return f'סל #{self.id}'
     
+    @cached_property
+    def summary(self):
+        """
+        סיכום הסל בשאילתת אגרגציה אחת (נשמר על האובייקט)
+        אם הסל נטען עם annotate של cart_summary_aggregates - בלי שאילתה נוספת
+        """
+        if hasattr(self, 'summary_total_items'):
+            return {
+                'summary_total_items': self.summary_total_items,
+                'summary_total_price': self.summary_total_price,
+            }
+        return self.items.aggregate(**cart_summary_aggregates())
+    
+    def clear_summary(self):
+        """איפוס הסיכום השמור - אחרי שינוי בפריטי הסל"""
+        self.__dict__.pop('summary', None)
+        self.__dict__.pop('summary_total_items', None)
+        self.__dict__.pop('summary_total_price', None)
+    
     @property
     def total_price(self):
         """סכום כולל של הסל"""
-        return sum(item.subtotal for item in self.items.all())
+        return self.summary['summary_total_price']
     
     @property
     def total_items(self):
         """כמות פריטים בסל"""
-        return sum(item.quantity for item in self.items.all())
+        return self.summary['summary_total_items']
 
 
 class CartItem(models.Model):
@@ -621,6 +688,7 @@ class ProductVariant(models.Model):
         verbose_name='מחיר מותאם',
         help_text='השאר ריק לשימוש במחיר המוצר הרגיל'
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='תאריך עדכון')
     
     class Meta:
         verbose_name = 'וריאנט מוצר'
@@ -684,6 +752,36 @@ class WishlistItem(models.Model):
         return f'{self.user.username} - {self.product.name}'
 
 
+class ProductRecommendation(models.Model):
+    """
+    מוצר מומלץ ("אולי תאהבו גם") - K השכנים הקרובים של כל מוצר
+    מחושב מראש מתוך קניות משותפות ורשימות משאלות (build_recommendations)
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='מוצר'
+    )
+    recommended = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='recommended_for',
+        verbose_name='מוצר מומלץ'
+    )
+    rank = models.PositiveSmallIntegerField(verbose_name='דירוג')
+    score = models.FloatField(default=0, verbose_name='ציון דמיון')
+    
+    class Meta:
+        verbose_name = 'מוצר מומלץ'
+        verbose_name_plural = 'מוצרים מומלצים'
+        unique_together = ['product', 'rank']
+        ordering = ['product', 'rank']
+    
+    def __str__(self):
+        return f'{self.product.name} -> {self.recommended.name} ({self.score:.3f})'
+
+
 class FAQ(models.Model):
     """
     שאלות ותשובות
@@ -748,6 +846,7 @@ class BlogSection(models.Model):
         verbose_name='תמונה',
         help_text='תמונה אופציונלית לסקשן'
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='תאריך עדכון')
     
     class Meta:
         verbose_name = 'סקשן בפוסט'
@@ -777,6 +876,74 @@ class NewsletterSubscriber(models.Model):
     
     def __str__(self):
         return f'{self.email} - {self.coupon_code}'
+    
+    def save(self, *args, **kwargs):
+        # קוד קופון נשמר תמיד באותיות גדולות - חיפוש מדויק על העמודה הייחודית
+        self.coupon_code = (self.coupon_code or '').strip().upper()
+        super().save(*args, **kwargs)
+
+
+class NewsletterBroadcast(models.Model):
+    """
+    דיוור לכל מנויי הניוזלטר הפעילים
+    """
+    STATUS_CHOICES = [
+        ('draft', 'טיוטה'),
+        ('sending', 'בשליחה'),
+        ('sent', 'נשלח'),
+    ]
+    
+    subject = models.CharField(max_length=200, verbose_name='נושא')
+    body_html = models.TextField(
+        verbose_name='תוכן (HTML)',
+        help_text='תבנית Django - זמינים המשתנים broadcast ו-site_url. קישור ביטול הרשמה נוסף אוטומטית'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft', verbose_name='סטטוס')
+    recipients_total = models.PositiveIntegerField(default=0, verbose_name='מספר נמענים')
+    sent_count = models.PositiveIntegerField(default=0, verbose_name='נשלחו')
+    failed_count = models.PositiveIntegerField(default=0, verbose_name='נכשלו')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='תאריך יצירה')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='התחלת שליחה')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='סיום שליחה')
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='בשליחה פעילה עד',
+        help_text='הרצה שמחזיקה בדיוור מאריכה את הזמן בכל מנה; הרצה נוספת נדחית עד שהוא פג'
+    )
+    
+    class Meta:
+        verbose_name = 'דיוור ניוזלטר'
+        verbose_name_plural = 'דיוורי ניוזלטר'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return self.subject
+
+
+class BroadcastDelivery(models.Model):
+    """
+    מצב השליחה של דיוור למנוי אחד - נקודת המשך אם השליחה נקטעה
+    """
+    STATUS_CHOICES = [
+        ('sent', 'נשלח'),
+        ('failed', 'נכשל'),
+    ]
+    
+    broadcast = models.ForeignKey(NewsletterBroadcast, on_delete=models.CASCADE, related_name='deliveries', verbose_name='דיוור')
+    subscriber = models.ForeignKey(NewsletterSubscriber, on_delete=models.CASCADE, related_name='deliveries', verbose_name='מנוי')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, verbose_name='סטטוס')
+    message_id = models.CharField(max_length=100, blank=True, verbose_name='מזהה הודעה')
+    error = models.TextField(blank=True, verbose_name='שגיאה')
+    sent_at = models.DateTimeField(auto_now=True, verbose_name='תאריך שליחה')
+    
+    class Meta:
+        verbose_name = 'שליחת דיוור'
+        verbose_name_plural = 'שליחות דיוור'
+        unique_together = ('broadcast', 'subscriber')
+    
+    def __str__(self):
+        return f'{self.broadcast} -> {self.subscriber.email} ({self.get_status_display()})'
 
 
 class Coupon(models.Model):
@@ -797,6 +964,14 @@ class Coupon(models.Model):
     valid_from = models.DateTimeField(verbose_name='תקף מתאריך')
     valid_until = models.DateTimeField(verbose_name='תקף עד תאריך')
     is_active = models.BooleanField(default=True, verbose_name='פעיל')
+    campaign = models.ForeignKey(
+        'CouponCampaign',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='coupons',
+        verbose_name='קמפיין'
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='תאריך יצירה')
     
     class Meta:
@@ -809,6 +984,11 @@ class Coupon(models.Model):
             return f'{self.code} - {self.discount_value}%'
         return f'{self.code} - {self.discount_value}₪'
     
+    def save(self, *args, **kwargs):
+        # קוד קופון נשמר תמיד באותיות גדולות - חיפוש מדויק על העמודה הייחודית
+        self.code = (self.code or '').strip().upper()
+        super().save(*args, **kwargs)
+    
     def is_valid(self):
         """בדיקה אם הקופון תקף"""
         from django.utils import timezone
@@ -825,4 +1005,251 @@ class Coupon(models.Model):
         """חישוב סכום ההנחה"""
         if self.discount_type == 'percent':
             return (order_total * self.discount_value) / 100
-        return min(self.discount_value, order_total)  # לא יותר מסכום ההזמנה
\ No newline at end of file
+        return min(self.discount_value, order_total)  # לא יותר מסכום ההזמנה
+
+
+class CouponCampaign(models.Model):
+    """
+    קמפיין קופונים - יצירת כמות גדולה של קודים חד-פעמיים עם אותן הגדרות הנחה
+    """
+    name = models.CharField(max_length=200, verbose_name='שם הקמפיין')
+    prefix = models.CharField(max_length=20, blank=True, verbose_name='תחילית לקוד', help_text='לדוגמה: SUMMER-')
+    code_length = models.PositiveSmallIntegerField(
+        default=8,
+        validators=[MinValueValidator(4), MaxValueValidator(30)],
+        verbose_name='אורך החלק האקראי',
+        help_text='4-30 תווים - עם התחילית (עד 20) הקוד נכנס באורך המקסימלי של קוד קופון (50)'
+    )
+    quantity = models.PositiveIntegerField(verbose_name='כמות קודים')
+    discount_type = models.CharField(max_length=10, choices=Coupon.DISCOUNT_TYPE_CHOICES, default='percent', verbose_name='סוג הנחה')
+    discount_value = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='ערך הנחה')
+    minimum_order_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='סכום מינימום להזמנה', help_text='0 = ללא מינימום')
+    valid_from = models.DateTimeField(verbose_name='תקף מתאריך')
+    valid_until = models.DateTimeField(verbose_name='תקף עד תאריך')
+    codes_generated = models.PositiveIntegerField(default=0, verbose_name='קודים שנוצרו')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='תאריך יצירה')
+    
+    class Meta:
+        verbose_name = 'קמפיין קופונים'
+        verbose_name_plural = 'קמפייני קופונים'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f'{self.name} ({self.codes_generated}/{self.quantity})'
+    
+    def save(self, *args, **kwargs):
+        self.prefix = (self.prefix or '').strip().upper()
+        super().save(*args, **kwargs)
+
+
+class CouponRedemption(models.Model):
+    """
+    יומן מימושי קופונים - שורה אחת לכל הזמנה שהשתמשה בקופון
+    
+    הקופון נשמר (reserved) ביצירת ההזמנה, ממומש (redeemed) אחרי תשלום מוצלח
+    ומשוחרר (released) אם התשלום נכשל או שפג זמן השמירה.
+    """
+    STATUS_CHOICES = [
+        ('reserved', 'שמור'),
+        ('redeemed', 'מומש'),
+        ('released', 'שוחרר'),
+    ]
+    
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='coupon_redemption', verbose_name='הזמנה')
+    coupon = models.ForeignKey(
+        Coupon,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='redemptions',
+        verbose_name='קופון'
+    )
+    newsletter_subscriber = models.ForeignKey(
+        NewsletterSubscriber,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='redemptions',
+        verbose_name='מנוי ניוזלטר'
+    )
+    code = models.CharField(max_length=50, verbose_name='קוד קופון')
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='סכום הנחה')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='reserved', verbose_name='סטטוס')
+    reserved_at = models.DateTimeField(auto_now_add=True, verbose_name='נשמר בתאריך')
+    expires_at = models.DateTimeField(verbose_name='השמירה בתוקף עד')
+    redeemed_at = models.DateTimeField(null=True, blank=True, verbose_name='מומש בתאריך')
+    released_at = models.DateTimeField(null=True, blank=True, verbose_name='שוחרר בתאריך')
+    over_limit = models.BooleanField(
+        default=False,
+        verbose_name='חריגה ממגבלת השימושים',
+        help_text='השמירה שוחררה, ובזמן שהתשלום עבר הקופון כבר נוצל עד הסוף - לבדיקה'
+    )
+    
+    class Meta:
+        verbose_name = 'מימוש קופון'
+        verbose_name_plural = 'מימושי קופונים'
+        ordering = ['-reserved_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='store_redemption_status_exp'),
+        ]
+    
+    def __str__(self):
+        return f'{self.code} - הזמנה #{self.order_id} ({self.get_status_display()})'
+
+
+class DailySalesRollup(models.Model):
+    """
+    סיכום מכירות יומי - מחושב מראש מתוך ההזמנות לצורך דוחות
+    """
+    date = models.DateField(unique=True, verbose_name='תאריך')
+    orders_count = models.PositiveIntegerField(default=0, verbose_name='מספר הזמנות')
+    units = models.PositiveIntegerField(default=0, verbose_name='יחידות שנמכרו')
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='הכנסות')
+    discount_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='סך הנחות')
+    
+    class Meta:
+        verbose_name = 'סיכום מכירות יומי'
+        verbose_name_plural = 'סיכומי מכירות יומיים'
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f'{self.date:%d/%m/%Y} - {self.revenue}₪'
+    
+    @property
+    def average_order_value(self):
+        """ערך הזמנה ממוצע"""
+        if not self.orders_count:
+            return 0
+        return self.revenue / self.orders_count
+
+
+class ProductSalesRollup(models.Model):
+    """
+    סיכום מכירות יומי לפי מוצר / וריאנט (כולל הקטגוריה לצורך דוחות לפי קטגוריה)
+    """
+    date = models.DateField(verbose_name='תאריך')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_rollups', verbose_name='מוצר')
+    variant = models.ForeignKey(
+        'ProductVariant',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='sales_rollups',
+        verbose_name='וריאנט'
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sales_rollups',
+        verbose_name='קטגוריה'
+    )
+    units = models.PositiveIntegerField(default=0, verbose_name='יחידות שנמכרו')
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='הכנסות')
+    
+    class Meta:
+        verbose_name = 'סיכום מכירות מוצר'
+        verbose_name_plural = 'סיכומי מכירות מוצרים'
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date', 'category'], name='store_prodrollup_date_cat'),
+        ]
+    
+    def __str__(self):
+        return f'{self.date:%d/%m/%Y} - {self.product.name} x {self.units}'
+
+
+class ProductSalesScore(models.Model):
+    """
+    ציון מכירות של מוצר לדירוג "הכי נמכרים" - יחידות שנמכרו עם דעיכה מעריכית בזמן
+    כל הציונים מחושבים לאותו רגע (scored_at), כך שאפשר להשוות ביניהם ישירות
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sales_score',
+        verbose_name='מוצר'
+    )
+    score = models.FloatField(default=0, db_index=True, verbose_name='ציון')
+    scored_at = models.DateTimeField(verbose_name='נכון לתאריך')
+    
+    class Meta:
+        verbose_name = 'ציון מכירות'
+        verbose_name_plural = 'ציוני מכירות'
+        ordering = ['-score']
+    
+    def __str__(self):
+        return f'{self.product.name} - {self.score:.2f}'
+
+
+class ScoredOrder(models.Model):
+    """
+    הזמנה שהמכירות שלה כבר נספרו בציוני "הכי נמכרים"
+    כשהיא יוצאת מהסטטוסים של מכירה (ביטול) - המכירות שלה יורדות מהציונים
+    """
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sales_score_entry',
+        verbose_name='הזמנה'
+    )
+    
+    class Meta:
+        verbose_name = 'הזמנה שנספרה בדירוג'
+        verbose_name_plural = 'הזמנות שנספרו בדירוג'
+    
+    def __str__(self):
+        return f'הזמנה #{self.order_id}'
+
+
+class CouponRedemptionRollup(models.Model):
+    """
+    סיכום מימושי קופונים יומי לפי קוד
+    """
+    date = models.DateField(verbose_name='תאריך')
+    coupon_code = models.CharField(max_length=50, verbose_name='קוד קופון')
+    redemptions = models.PositiveIntegerField(default=0, verbose_name='מספר מימושים')
+    discount_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='סך הנחות')
+    
+    class Meta:
+        verbose_name = 'סיכום מימושי קופונים'
+        verbose_name_plural = 'סיכומי מימושי קופונים'
+        ordering = ['-date']
+        unique_together = ['date', 'coupon_code']
+    
+    def __str__(self):
+        return f'{self.date:%d/%m/%Y} - {self.coupon_code} x {self.redemptions}'
+
+
+class RollupWatermark(models.Model):
+    """
+    נקודת ההתקדמות של חישוב הסיכומים - עד איזה עדכון הזמנה כבר עובד
+    """
+    name = models.CharField(max_length=50, unique=True, verbose_name='שם')
+    last_processed_at = models.DateTimeField(null=True, blank=True, verbose_name='עובד עד')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='תאריך עדכון')
+    
+    class Meta:
+        verbose_name = 'נקודת התקדמות סיכומים'
+        verbose_name_plural = 'נקודות התקדמות סיכומים'
+    
+    def __str__(self):
+        return self.name
+
+
+class SalesDashboard(models.Model):
+    """
+    מודל וירטואלי לדשבורד המכירות באדמין
+    לא מחזיק נתונים בפועל - קורא רק מטבלאות הסיכומים
+    """
+    class Meta:
+        verbose_name = 'דשבורד מכירות'
+        verbose_name_plural = 'דשבורד מכירות'
+        managed = False  # לא ליצור טבלה במסד הנתונים
+        default_permissions = ('view',)
+    
+    def __str__(self):
+        return 'דשבורד מכירות'
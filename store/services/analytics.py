@@ -0,0 +1,156 @@
+"""
+Sales Analytics Rollups
+שירות סיכומי מכירות - חישוב טבלאות סיכום מתוך ההזמנות
+הדשבורד באדמין קורא רק מטבלאות הסיכום, ולא סורק את טבלאות ההזמנות
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from store.models import (
+    Order, OrderItem, DailySalesRollup, ProductSalesRollup,
+    CouponRedemptionRollup, RollupWatermark
+)
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = 'sales_rollups'
+
+REVENUE_STATUSES = Order.REVENUE_STATUSES
+
+
+def _recompute_days(days):
+    """
+    חישוב מחדש של כל הסיכומים עבור רשימת ימים - מחיקה והכנסה מחדש
+    
+    חישוב יום שלם מחדש (ולא תוספת) מבטיח שהזמנה שבוטלה או עודכנה
+    תתוקן גם בסיכומים.
+    """
+    days = sorted(set(days))
+    if not days:
+        return 0
+    
+    orders = (
+        Order.objects
+        .filter(status__in=REVENUE_STATUSES)
+        .annotate(day=TruncDate('created_at'))
+        .filter(day__in=days)
+    )
+    items = (
+        OrderItem.objects
+        .filter(order__status__in=REVENUE_STATUSES)
+        .annotate(day=TruncDate('order__created_at'))
+        .filter(day__in=days)
+    )
+    
+    daily_units = {
+        row['day']: row['units']
+        for row in items.values('day').annotate(units=Sum('quantity')).order_by()
+    }
+    
+    daily_rows = [
+        DailySalesRollup(
+            date=row['day'],
+            orders_count=row['orders_count'],
+            units=daily_units.get(row['day']) or 0,
+            revenue=row['revenue'] or Decimal('0.00'),
+            discount_total=row['discount_total'] or Decimal('0.00'),
+        )
+        for row in orders.values('day').annotate(
+            orders_count=Count('id'),
+            revenue=Sum('total_price'),
+            discount_total=Sum('discount_amount'),
+        ).order_by()
+    ]
+    
+    line_total = ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2))
+    product_rows = [
+        ProductSalesRollup(
+            date=row['day'],
+            product_id=row['product_id'],
+            variant_id=row['variant_id'],
+            category_id=row['category_id'],
+            units=row['units'],
+            revenue=row['revenue'] or Decimal('0.00'),
+        )
+        for row in items.values('day', 'product_id', 'variant_id')
+        .annotate(
+            category_id=Coalesce('product__category_id', 'product__subcategory__category_id'),
+            units=Sum('quantity'),
+            revenue=Sum(line_total),
+        ).order_by()
+    ]
+    
+    coupon_rows = [
+        CouponRedemptionRollup(
+            date=row['day'],
+            coupon_code=row['coupon_code'],
+            redemptions=row['redemptions'],
+            discount_total=row['discount_total'] or Decimal('0.00'),
+        )
+        for row in orders.exclude(coupon_code='')
+        .values('day', 'coupon_code')
+        .annotate(redemptions=Count('id'), discount_total=Sum('discount_amount'))
+        .order_by()
+    ]
+    
+    with transaction.atomic():
+        DailySalesRollup.objects.filter(date__in=days).delete()
+        ProductSalesRollup.objects.filter(date__in=days).delete()
+        CouponRedemptionRollup.objects.filter(date__in=days).delete()
+        DailySalesRollup.objects.bulk_create(daily_rows)
+        ProductSalesRollup.objects.bulk_create(product_rows, batch_size=500)
+        CouponRedemptionRollup.objects.bulk_create(coupon_rows, batch_size=500)
+    
+    return len(days)
+
+
+def refresh_sales_rollups(full=False):
+    """
+    עדכון טבלאות הסיכום
+    
+    במצב רגיל (אינקרמנטלי) מעובדות רק הזמנות שנוצרו או עודכנו מאז נקודת
+    ההתקדמות האחרונה, ומחושבים מחדש רק הימים שהן שייכות אליהם.
+    full=True - בנייה מחדש של כל הסיכומים (למשל בהרצה לילית).
+    
+    Returns:
+        dict: מספר הימים שחושבו ונקודת ההתקדמות החדשה
+    """
+    watermark, _ = RollupWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    # כל עדכון עד רגע זה ייכלל בהרצה הנוכחית, עדכונים מאוחרים יותר - בהרצה הבאה
+    cutoff = timezone.now()
+    
+    changed_orders = Order.objects.filter(updated_at__lte=cutoff)
+    if not full and watermark.last_processed_at:
+        changed_orders = changed_orders.filter(updated_at__gt=watermark.last_processed_at)
+    
+    days = list(
+        changed_orders
+        .annotate(day=TruncDate('created_at'))
+        .values_list('day', flat=True)
+        .distinct()
+        .order_by()
+    )
+    last_update = changed_orders.aggregate(last=Max('updated_at'))['last']
+    
+    with transaction.atomic():
+        if full:
+            DailySalesRollup.objects.all().delete()
+            ProductSalesRollup.objects.all().delete()
+            CouponRedemptionRollup.objects.all().delete()
+        days_count = _recompute_days(days)
+    
+    if last_update:
+        watermark.last_processed_at = last_update
+        watermark.save(update_fields=['last_processed_at', 'updated_at'])
+    
+    logger.info(f"Sales rollups refreshed: {days_count} days, watermark={watermark.last_processed_at}")
+    
+    return {
+        'days': days_count,
+        'watermark': watermark.last_processed_at,
+    }
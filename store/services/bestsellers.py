@@ -0,0 +1,163 @@
+"""
+Bestseller Ranking Service
+שירות דירוג "הכי נמכרים" - מתוך המכירות בפועל, עם דעיכה מעריכית בזמן
+
+ציון מוצר = סכום היחידות שנמכרו, כשכל מכירה מוכפלת ב-exp(-λ·גיל המכירה):
+    λ = ln(2) / זמן מחצית חיים (BESTSELLER_HALF_LIFE_DAYS)
+כך מכירה מלפני מחצית חיים שווה חצי ממכירה של היום, והדירוג עוקב אחרי מה שנמכר עכשיו.
+
+כיוון שהדעיכה כפלית, את הציונים הקיימים לא צריך לחשב מחדש מכל ההזמנות:
+מזיזים אותם לרגע הנוכחי (score·exp(-λ·Δt)), מוסיפים את ההזמנות ששולמו ועוד לא נספרו,
+ומורידים את אלה שנספרו ובוטלו מאז. מה שכבר נספר רשום ב-ScoredOrder - כך תשלום שנרשם
+באמצע חישוב, או שינוי סטטוס ידני בניהול, נספר בעדכון הבא בלי תלות בתאריכים.
+הדירוג נשמר ב-ProductSalesScore וב-cache, ועמוד הבית קורא אותו בלי לסרוק הזמנות.
+מוצרים שסומנו ידנית כ"הכי נמכרים" (is_bestseller) מוצגים תמיד ראשונים.
+"""
+import logging
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from store.cache import CacheNamespace
+from store.models import Order, OrderItem, Product, ProductSalesScore, RollupWatermark, ScoredOrder
+from store.services.analytics import REVENUE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = 'bestseller_scores'
+RANKING_CACHE_TTL = 60 * 60 * 24
+BESTSELLERS_CACHE = CacheNamespace('bestsellers', timeout=RANKING_CACHE_TTL)
+
+# כמה מוצרים מהדירוג נשמרים ב-cache (מספיק לכל מקום שמציג "הכי נמכרים")
+RANKING_SIZE = 24
+
+# ציון נמוך מזה (מכירה בודדת לפני כ-20 זמני מחצית חיים) נמחק מהטבלה
+MIN_SCORE = 1e-6
+
+# כמה הזמנות בכל שאילתת IN (מתחת למגבלת הפרמטרים של SQLite)
+ORDER_BATCH_SIZE = 500
+
+
+def decay_rate(half_life_days=None):
+    """λ לשנייה לפי זמן מחצית החיים בימים"""
+    half_life_days = half_life_days or settings.BESTSELLER_HALF_LIFE_DAYS
+    return math.log(2) / (half_life_days * 24 * 60 * 60)
+
+
+def _order_sales(order_ids, until, rate):
+    """
+    ציוני המכירות של ההזמנות, מחושבים לרגע until
+    מועד המכירה הוא מועד התשלום, ובהזמנות ישנות בלי paid_at - מועד יצירת ההזמנה
+    """
+    scores = defaultdict(float)
+    for start in range(0, len(order_ids), ORDER_BATCH_SIZE):
+        items = (
+            OrderItem.objects
+            .filter(order_id__in=order_ids[start:start + ORDER_BATCH_SIZE])
+            .annotate(sold_at=Coalesce('order__paid_at', 'order__created_at'))
+            .values_list('product_id', 'quantity', 'sold_at')
+        )
+        for product_id, quantity, sold_at in items:
+            scores[product_id] += quantity * math.exp(-rate * (until - sold_at).total_seconds())
+    return scores
+
+
+def refresh_bestseller_scores(full=False, half_life_days=None):
+    """
+    עדכון ציוני המכירות ודירוג "הכי נמכרים"
+    
+    במצב רגיל הציונים הקיימים מועברים לרגע הנוכחי, מתווספות ההזמנות ששולמו ועוד
+    לא נספרו ויורדות ההזמנות שנספרו ובוטלו. full=True - חישוב מחדש מכל ההזמנות
+    (נדרש אחרי שינוי זמן מחצית החיים, ומתקן הזמנות שנמחקו אחרי שנספרו).
+    
+    Returns:
+        dict: מספר המוצרים עם ציון, מספר המכירות החדשות ונקודת ההתקדמות
+    """
+    rate = decay_rate(half_life_days)
+    watermark, _ = RollupWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    now = timezone.now()
+    
+    paid = Order.objects.filter(status__in=REVENUE_STATUSES)
+    if not full:
+        paid = paid.filter(sales_score_entry__isnull=True)
+    sold_ids = list(paid.values_list('pk', flat=True))
+    cancelled_ids = list(
+        ScoredOrder.objects.exclude(order__status__in=REVENUE_STATUSES).values_list('order_id', flat=True)
+    )
+    
+    scores = _order_sales(sold_ids, now, rate)
+    new_sales = len(scores)
+    if not full:
+        for product_id, score in _order_sales(cancelled_ids, now, rate).items():
+            scores[product_id] -= score
+        for product_id, score, scored_at in ProductSalesScore.objects.values_list('product_id', 'score', 'scored_at'):
+            scores[product_id] += score * math.exp(-rate * (now - scored_at).total_seconds())
+    
+    rows = [
+        ProductSalesScore(product_id=product_id, score=score, scored_at=now)
+        for product_id, score in scores.items()
+        if score >= MIN_SCORE
+    ]
+    with transaction.atomic():
+        ProductSalesScore.objects.all().delete()
+        ProductSalesScore.objects.bulk_create(rows, batch_size=1000)
+        # רק ההזמנות שנקראו למעלה - מה שהשתנה מאז ייקלט בעדכון הבא
+        for start in range(0, len(cancelled_ids), ORDER_BATCH_SIZE):
+            ScoredOrder.objects.filter(order_id__in=cancelled_ids[start:start + ORDER_BATCH_SIZE]).delete()
+        ScoredOrder.objects.bulk_create(
+            (ScoredOrder(order_id=order_id) for order_id in sold_ids),
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        watermark.last_processed_at = now
+        watermark.save(update_fields=['last_processed_at', 'updated_at'])
+    
+    BESTSELLERS_CACHE.set(('ranking',), _ranked_ids())
+    logger.info(f"Bestseller scores refreshed: {len(rows)} products, {new_sales} with new sales")
+    
+    return {
+        'products': len(rows),
+        'new_sales': new_sales,
+        'watermark': watermark.last_processed_at,
+    }
+
+
+def _ranked_ids():
+    return list(
+        ProductSalesScore.objects
+        .filter(product__is_active=True)
+        .order_by('-score', 'product_id')
+        .values_list('product_id', flat=True)[:RANKING_SIZE]
+    )
+
+
+def get_ranking():
+    """מזהי המוצרים לפי הדירוג - מה-cache, ואם אין - שאילתה אחת לטבלת הציונים"""
+    return BESTSELLERS_CACHE.get_or_compute(('ranking',), _ranked_ids)
+
+
+def get_bestsellers(limit=4):
+    """
+    המוצרים ל"הכי נמכרים" - קודם המוצרים שסומנו ידנית, ואחריהם לפי הדירוג
+    
+    Returns:
+        list: עד limit מוצרים פעילים
+    """
+    ranking = get_ranking()[:RANKING_SIZE]
+    products = list(
+        Product.objects
+        .filter(Q(is_bestseller=True) | Q(id__in=ranking), is_active=True)
+        .order_by('order', '-created_at')
+    )
+    position = {product_id: index for index, product_id in enumerate(ranking)}
+    pinned = [product for product in products if product.is_bestseller]
+    ranked = sorted(
+        (product for product in products if not product.is_bestseller and product.id in position),
+        key=lambda product: position[product.id],
+    )
+    return (pinned + ranked)[:limit]
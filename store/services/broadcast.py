@@ -0,0 +1,267 @@
+"""
+Newsletter Broadcast Service
+שירות דיוור לניוזלטר - שליחה לכל המנויים הפעילים דרך ה-batch endpoint של Resend
+
+התבנית מרונדרת פעם אחת לכל הדיוור (האתר בשפה אחת), ולכל נמען מוחלף רק קישור
+ביטול ההרשמה. כל מנה נרשמת ב-BroadcastDelivery, כך ששליחה שנקטעה ממשיכה
+מהמנוי האחרון שטופל.
+
+הרצה תופסת את הדיוור (UPDATE מותנה של locked_until) לפני השליחה ומאריכה את התפיסה
+בכל מנה, כך ששתי הרצות לא שולחות לאותם נמענים. הרצה שנפלה משחררת אותו כשהזמן פג.
+לכל מנה יש idempotency key לפי הנמענים שלה: אם ההרצה נפלה אחרי השליחה ולפני
+הרישום, ההמשך שולח את אותה מנה עם אותו מפתח ו-Resend לא שולח אותה שוב.
+"""
+import hashlib
+import logging
+import secrets
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Max, Q
+from django.template import Context, Template
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from store.models import BroadcastDelivery, NewsletterBroadcast, NewsletterSubscriber
+from store.services.emails import render_email, resend_client, site_url
+
+logger = logging.getLogger(__name__)
+
+# מוחלף בקישור האישי של כל נמען אחרי הרינדור
+UNSUBSCRIBE_PLACEHOLDER = '__UNSUBSCRIBE_TOKEN__'
+
+# כמה זמן הרצה מחזיקה בדיוור בלי להאריך (הרבה יותר ממנה אחת)
+CLAIM_TTL = timedelta(minutes=5)
+
+
+class BroadcastBusy(Exception):
+    """הדיוור מוחזק ע"י הרצה אחרת (או שהתפיסה של ההרצה הזו פגה)"""
+
+
+def _claim(broadcast, statuses):
+    """
+    תפיסת הדיוור להרצה הזו - UPDATE מותנה: רק אם אף הרצה לא מחזיקה בו
+    
+    Returns:
+        datetime: זמן התפיסה - מזהה את ההרצה בהארכה ובשחרור
+    
+    Raises:
+        BroadcastBusy: הרצה אחרת מחזיקה בדיוור
+    """
+    now = timezone.now()
+    held_until = now + CLAIM_TTL
+    claimed = NewsletterBroadcast.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now), pk=broadcast.pk, status__in=statuses
+    ).update(locked_until=held_until)
+    if not claimed:
+        raise BroadcastBusy(f'Broadcast #{broadcast.pk} is being sent by another run')
+    return held_until
+
+
+def _renew(broadcast, held_until):
+    """הארכת התפיסה לפני מנה - נכשלת אם היא פגה והרצה אחרת תפסה את הדיוור"""
+    renewed = timezone.now() + CLAIM_TTL
+    if not NewsletterBroadcast.objects.filter(pk=broadcast.pk, locked_until=held_until).update(locked_until=renewed):
+        raise BroadcastBusy(f'Broadcast #{broadcast.pk}: the claim expired and another run took over')
+    return renewed
+
+
+def _release(broadcast, held_until):
+    NewsletterBroadcast.objects.filter(pk=broadcast.pk, locked_until=held_until).update(locked_until=None)
+
+
+def _idempotency_key(broadcast, recipients, attempt=''):
+    """מפתח למנה - זהה כל עוד אלה אותם נמענים (ואותו ניסיון חוזר)"""
+    ids = ','.join(str(subscriber_id) for subscriber_id, email, token in recipients)
+    parts = ['broadcast', str(broadcast.pk), attempt, hashlib.sha256(ids.encode()).hexdigest()[:32]]
+    return '-'.join(part for part in parts if part)
+
+
+def render_broadcast(broadcast):
+    """רינדור תוכן הדיוור בתוך תבנית המייל - פעם אחת לכל הנמענים"""
+    body = Template(broadcast.body_html).render(Context({'broadcast': broadcast, 'site_url': site_url()}))
+    unsubscribe_url = site_url() + reverse('newsletter_unsubscribe', args=[UNSUBSCRIBE_PLACEHOLDER])
+    return render_email('newsletter_broadcast', {'body': mark_safe(body), 'unsubscribe_url': unsubscribe_url})
+
+
+class RateLimiter:
+    """הגבלת קצב פשוטה - לא יותר מ-rate קריאות בשנייה"""
+    
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.next_call = 0.0
+    
+    def wait(self):
+        now = time.monotonic()
+        if now < self.next_call:
+            time.sleep(self.next_call - now)
+            now = self.next_call
+        self.next_call = now + self.interval
+
+
+def _ensure_unsubscribe_tokens():
+    """מנויים ותיקים בלי טוקן ביטול הרשמה - יצירת טוקן לפני השליחה"""
+    for subscriber_id in NewsletterSubscriber.objects.filter(
+        is_active=True, unsubscribe_token__isnull=True
+    ).values_list('id', flat=True):
+        NewsletterSubscriber.objects.filter(pk=subscriber_id).update(unsubscribe_token=secrets.token_hex(16))
+
+
+def _send_chunk(broadcast, html, recipients, idempotency_key):
+    """
+    שליחת מנה אחת בקריאת batch אחת
+    
+    Returns:
+        list: רשומות BroadcastDelivery (לא שמורות) עבור המנה
+    """
+    payload = [
+        {
+            'from': settings.DEFAULT_FROM_EMAIL,
+            'to': [email],
+            'subject': broadcast.subject,
+            'html': html.replace(UNSUBSCRIBE_PLACEHOLDER, token),
+        }
+        for subscriber_id, email, token in recipients
+    ]
+    try:
+        response = resend_client().Batch.send(payload, {'idempotency_key': idempotency_key})
+        message_ids = [item.get('id', '') for item in response.get('data', [])]
+    except Exception as e:
+        logger.error(f"Broadcast #{broadcast.pk}: batch of {len(recipients)} failed: {e}")
+        return [
+            BroadcastDelivery(broadcast=broadcast, subscriber_id=subscriber_id, status='failed', error=str(e)[:1000])
+            for subscriber_id, email, token in recipients
+        ]
+    
+    message_ids += [''] * (len(recipients) - len(message_ids))
+    return [
+        BroadcastDelivery(broadcast=broadcast, subscriber_id=subscriber_id, status='sent', message_id=message_id)
+        for (subscriber_id, email, token), message_id in zip(recipients, message_ids)
+    ]
+
+
+def _record(broadcast, deliveries, retry=False):
+    """
+    שמירת מצב המנה ועדכון המונים של הדיוור
+    retry=True - נמענים שכבר נספרו ככישלון: הצלחה מורידה את מונה הכישלונות
+    """
+    BroadcastDelivery.objects.bulk_create(
+        deliveries,
+        update_conflicts=True,
+        unique_fields=['broadcast', 'subscriber'],
+        update_fields=['status', 'message_id', 'error', 'sent_at'],
+    )
+    sent = sum(1 for delivery in deliveries if delivery.status == 'sent')
+    NewsletterBroadcast.objects.filter(pk=broadcast.pk).update(
+        sent_count=F('sent_count') + sent,
+        failed_count=F('failed_count') + (-sent if retry else len(deliveries) - sent),
+    )
+    return sent
+
+
+def send_broadcast(broadcast, batch_size=None, rate_limit=None, max_batches=None):
+    """
+    שליחת הדיוור לכל המנויים הפעילים שעדיין לא טופלו
+    
+    המנויים נסרקים לפי מזהה עולה (keyset) מהמנוי האחרון שנרשם ב-BroadcastDelivery,
+    כך שהרצה חוזרת ממשיכה מהמקום שבו השליחה נעצרה.
+    
+    Raises:
+        BroadcastBusy: הדיוור נשלח כרגע בהרצה אחרת
+    
+    Args:
+        batch_size: נמענים לכל קריאת batch (ברירת מחדל NEWSLETTER_BATCH_SIZE, עד 100)
+        rate_limit: קריאות batch בשנייה (ברירת מחדל NEWSLETTER_RATE_LIMIT)
+        max_batches: עצירה אחרי מספר מנות (לבדיקות/שליחה מדורגת)
+    
+    Returns:
+        dict: כמה נשלחו וכמה נכשלו בהרצה הזו
+    """
+    batch_size = min(batch_size or settings.NEWSLETTER_BATCH_SIZE, 100)
+    limiter = RateLimiter(rate_limit if rate_limit is not None else settings.NEWSLETTER_RATE_LIMIT)
+    
+    held_until = _claim(broadcast, ['draft', 'sending'])
+    sent = failed = batches = 0
+    try:
+        _ensure_unsubscribe_tokens()
+        html = render_broadcast(broadcast)
+        
+        recipients = NewsletterSubscriber.objects.filter(is_active=True).order_by('id')
+        NewsletterBroadcast.objects.filter(pk=broadcast.pk, status='draft').update(
+            status='sending', started_at=timezone.now(), recipients_total=recipients.count()
+        )
+        
+        last_id = broadcast.deliveries.aggregate(last=Max('subscriber_id'))['last'] or 0
+        while max_batches is None or batches < max_batches:
+            chunk = list(
+                recipients.filter(id__gt=last_id).values_list('id', 'email', 'unsubscribe_token')[:batch_size]
+            )
+            if not chunk:
+                NewsletterBroadcast.objects.filter(pk=broadcast.pk).update(status='sent', finished_at=timezone.now())
+                break
+            
+            held_until = _renew(broadcast, held_until)
+            limiter.wait()
+            deliveries = _send_chunk(broadcast, html, chunk, _idempotency_key(broadcast, chunk))
+            chunk_sent = _record(broadcast, deliveries)
+            sent += chunk_sent
+            failed += len(deliveries) - chunk_sent
+            last_id = chunk[-1][0]
+            batches += 1
+    finally:
+        _release(broadcast, held_until)
+    
+    broadcast.refresh_from_db()
+    logger.info(f"Broadcast #{broadcast.pk}: sent {sent}, failed {failed} in this run")
+    return {'sent': sent, 'failed': failed}
+
+
+def retry_failed(broadcast, batch_size=None, rate_limit=None):
+    """
+    שליחה חוזרת לנמענים שהשליחה אליהם נכשלה
+    
+    Returns:
+        dict: כמה נשלחו וכמה נכשלו שוב
+    
+    Raises:
+        BroadcastBusy: הדיוור נשלח כרגע בהרצה אחרת
+    """
+    batch_size = min(batch_size or settings.NEWSLETTER_BATCH_SIZE, 100)
+    limiter = RateLimiter(rate_limit if rate_limit is not None else settings.NEWSLETTER_RATE_LIMIT)
+    
+    held_until = _claim(broadcast, ['sending', 'sent'])
+    sent = failed = 0
+    try:
+        html = render_broadcast(broadcast)
+        failed_recipients = (
+            broadcast.deliveries.filter(status='failed', subscriber__is_active=True).order_by('subscriber_id')
+        )
+        last_id = 0
+        while True:
+            chunk = list(
+                failed_recipients.filter(subscriber_id__gt=last_id)
+                .values_list('subscriber_id', 'subscriber__email', 'subscriber__unsubscribe_token')[:batch_size]
+            )
+            if not chunk:
+                break
+            
+            held_until = _renew(broadcast, held_until)
+            # הניסיון הקודם של המנה (sent_at של הכישלון) - ניסיון חוזר אחרי כישלון שנרשם מקבל מפתח חדש
+            attempt = failed_recipients.filter(subscriber_id__in=[row[0] for row in chunk]).aggregate(
+                last=Max('sent_at')
+            )['last']
+            limiter.wait()
+            deliveries = _send_chunk(
+                broadcast, html, chunk, _idempotency_key(broadcast, chunk, f'retry-{attempt.timestamp():.6f}')
+            )
+            chunk_sent = _record(broadcast, deliveries, retry=True)
+            sent += chunk_sent
+            failed += len(deliveries) - chunk_sent
+            last_id = chunk[-1][0]
+    finally:
+        _release(broadcast, held_until)
+    
+    broadcast.refresh_from_db()
+    return {'sent': sent, 'failed': failed}
@@ -0,0 +1,157 @@
+"""
+Coupon Campaign Service
+שירות קמפייני קופונים - יצירה מרוכזת של קודים חד-פעמיים
+
+הקודים נוצרים בזיכרון, נבדקים מול הקודים הקיימים בשאילתה אחת לכל מנה,
+ונכנסים למסד הנתונים ב-bulk_create במנות.
+"""
+import csv
+import logging
+import random
+import string
+
+from django.db import transaction
+from django.db.models import F
+
+from store.models import Coupon, CouponCampaign, NewsletterSubscriber
+
+logger = logging.getLogger(__name__)
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+
+# מקור אקראיות קריפטוגרפי - קודים שאי אפשר לנחש
+_random = random.SystemRandom()
+
+# גודל מנה לבדיקת כפילויות ול-bulk_create (מתחת למגבלת הפרמטרים של SQLite)
+CHUNK_SIZE = 2000
+
+# מעל כמות זו שווה לפצל את יצירת הקודים בין תהליכים
+PARALLEL_THRESHOLD = 200_000
+
+
+def _random_codes(count, prefix, length):
+    """יצירת count קודים אקראיים ייחודיים (בתוך המנה) - רץ גם בתהליך נפרד"""
+    codes = set()
+    while len(codes) < count:
+        codes.add(prefix + ''.join(_random.choices(CODE_ALPHABET, k=length)))
+    return codes
+
+
+def generate_codes(count, prefix='', length=8, workers=1):
+    """
+    יצירת count קודים ייחודיים בזיכרון
+    
+    workers > 1 - פיצול היצירה בין תהליכים (לכמויות גדולות מאוד)
+    
+    Returns:
+        set: הקודים
+    """
+    if count <= 0:
+        return set()
+    if len(CODE_ALPHABET) ** length < count * 10:
+        raise ValueError('אורך הקוד קצר מדי עבור כמות הקודים המבוקשת')
+    
+    if workers <= 1 or count < PARALLEL_THRESHOLD:
+        return _random_codes(count, prefix, length)
+    
+    # multiprocessing נטען רק כשבאמת מפצלים - לא בכל עליית worker שמייבא את השירות
+    from concurrent.futures import ProcessPoolExecutor
+    
+    codes = set()
+    share = -(-count // workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(_random_codes, [share] * workers, [prefix] * workers, [length] * workers):
+            codes |= part
+    # התנגשויות בין תהליכים - השלמה בתהליך הראשי
+    while len(codes) < count:
+        codes |= _random_codes(count - len(codes), prefix, length)
+    return set(list(codes)[:count])
+
+
+def existing_codes(codes):
+    """
+    אילו מהקודים כבר קיימים (בקופונים או בקופוני ניוזלטר) - שאילתה אחת לכל מנה
+    """
+    codes = list(codes)
+    taken = set()
+    for start in range(0, len(codes), CHUNK_SIZE):
+        chunk = codes[start:start + CHUNK_SIZE]
+        taken.update(
+            Coupon.objects.filter(code__in=chunk).values_list('code', flat=True).order_by().union(
+                NewsletterSubscriber.objects.filter(coupon_code__in=chunk).values_list('coupon_code', flat=True).order_by()
+            )
+        )
+    return taken
+
+
+def generate_unique_codes(count, prefix='', length=8, workers=1):
+    """
+    יצירת count קודים שלא קיימים עדיין במערכת
+    
+    Returns:
+        list: הקודים
+    """
+    codes = set()
+    while len(codes) < count:
+        batch = generate_codes(count - len(codes), prefix, length, workers) - codes
+        codes |= batch - existing_codes(batch)
+    return list(codes)
+
+
+def create_campaign_coupons(campaign, workers=1):
+    """
+    יצירת הקופונים החסרים של קמפיין (אפשר להריץ שוב אחרי הפסקה)
+    
+    Returns:
+        int: מספר הקופונים שנוצרו
+    """
+    missing = campaign.quantity - campaign.coupons.count()
+    if missing <= 0:
+        return 0
+    
+    codes = generate_unique_codes(missing, campaign.prefix, campaign.code_length, workers)
+    created = 0
+    for start in range(0, len(codes), CHUNK_SIZE):
+        chunk = codes[start:start + CHUNK_SIZE]
+        with transaction.atomic():
+            Coupon.objects.bulk_create([
+                Coupon(
+                    code=code,
+                    campaign=campaign,
+                    discount_type=campaign.discount_type,
+                    discount_value=campaign.discount_value,
+                    minimum_order_amount=campaign.minimum_order_amount,
+                    max_uses=1,
+                    valid_from=campaign.valid_from,
+                    valid_until=campaign.valid_until,
+                )
+                for code in chunk
+            ])
+            CouponCampaign.objects.filter(pk=campaign.pk).update(codes_generated=F('codes_generated') + len(chunk))
+        created += len(chunk)
+    
+    campaign.refresh_from_db(fields=['codes_generated'])
+    logger.info(f"Campaign #{campaign.pk}: created {created} coupons")
+    return created
+
+
+class _Echo:
+    """אובייקט דמוי-קובץ שמחזיר את מה שנכתב אליו - לכתיבת CSV בהזרמה"""
+    
+    def write(self, value):
+        return value
+
+
+def stream_campaign_csv(campaign):
+    """
+    שורות CSV של קודי הקמפיין - לשימוש ב-StreamingHttpResponse
+    הקודים נקראים מהמסד במנות, בלי לטעון את כולם לזיכרון
+    """
+    writer = csv.writer(_Echo())
+    yield '\ufeff'  # BOM - כדי שאקסל יזהה UTF-8
+    yield writer.writerow(['code', 'discount_type', 'discount_value', 'valid_until', 'times_used'])
+    coupons = campaign.coupons.order_by('id').values_list(
+        'code', 'discount_type', 'discount_value', 'valid_until', 'times_used'
+    )
+    for code, discount_type, discount_value, valid_until, times_used in coupons.iterator(chunk_size=CHUNK_SIZE):
+        yield writer.writerow([code, discount_type, discount_value, valid_until.strftime('%Y-%m-%d %H:%M'), times_used])
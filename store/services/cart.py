@@ -0,0 +1,594 @@
+"""
+Cart Service
+שירות עגלת קניות - גישה אחידה לעגלה עבור כל ה-views
+
+משתמש מחובר מקבל עגלה במסד הנתונים. אורח מקבל עגלה ב-cookie חתום
+(או במטמון, לפי GUEST_CART_STORAGE) - בלי סשן ובלי שורות במסד הנתונים,
+ורק בצ'קאאוט היא הופכת לעגלה במסד הנתונים.
+"""
+import logging
+import secrets
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from store.models import Cart, CartItem, Product, ProductVariant
+
+logger = logging.getLogger(__name__)
+
+# מפתח בסשן שבו נשמר מזהה עגלת האורח - נשמר גם אחרי החלפת מפתח הסשן בהתחברות
+GUEST_CART_SESSION_KEY = 'guest_cart_id'
+
+GUEST_CART_COOKIE = 'guest_cart'
+GUEST_CART_COOKIE_SALT = 'store.guest_cart'
+GUEST_CART_MAX_AGE = 60 * 60 * 24 * 30  # 30 יום
+GUEST_CART_MAX_LINES = 50  # שומר על ה-cookie מתחת למגבלת 4KB
+
+
+def get_or_create_cart(request):
+    """
+    פונקציית עזר לקבלת או יצירת עגלת קניות במסד הנתונים
+    """
+    cart = None
+    if request.user.is_authenticated:
+        # משתמש מחובר - חיפוש או יצירת סל לפי משתמש
+        cart, created = Cart.objects.get_or_create(
+            user=request.user,
+            defaults={'session_key': ''}
+        )
+    else:
+        # משתמש לא מחובר - חיפוש או יצירת סל לפי session_key
+        session_key = request.session.session_key
+        if not session_key:
+            request.session.create()
+            session_key = request.session.session_key
+        
+        try:
+            cart = Cart.objects.get(session_key=session_key, user__isnull=True)
+        except Cart.DoesNotExist:
+            cart = Cart.objects.create(session_key=session_key, user=None)
+        
+        # שמירת מזהה העגלה בנתוני הסשן - לאיחוד עם עגלת המשתמש בהתחברות
+        if request.session.get(GUEST_CART_SESSION_KEY) != cart.id:
+            request.session[GUEST_CART_SESSION_KEY] = cart.id
+    
+    return cart
+
+
+def _find_db_cart(request):
+    """עגלה קיימת במסד הנתונים, בלי ליצור חדשה"""
+    if request.user.is_authenticated:
+        return Cart.objects.filter(user=request.user).first()
+    # עגלת אורח במסד הנתונים קיימת רק אחרי צ'קאאוט (או מלפני המעבר ל-cookie)
+    session_key = request.session.session_key
+    if session_key and request.session.get(GUEST_CART_SESSION_KEY):
+        return Cart.objects.filter(session_key=session_key, user__isnull=True).first()
+    return None
+
+
+class DatabaseCartStorage:
+    """
+    עגלה במסד הנתונים (Cart + CartItem)
+    העגלה נוצרת רק בפעולת השינוי הראשונה ולא בקריאה
+    """
+    
+    def __init__(self, request):
+        self.request = request
+        self.cart = _find_db_cart(request)
+        self._items = None
+    
+    def _get_or_create(self):
+        if self.cart is None:
+            self.cart = get_or_create_cart(self.request)
+        return self.cart
+    
+    def _changed(self):
+        self._items = None
+        if self.cart is not None:
+            self.cart.clear_summary()
+    
+    def items(self):
+        """פריטי העגלה יחד עם המוצרים והוריאנטים"""
+        if self._items is None:
+            if self.cart is None:
+                self._items = []
+            else:
+                self._items = list(
+                    self.cart.items.select_related(
+                        'product', 'variant', 'variant__product', 'variant__size', 'variant__fabric_type'
+                    ).order_by('added_at', 'id')
+                )
+        return self._items
+    
+    def get_item(self, item_id):
+        return next((item for item in self.items() if item.id == item_id), None)
+    
+    def quantity_of(self, product, variant=None):
+        """הכמות הנוכחית של מוצר/וריאנט בעגלה"""
+        if self.cart is None:
+            return 0
+        item = CartItem.objects.filter(cart=self.cart, product=product, variant=variant).first()
+        return item.quantity if item else 0
+    
+    def add(self, product, variant, quantity):
+        cart = self._get_or_create()
+        cart_item, item_created = CartItem.objects.get_or_create(
+            cart=cart,
+            product=product,
+            variant=variant,
+            defaults={'quantity': quantity}
+        )
+        if not item_created:
+            cart_item.quantity += quantity
+            cart_item.save()
+        self._changed()
+        return cart_item
+    
+    def set_quantity(self, item_id, quantity):
+        CartItem.objects.filter(id=item_id, cart=self.cart).update(quantity=quantity)
+        self._changed()
+    
+    def remove(self, item_id):
+        CartItem.objects.filter(id=item_id, cart=self.cart).delete()
+        self._changed()
+    
+    def clear(self):
+        if self.cart is not None:
+            self.cart.items.all().delete()
+        self._changed()
+    
+    @property
+    def total_items(self):
+        """כמות פריטים בסל - מתוך הסיכום השמור של העגלה"""
+        return self.cart.total_items if self.cart is not None else 0
+    
+    @property
+    def total_price(self):
+        """סכום כולל של הסל - מתוך הסיכום השמור של העגלה"""
+        return self.cart.total_price if self.cart is not None else Decimal('0.00')
+    
+    def materialize(self):
+        return self._get_or_create()
+    
+    def snapshot(self):
+        return None
+    
+    def restore(self, state):
+        """שינויים במסד הנתונים מתבטלים ע"י rollback של הטרנזקציה - רק טוענים מחדש"""
+        self.cart = _find_db_cart(self.request)
+        self._items = None
+
+
+class GuestCartItem:
+    """
+    פריט בעגלת אורח - אותו ממשק כמו CartItem עבור ה-views וה-templates
+    """
+    
+    def __init__(self, item_id, product, variant, quantity):
+        self.id = item_id
+        self.product = product
+        self.variant = variant
+        self.quantity = quantity
+    
+    @property
+    def subtotal(self):
+        """סכום ביניים של הפריט"""
+        if self.variant and self.variant.price_override is not None:
+            return self.variant.price_override * self.quantity
+        return self.product.price * self.quantity
+
+
+class CookieCartStorage:
+    """
+    עגלת אורח ב-cookie חתום - ללא סשן וללא שורות במסד הנתונים
+    
+    פורמט דחוס: {"n": המזהה הבא, "l": [[מזהה, מוצר, וריאנט או 0, כמות], ...]}
+    ה-cookie נכתב לתגובה ע"י GuestCartMiddleware, ורק אם העגלה השתנתה.
+    """
+    
+    def __init__(self, request):
+        self.request = request
+        self.modified = False
+        self._items = None
+        data = self._load() or {}
+        self._next_id = data.get('n', 1)
+        self._lines = [list(line) for line in data.get('l', []) if len(line) == 4]
+    
+    def _load(self):
+        try:
+            return signing.loads(
+                self.request.COOKIES.get(GUEST_CART_COOKIE, ''),
+                salt=GUEST_CART_COOKIE_SALT,
+                max_age=GUEST_CART_MAX_AGE,
+            )
+        except signing.BadSignature:
+            return None
+    
+    def _dump(self):
+        return {'n': self._next_id, 'l': self._lines}
+    
+    def write(self, response):
+        """כתיבת העגלה לתגובה, או מחיקת ה-cookie כשהעגלה ריקה"""
+        if not self._lines:
+            response.delete_cookie(GUEST_CART_COOKIE, samesite='Lax')
+            return
+        response.set_cookie(
+            GUEST_CART_COOKIE,
+            signing.dumps(self._dump(), salt=GUEST_CART_COOKIE_SALT, compress=True),
+            max_age=GUEST_CART_MAX_AGE,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite='Lax',
+        )
+    
+    def _changed(self):
+        self.modified = True
+        self._items = None
+    
+    def _find_line(self, product_id, variant_id):
+        return next((line for line in self._lines if line[1] == product_id and line[2] == variant_id), None)
+    
+    def items(self):
+        """פריטי העגלה - שאילתה אחת למוצרים ואחת לוריאנטים"""
+        if self._items is None:
+            product_ids = {line[1] for line in self._lines}
+            variant_ids = {line[2] for line in self._lines if line[2]}
+            products = Product.objects.filter(is_active=True).in_bulk(product_ids) if product_ids else {}
+            variants = (
+                ProductVariant.objects.select_related('size', 'fabric_type').in_bulk(variant_ids)
+                if variant_ids else {}
+            )
+            
+            items = []
+            valid_lines = []
+            for item_id, product_id, variant_id, quantity in self._lines:
+                product = products.get(product_id)
+                variant = variants.get(variant_id) if variant_id else None
+                if product is None or (variant_id and (variant is None or variant.product_id != product_id)):
+                    continue  # מוצר שהוסר או הושבת מאז שנוסף לעגלה
+                if variant is not None:
+                    variant.product = product
+                items.append(GuestCartItem(item_id, product, variant, quantity))
+                valid_lines.append([item_id, product_id, variant_id, quantity])
+            
+            if len(valid_lines) != len(self._lines):
+                self._lines = valid_lines
+                self.modified = True
+            self._items = items
+        return self._items
+    
+    def get_item(self, item_id):
+        return next((item for item in self.items() if item.id == item_id), None)
+    
+    def quantity_of(self, product, variant=None):
+        line = self._find_line(product.id, variant.id if variant else 0)
+        return line[3] if line else 0
+    
+    def add(self, product, variant, quantity):
+        variant_id = variant.id if variant else 0
+        line = self._find_line(product.id, variant_id)
+        if line:
+            line[3] += quantity
+        else:
+            if len(self._lines) >= GUEST_CART_MAX_LINES:
+                raise ValueError(f'ניתן להוסיף עד {GUEST_CART_MAX_LINES} מוצרים שונים לעגלה')
+            line = [self._next_id, product.id, variant_id, quantity]
+            self._next_id += 1
+            self._lines.append(line)
+        self._changed()
+        return GuestCartItem(line[0], product, variant, line[3])
+    
+    def set_quantity(self, item_id, quantity):
+        for line in self._lines:
+            if line[0] == item_id:
+                line[3] = quantity
+        self._changed()
+    
+    def remove(self, item_id):
+        self._lines = [line for line in self._lines if line[0] != item_id]
+        self._changed()
+    
+    def clear(self):
+        self._lines = []
+        self._changed()
+    
+    @property
+    def total_items(self):
+        """כמות פריטים בסל - בלי גישה למסד הנתונים"""
+        return sum(line[3] for line in self._lines)
+    
+    @property
+    def total_price(self):
+        """סכום כולל של הסל"""
+        return sum((item.subtotal for item in self.items()), Decimal('0.00'))
+    
+    def materialize(self):
+        """
+        העברת עגלת האורח לעגלה במסד הנתונים (בצ'קאאוט או בהתחברות)
+        
+        Returns:
+            Cart: העגלה במסד הנתונים
+        """
+        items = self.items()
+        with transaction.atomic():
+            cart = get_or_create_cart(self.request)
+            if items:
+                target = cart
+                if cart.items.exists():
+                    # לעגלה הקיימת כבר יש פריטים - איחוד דרך עגלת ביניים
+                    target = Cart.objects.create(session_key='', user=None)
+                CartItem.objects.bulk_create([
+                    CartItem(cart=target, product=item.product, variant=item.variant, quantity=item.quantity)
+                    for item in items
+                ])
+                if target.pk != cart.pk:
+                    merge_carts(target, cart)
+        self.clear()
+        return cart
+    
+    def snapshot(self):
+        return self._next_id, [list(line) for line in self._lines], self.modified
+    
+    def restore(self, state):
+        """שחזור העגלה למצב שנשמר ב-snapshot (כשפעולה בקבוצה נכשלה)"""
+        self._next_id, self._lines, self.modified = state
+        self._items = None
+
+
+class CacheCartStorage(CookieCartStorage):
+    """
+    עגלת אורח במטמון - ה-cookie מחזיק רק מזהה אקראי חתום
+    מתאים רק כשהמטמון משותף לכל ה-workers
+    """
+    
+    def _load(self):
+        self.token = self.request.get_signed_cookie(
+            GUEST_CART_COOKIE, default=None, salt=GUEST_CART_COOKIE_SALT, max_age=GUEST_CART_MAX_AGE
+        )
+        return cache.get(f'guest_cart:{self.token}') if self.token else None
+    
+    def write(self, response):
+        if not self._lines:
+            if self.token:
+                cache.delete(f'guest_cart:{self.token}')
+            response.delete_cookie(GUEST_CART_COOKIE, samesite='Lax')
+            return
+        if not self.token:
+            self.token = secrets.token_urlsafe(16)
+        cache.set(f'guest_cart:{self.token}', self._dump(), GUEST_CART_MAX_AGE)
+        response.set_signed_cookie(
+            GUEST_CART_COOKIE,
+            self.token,
+            salt=GUEST_CART_COOKIE_SALT,
+            max_age=GUEST_CART_MAX_AGE,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite='Lax',
+        )
+
+
+GUEST_CART_BACKENDS = {
+    'cookie': CookieCartStorage,
+    'cache': CacheCartStorage,
+}
+
+
+def _guest_backend():
+    return GUEST_CART_BACKENDS.get(getattr(settings, 'GUEST_CART_STORAGE', 'cookie'))
+
+
+def get_cart(request, materialize=False):
+    """
+    העגלה של הבקשה הנוכחית - נשמרת על ה-request לשימוש חוזר באותה בקשה
+    
+    materialize=True מבטיח עגלה במסד הנתונים (לצ'קאאוט): עגלת אורח
+    עוברת מה-cookie למסד הנתונים וה-cookie מתרוקן.
+    """
+    storage = getattr(request, '_cart_storage', None)
+    if storage is None:
+        storage = DatabaseCartStorage(request)
+        backend = _guest_backend()
+        if backend is not None and storage.cart is None and not request.user.is_authenticated:
+            storage = backend(request)
+            request._guest_cart = storage
+        request._cart_storage = storage
+    
+    if materialize and not isinstance(storage, DatabaseCartStorage):
+        storage.materialize()
+        storage = request._cart_storage = DatabaseCartStorage(request)
+    return storage
+
+
+class CartOperationError(Exception):
+    """פעולה על העגלה שנכשלה - הודעה למשתמש ומיקום הפעולה בבקשה"""
+    
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.message = message
+        self.index = index
+
+
+def _positive_int(value, index):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise CartOperationError('כמות לא תקינה', index)
+    if value < 1:
+        raise CartOperationError('הכמות חייבת להיות לפחות 1', index)
+    return value
+
+
+def _apply_operation(cart, operation, index):
+    """ביצוע פעולה אחת (add / set / remove). מחזיר את מזהה הפריט ואם הוא חדש"""
+    op = operation.get('op')
+    
+    if op == 'add':
+        quantity = _positive_int(operation.get('quantity', 1), index)
+        product = Product.objects.filter(id=operation.get('product_id'), is_active=True).first()
+        if product is None:
+            raise CartOperationError('המוצר לא נמצא', index)
+        variant = None
+        if operation.get('variant_id'):
+            variant = ProductVariant.objects.select_related('size', 'fabric_type').filter(
+                id=operation['variant_id'], product=product, is_available=True
+            ).first()
+            if variant is None:
+                raise CartOperationError('הוריאנט שנבחר אינו זמין', index)
+        
+        current = cart.quantity_of(product, variant)
+        if current + quantity > product.stock_quantity:
+            raise CartOperationError(f'הכמות הכוללת גדולה מהמלאי הזמין ({product.stock_quantity})', index)
+        item = cart.add(product, variant, quantity)
+        return item.id, current == 0
+    
+    cart_item = cart.get_item(operation.get('item_id'))
+    if cart_item is None:
+        raise CartOperationError('הפריט לא נמצא בעגלה', index)
+    
+    if op == 'set':
+        quantity = _positive_int(operation.get('quantity'), index)
+        if quantity > cart_item.product.stock_quantity:
+            raise CartOperationError(
+                f'הכמות המבוקשת גדולה מהמלאי הזמין ({cart_item.product.stock_quantity})', index
+            )
+        cart.set_quantity(cart_item.id, quantity)
+    elif op == 'remove':
+        cart.remove(cart_item.id)
+    else:
+        raise CartOperationError('פעולה לא מוכרת', index)
+    return cart_item.id, False
+
+
+def apply_cart_operations(cart, operations):
+    """
+    ביצוע קבוצת פעולות על העגלה בטרנזקציה אחת - הכל או כלום
+    
+    Args:
+        cart: העגלה מ-get_cart
+        operations: רשימת פעולות, למשל
+            {'op': 'add', 'product_id': 1, 'variant_id': 2, 'quantity': 1}
+            {'op': 'set', 'item_id': 5, 'quantity': 3}
+            {'op': 'remove', 'item_id': 5}
+    
+    Returns:
+        dict: השינוי בלבד - added (פריטים חדשים), updated (פריטים שהכמות שלהם השתנתה),
+        removed (מזהי פריטים שהוסרו)
+    
+    Raises:
+        CartOperationError: אם פעולה נכשלה (אף פעולה לא נשמרת)
+    """
+    state = cart.snapshot()
+    touched = {}
+    try:
+        with transaction.atomic():
+            for index, operation in enumerate(operations):
+                if not isinstance(operation, dict):
+                    raise CartOperationError('פעולה לא תקינה', index)
+                item_id, created = _apply_operation(cart, operation, index)
+                touched[item_id] = touched.get(item_id, False) or created
+    except CartOperationError:
+        cart.restore(state)
+        raise
+    
+    delta = {'added': [], 'updated': [], 'removed': []}
+    for item_id, created in touched.items():
+        item = cart.get_item(item_id)
+        if item is None:
+            delta['removed'].append(item_id)
+        else:
+            delta['added' if created else 'updated'].append(item)
+    return delta
+
+
+def _same_line(cart):
+    """
+    פריטים בעגלה נתונה עם אותו מוצר ווריאנט כמו הפריט החיצוני
+    (השוואת וריאנט בטוחה ל-NULL - פריט ללא וריאנט תואם פריט ללא וריאנט)
+    """
+    return (
+        CartItem.objects
+        .annotate(variant_key=Coalesce('variant_id', Value(0)))
+        .filter(
+            cart=cart,
+            product_id=OuterRef('product_id'),
+            variant_key=Coalesce(OuterRef('variant_id'), Value(0)),
+        )
+    )
+
+
+def merge_carts(guest_cart, user_cart):
+    """
+    איחוד עגלת אורח לתוך עגלת המשתמש - פעולות על קבוצות, בטרנזקציה אחת
+    
+    1. פריטים שקיימים בשתי העגלות - UPDATE יחיד שמחבר כמויות, מוגבל למלאי
+    2. פריטים שקיימים רק בעגלת האורח - UPDATE יחיד שמעביר אותם לעגלת המשתמש
+    3. מחיקת עגלת האורח (יחד עם הפריטים הכפולים שנשארו בה)
+    
+    Returns:
+        Cart: עגלת המשתמש
+    """
+    if guest_cart.pk == user_cart.pk:
+        return user_cart
+    
+    with transaction.atomic():
+        guest_quantity = _same_line(guest_cart).values('quantity')[:1]
+        stock = Product.objects.filter(pk=OuterRef('product_id')).values('stock_quantity')[:1]
+        
+        # לא מעבר למלאי, אבל גם לא מקטינים כמות שכבר הייתה בעגלת המשתמש
+        CartItem.objects.filter(Exists(_same_line(guest_cart)), cart=user_cart).update(
+            quantity=Least(
+                F('quantity') + Subquery(guest_quantity),
+                Greatest(Subquery(stock), F('quantity')),
+            )
+        )
+        
+        CartItem.objects.filter(cart=guest_cart).exclude(Exists(_same_line(user_cart))).update(cart=user_cart)
+        
+        guest_cart.delete()
+    
+    return user_cart
+
+
+def merge_guest_cart_on_login(request, user):
+    """
+    שיוך עגלת האורח למשתמש שהתחבר
+    
+    אם למשתמש אין עגלה - עגלת האורח פשוט עוברת אליו (UPDATE יחיד),
+    אחרת הפריטים מאוחדים לעגלה הקיימת שלו.
+    עגלת אורח מה-cookie/מטמון מועברת אחר כך לעגלת המשתמש.
+    """
+    request._cart_storage = None
+    user_cart = _merge_session_cart(request, user)
+    
+    backend = _guest_backend()
+    if backend is not None:
+        guest_storage = backend(request)
+        if guest_storage.total_items:
+            user_cart = guest_storage.materialize()
+            request._guest_cart = guest_storage
+    
+    return user_cart
+
+
+def _merge_session_cart(request, user):
+    """איחוד עגלת אורח ששמורה במסד הנתונים (לפי הסשן)"""
+    guest_cart_id = request.session.pop(GUEST_CART_SESSION_KEY, None)
+    if not guest_cart_id:
+        return None
+    
+    guest_cart = Cart.objects.filter(pk=guest_cart_id, user__isnull=True).first()
+    if not guest_cart:
+        return None
+    
+    user_cart = Cart.objects.filter(user=user).first()
+    if not user_cart:
+        Cart.objects.filter(pk=guest_cart.pk).update(user=user, session_key='')
+        return guest_cart
+    
+    logger.info(f"Merging guest cart #{guest_cart.pk} into cart #{user_cart.pk} of user {user.pk}")
+    return merge_carts(guest_cart, user_cart)
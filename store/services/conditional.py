@@ -0,0 +1,185 @@
+"""
+Conditional GET Service
+ETag ו-Last-Modified לעמודי מוצר, קטגוריה ובלוג ול-API של הקטלוג
+
+ה-ETag הוא hash של "חותמות השינוי" של מה שהעמוד מציג - MAX(updated_at) ו-COUNT
+של השורות (הספירה תופסת מחיקות, שלא מזיזות את ה-MAX). אלה שאילתות aggregate
+קטנות על אינדקסים, כך שביקור חוזר עם If-None-Match מקבל 304 בלי לבנות את העמוד.
+
+עמודי HTML מציגים גם את המצב של המבקר (מונה העגלה, רשימת המשאלות, התחברות,
+ה-CSRF token), ולכן ה-ETag שלהם כולל גם אותו והם נשמרים רק בדפדפן (private).
+כשממתינות הודעות (messages) אין ETag - העמוד נבנה ומציג אותן.
+שינוי במידה, בסוג בד או בהרכב חומרים מעדכן את updated_at של הוריאנטים/המוצרים
+שלהם (store/signals.py), כך שהחותמות של המוצר מכסות גם אותם.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.middleware.csrf import get_token
+
+from store.models import BlogPost, BlogSection, Category, Product, ProductImage, ProductRecommendation, ProductVariant
+from store.services.cart import get_cart
+from store.services.wishlist import get_wishlist_ids
+
+# מדיניות Cache-Control לכל endpoint (@cache_control ב-views)
+# עמודים: הדפדפן שומר אותם אבל מאמת בכל ביקור (304 כשלא השתנו), ולא ב-cache משותף
+PAGE_CACHE_CONTROL = {'private': True, 'no_cache': True}
+# וריאנטים: זהים לכל המבקרים; זמינות מתעדכנת תוך דקה (הסל בודק בכל מקרה)
+VARIANTS_CACHE_CONTROL = {'public': True, 'max_age': 60}
+# חיפוש חי: כל הקלדה היא בקשה - תוצאות של כמה דקות מספיקות
+SEARCH_CACHE_CONTROL = {'public': True, 'max_age': 300}
+
+# בלי RELEASE_VERSION - זמן עליית התהליך: ETag לא שורד הפעלה מחדש, אבל גם לא נשאר אחרי פריסה
+_PROCESS_RELEASE = str(int(time.time()))
+
+
+def change_stamp(queryset):
+    """חותמת השינוי של קבוצת שורות - (MAX(updated_at), COUNT)"""
+    stamp = queryset.aggregate(updated=Max('updated_at'), count=Count('pk'))
+    return stamp['updated'], stamp['count']
+
+
+def navigation_stamp():
+    """הקטגוריות ותתי-הקטגוריות - בתפריט של כל עמוד ובעמודי הקטגוריה"""
+    stamp = Category.objects.aggregate(
+        updated=Max('updated_at'),
+        count=Count('pk', distinct=True),
+        subcategories_updated=Max('subcategories__updated_at'),
+        subcategories=Count('subcategories', distinct=True),
+    )
+    return [(stamp['updated'], stamp['count']), (stamp['subcategories_updated'], stamp['subcategories'])]
+
+
+def product_stamps(slug):
+    """המוצר, הוריאנטים והתמונות שלו, וההמלצות ("אולי תאהבו גם")"""
+    product = Product.objects.filter(slug=slug, is_active=True).values('pk', 'updated_at').first()
+    if product is None:
+        return None
+    recommendations = ProductRecommendation.objects.filter(product_id=product['pk']).aggregate(
+        rebuilt=Max('pk'), updated=Max('recommended__updated_at'), count=Count('pk')
+    )
+    return [
+        (product['updated_at'], 1),
+        change_stamp(ProductVariant.objects.filter(product_id=product['pk'])),
+        change_stamp(ProductImage.objects.filter(product_id=product['pk'])),
+        (recommendations['updated'], recommendations['count'], recommendations['rebuilt']),
+    ]
+
+
+def category_stamps(slug):
+    """המוצרים של הקטגוריה, התמונות שלהם והוריאנטים (מחירים וספירות הסינון)"""
+    category_id = Category.objects.filter(slug=slug, is_active=True).values_list('pk', flat=True).first()
+    if category_id is None:
+        return None
+    return [
+        change_stamp(Product.objects.filter(category_id=category_id)),
+        change_stamp(ProductImage.objects.filter(product__category_id=category_id)),
+        change_stamp(ProductVariant.objects.filter(product__category_id=category_id)),
+    ]
+
+
+def blog_post_stamps(slug):
+    """הפוסטים (הפוסט עצמו והפוסטים הקשורים) והסקשנים של הפוסט"""
+    if not BlogPost.objects.filter(slug=slug, is_active=True).exists():
+        return None
+    return [
+        change_stamp(BlogPost.objects.all()),
+        change_stamp(BlogSection.objects.filter(post__slug=slug)),
+    ]
+
+
+def product_variants_stamps(product_id):
+    """המוצר והוריאנטים שלו"""
+    updated_at = Product.objects.filter(pk=product_id, is_active=True).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    return [(updated_at, 1), change_stamp(ProductVariant.objects.filter(product_id=product_id))]
+
+
+def search_stamps():
+    """כל המוצרים - MAX(updated_at) מהאינדקס"""
+    return [change_stamp(Product.objects.all())]
+
+
+def visitor_state(request):
+    """
+    המצב של המבקר שמופיע בכל עמוד HTML
+    
+    Returns:
+        tuple, או None כשממתינות הודעות להצגה (אז אין ETag)
+    """
+    if len(get_messages(request)):
+        return None
+    # base.html מטמיע CSRF token - בביקור ראשון הסוד נוצר כאן, לפני ה-ETag, ולא בזמן הרינדור
+    get_token(request)
+    return (
+        request.user.pk,
+        request.META['CSRF_COOKIE'],
+        get_cart(request).total_items,
+        sorted(get_wishlist_ids(request)),
+    )
+
+
+def _hash(*parts):
+    payload = repr((settings.RELEASE_VERSION or _PROCESS_RELEASE, parts))
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _stamps(request, stamps, args, kwargs):
+    """החותמות נשמרות על ה-request - etag_func ו-last_modified_func לא מריצים אותן פעמיים"""
+    if not hasattr(request, '_change_stamps'):
+        request._change_stamps = stamps(*args, **kwargs)
+    return request._change_stamps
+
+
+def page_etag(stamps):
+    """
+    etag_func ל-@condition בעמוד HTML
+    
+    Args:
+        stamps: פונקציה שמקבלת את הפרמטרים של ה-view ומחזירה את חותמות התוכן
+                (None כשהעמוד לא קיים - ה-view מחזיר 404)
+    """
+    def etag_func(request, *args, **kwargs):
+        if not settings.CONDITIONAL_GET_ENABLED:
+            return None
+        visitor = visitor_state(request)
+        if visitor is None:
+            return None
+        content = _stamps(request, stamps, args, kwargs)
+        if content is None:
+            return None
+        return _hash(content, navigation_stamp(), visitor)
+    return etag_func
+
+
+def api_etag(stamps):
+    """etag_func ל-@condition ב-API ציבורי (בלי מצב המבקר)"""
+    def etag_func(request, *args, **kwargs):
+        if not settings.CONDITIONAL_GET_ENABLED:
+            return None
+        content = _stamps(request, stamps, args, kwargs)
+        return None if content is None else _hash(content)
+    return etag_func
+
+
+def api_last_modified(stamps):
+    """last_modified_func ל-@condition ב-API ציבורי - ה-updated_at המאוחר בחותמות"""
+    def last_modified_func(request, *args, **kwargs):
+        if not settings.CONDITIONAL_GET_ENABLED:
+            return None
+        content = _stamps(request, stamps, args, kwargs)
+        return max((stamp[0] for stamp in content or () if stamp[0] is not None), default=None)
+    return last_modified_func
+
+
+product_detail_etag = page_etag(product_stamps)
+category_detail_etag = page_etag(category_stamps)
+blog_detail_etag = page_etag(blog_post_stamps)
+product_variants_etag = api_etag(product_variants_stamps)
+product_variants_last_modified = api_last_modified(product_variants_stamps)
+search_etag = api_etag(search_stamps)
+search_last_modified = api_last_modified(search_stamps)
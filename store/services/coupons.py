@@ -0,0 +1,358 @@
+"""
+Coupon Service
+מנוע הנחות - קופונים כלליים וקופוני ניוזלטר דרך ממשק אחד
+
+הקודים נשמרים באותיות גדולות (Coupon.save / NewsletterSubscriber.save), כך שהחיפוש
+הוא התאמה מדויקת על העמודה הייחודית (עם אינדקס) ולא סריקת iexact.
+"""
+import hashlib
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import BooleanField, CharField, DateTimeField, DecimalField, F, IntegerField, Q, Value
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from store.models import Coupon, CouponRedemption, NewsletterSubscriber
+
+logger = logging.getLogger(__name__)
+
+# מפתח בסשן שבו נשמר הקופון שהוחל
+APPLIED_COUPON_SESSION_KEY = 'applied_coupon'
+
+# כמה זמן (בשניות) תוצאת אימות בסשן נחשבת עדכנית אם העגלה לא השתנתה
+VALIDATION_TTL = 10 * 60
+
+# כמה זמן קופון נשמר להזמנה שממתינה לתשלום
+RESERVATION_TTL = timedelta(hours=1)
+
+
+class CouponUnavailable(Exception):
+    """הקופון כבר לא זמין למימוש (נוצל עד המגבלה / כבר נוצל)"""
+    pass
+
+
+def normalize_code(code):
+    """קוד קופון בצורה אחידה - ללא רווחים ובאותיות גדולות"""
+    return (code or '').strip().upper()
+
+
+class Discount:
+    """
+    הנחה שנמצאה לפי קוד - קופון כללי ('general') או קופון ניוזלטר ('newsletter')
+    """
+    
+    def __init__(self, kind, pk, code, discount_type, discount_value, minimum_order_amount,
+                 max_uses, times_used, valid_from, valid_until, is_active, is_used):
+        self.kind = kind
+        self.pk = pk
+        self.code = code
+        self.discount_type = discount_type
+        self.discount_value = Decimal(discount_value)
+        self.minimum_order_amount = Decimal(minimum_order_amount)
+        self.max_uses = max_uses
+        self.times_used = times_used
+        self.valid_from = valid_from
+        self.valid_until = valid_until
+        self.is_active = is_active
+        self.is_used = is_used
+    
+    @property
+    def discount_percent(self):
+        if self.discount_type == 'percent':
+            return int(self.discount_value)
+        return 0
+    
+    def validate(self, cart_total):
+        """
+        בדיקת תקפות מול סכום העגלה
+        
+        Returns:
+            str או None: הודעת שגיאה למשתמש, או None אם ההנחה תקפה
+        """
+        if self.kind == 'newsletter':
+            if not self.is_active:
+                return 'הקופון אינו פעיל'
+            if self.is_used:
+                return 'הקופון כבר נוצל'
+            return None
+        
+        now = timezone.now()
+        if (
+            not self.is_active
+            or now < self.valid_from or now > self.valid_until
+            or (self.max_uses > 0 and self.times_used >= self.max_uses)
+        ):
+            return 'הקופון אינו תקף או פג תוקפו'
+        if self.minimum_order_amount > 0 and cart_total < self.minimum_order_amount:
+            return f'סכום מינימום להזמנה עם קופון זה: {self.minimum_order_amount}₪'
+        return None
+    
+    def calculate(self, cart_total):
+        """חישוב סכום ההנחה"""
+        if self.discount_type == 'percent':
+            return (cart_total * self.discount_value) / 100
+        return min(self.discount_value, cart_total)  # לא יותר מסכום ההזמנה
+
+
+_DISCOUNT_FIELDS = [
+    'kind', 'pk', 'code', 'discount_type', 'discount_value', 'minimum_order_amount',
+    'max_uses', 'times_used', 'valid_from', 'valid_until', 'is_active', 'is_used',
+]
+
+
+def find_discount(code):
+    """
+    חיפוש הנחה לפי קוד - שאילתה אחת (UNION) על שני המקורות
+    
+    Returns:
+        Discount או None
+    """
+    code = normalize_code(code)
+    if not code:
+        return None
+    
+    # כל העמודות הן annotations באותו סדר בשתי השאילתות, כדי שה-UNION יתאים ביניהן
+    general = Coupon.objects.filter(code=code).annotate(
+        d_kind=Value('general', output_field=CharField()),
+        d_pk=F('pk'),
+        d_code=F('code'),
+        d_discount_type=F('discount_type'),
+        d_discount_value=F('discount_value'),
+        d_minimum_order_amount=F('minimum_order_amount'),
+        d_max_uses=F('max_uses'),
+        d_times_used=F('times_used'),
+        d_valid_from=F('valid_from'),
+        d_valid_until=F('valid_until'),
+        d_is_active=F('is_active'),
+        d_is_used=Value(False, output_field=BooleanField()),
+    )
+    newsletter = NewsletterSubscriber.objects.filter(coupon_code=code).annotate(
+        d_kind=Value('newsletter', output_field=CharField()),
+        d_pk=F('pk'),
+        d_code=F('coupon_code'),
+        d_discount_type=Value('percent', output_field=CharField()),
+        d_discount_value=Cast('discount_percent', DecimalField(max_digits=10, decimal_places=2)),
+        d_minimum_order_amount=Value(0, output_field=DecimalField(max_digits=10, decimal_places=2)),
+        d_max_uses=Value(0, output_field=IntegerField()),
+        d_times_used=Value(0, output_field=IntegerField()),
+        d_valid_from=Value(None, output_field=DateTimeField()),
+        d_valid_until=Value(None, output_field=DateTimeField()),
+        d_is_active=F('is_active'),
+        d_is_used=F('is_used'),
+    )
+    columns = [f'd_{field}' for field in _DISCOUNT_FIELDS]
+    general = general.values_list(*columns).order_by()
+    newsletter = newsletter.values_list(*columns).order_by()
+    
+    # קופון כללי קודם לקופון ניוזלטר עם אותו קוד
+    rows = sorted(general.union(newsletter, all=True), key=lambda row: row[0] != 'general')
+    if not rows:
+        return None
+    return Discount(**dict(zip(_DISCOUNT_FIELDS, rows[0])))
+
+
+def validate_coupon(code, cart_total):
+    """
+    אימות קוד קופון מול סכום העגלה
+    
+    Returns:
+        tuple: (נתוני הקופון לשמירה בסשן, None) או (None, הודעת שגיאה)
+    """
+    discount = find_discount(code)
+    if discount is None:
+        return None, 'קוד קופון לא נמצא'
+    
+    error_message = discount.validate(cart_total)
+    if error_message:
+        return None, error_message
+    
+    return {
+        'code': discount.code,
+        'type': discount.kind,
+        'discount_amount': float(discount.calculate(cart_total)),
+        'discount_percent': discount.discount_percent,
+    }, None
+
+
+def cart_fingerprint(cart):
+    """
+    טביעת אצבע של העגלה - משתנה כשפריט, כמות או הסכום משתנים
+    """
+    lines = sorted(
+        (item.product.id, item.variant.id if item.variant else 0, item.quantity)
+        for item in cart.items()
+    )
+    raw = f'{lines}|{cart.total_price}'
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def remember_coupon(request, cart, applied_coupon):
+    """שמירת קופון שאומת בסשן, יחד עם טביעת האצבע של העגלה"""
+    applied_coupon = dict(applied_coupon)
+    applied_coupon['fingerprint'] = cart_fingerprint(cart)
+    applied_coupon['validated_at'] = int(time.time())
+    request.session[APPLIED_COUPON_SESSION_KEY] = applied_coupon
+    return applied_coupon
+
+
+def forget_coupon(request):
+    """הסרת הקופון מהסשן"""
+    request.session.pop(APPLIED_COUPON_SESSION_KEY, None)
+
+
+def get_applied_coupon(request, cart, revalidate=False):
+    """
+    הקופון שהוחל על העגלה, לאחר אימות
+    
+    אם העגלה לא השתנתה מאז האימות האחרון (אותה טביעת אצבע) והאימות עדכני -
+    התוצאה מהסשן משמשת כמו שהיא, בלי גישה למסד הנתונים.
+    revalidate=True מאלץ אימות מחדש (לפני יצירת הזמנה).
+    
+    Returns:
+        tuple: (נתוני הקופון או None, סכום ההנחה)
+    """
+    applied_coupon = request.session.get(APPLIED_COUPON_SESSION_KEY)
+    if not applied_coupon:
+        return None, Decimal('0.00')
+    
+    fresh = time.time() - applied_coupon.get('validated_at', 0) < VALIDATION_TTL
+    if not revalidate and fresh and applied_coupon.get('fingerprint') == cart_fingerprint(cart):
+        return applied_coupon, Decimal(str(applied_coupon.get('discount_amount', 0)))
+    
+    validated, error_message = validate_coupon(applied_coupon.get('code', ''), cart.total_price)
+    if error_message:
+        # הקופון לא תקף יותר - הסרה מהסשן
+        forget_coupon(request)
+        return None, Decimal('0.00')
+    
+    validated = remember_coupon(request, cart, validated)
+    return validated, Decimal(str(validated['discount_amount']))
+
+
+def _claim(coupon_id=None, newsletter_id=None):
+    """
+    תפיסת שימוש בקופון - UPDATE מותנה יחיד, בלי read-modify-write
+    
+    קופון כללי: times_used = times_used + 1 רק אם עדיין מתחת ל-max_uses
+    קופון ניוזלטר: is_used = True רק אם עדיין לא נוצל
+    
+    Returns:
+        bool: האם השימוש נתפס
+    """
+    if coupon_id:
+        coupons = Coupon.objects.filter(Q(max_uses=0) | Q(times_used__lt=F('max_uses')), pk=coupon_id)
+        return coupons.update(times_used=F('times_used') + 1) == 1
+    if newsletter_id:
+        subscribers = NewsletterSubscriber.objects.filter(pk=newsletter_id, is_used=False)
+        return subscribers.update(is_used=True) == 1
+    return False
+
+
+def _unclaim(redemption):
+    """החזרת שימוש שנתפס (שחרור שמירה)"""
+    if redemption.coupon_id:
+        Coupon.objects.filter(pk=redemption.coupon_id, times_used__gt=0).update(times_used=F('times_used') - 1)
+    elif redemption.newsletter_subscriber_id:
+        NewsletterSubscriber.objects.filter(pk=redemption.newsletter_subscriber_id).update(is_used=False)
+
+
+def reserve_coupon(order, code):
+    """
+    שמירת שימוש בקופון עבור הזמנה חדשה (בצ'קאאוט, באותה טרנזקציה של יצירת ההזמנה)
+    
+    Raises:
+        CouponUnavailable: אם הקופון כבר לא זמין - יש לבטל את יצירת ההזמנה
+    """
+    discount = find_discount(code)
+    if discount is None:
+        raise CouponUnavailable('קוד קופון לא נמצא')
+    
+    coupon_id = discount.pk if discount.kind == 'general' else None
+    newsletter_id = discount.pk if discount.kind == 'newsletter' else None
+    
+    with transaction.atomic():
+        if not _claim(coupon_id, newsletter_id):
+            raise CouponUnavailable('הקופון כבר נוצל ואינו זמין יותר')
+        return CouponRedemption.objects.create(
+            order=order,
+            coupon_id=coupon_id,
+            newsletter_subscriber_id=newsletter_id,
+            code=discount.code,
+            discount_amount=order.discount_amount,
+            expires_at=timezone.now() + RESERVATION_TTL,
+        )
+
+
+def redeem_coupon(order):
+    """
+    מימוש הקופון של הזמנה ששולמה - בטוח לקריאה כפולה (דף הצלחה + IPN)
+    
+    Returns:
+        bool: האם המימוש בוצע בקריאה הזו
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        if CouponRedemption.objects.filter(order=order, status='reserved').update(status='redeemed', redeemed_at=now):
+            return True
+        
+        # השמירה כבר שוחררה (פג תוקף) אבל התשלום עבר - תופסים שוב את השימוש
+        redemption = CouponRedemption.objects.select_for_update().filter(order=order, status='released').first()
+        if redemption is None:
+            return False
+        # הקופון נוצל עד הסוף בינתיים - התשלום כבר עבר, אז המימוש נרשם בלי לחרוג מ-max_uses
+        # ומסומן לבדיקה של הצוות
+        redemption.over_limit = not _claim(redemption.coupon_id, redemption.newsletter_subscriber_id)
+        if redemption.over_limit:
+            logger.error(f"Coupon {redemption.code} over its limit - order #{order.id} was already paid, flagged for review")
+        redemption.status = 'redeemed'
+        redemption.redeemed_at = now
+        redemption.save(update_fields=['status', 'redeemed_at', 'over_limit'])
+        return True
+
+
+def _release(redemptions, now):
+    """שחרור שמירה אחת (בתוך טרנזקציה) - נעילת השורה, החזרת השימוש ועדכון היומן"""
+    redemption = redemptions.select_for_update().filter(status='reserved').first()
+    if redemption is None:
+        return False
+    _unclaim(redemption)
+    redemption.status = 'released'
+    redemption.released_at = now
+    redemption.save(update_fields=['status', 'released_at'])
+    return True
+
+
+def release_coupon(order):
+    """
+    שחרור הקופון השמור של הזמנה שהתשלום שלה נכשל
+    
+    Returns:
+        bool: האם שוחרר קופון
+    """
+    with transaction.atomic():
+        return _release(CouponRedemption.objects.filter(order=order), timezone.now())
+
+
+def release_expired_reservations(now=None):
+    """
+    שחרור כל השמירות שפג תוקפן (הזמנות שעדיין ממתינות לתשלום)
+    
+    Returns:
+        int: מספר השמירות ששוחררו
+    """
+    now = now or timezone.now()
+    expired = list(
+        CouponRedemption.objects.filter(status='reserved', expires_at__lt=now, order__status='pending')
+        .values_list('order_id', flat=True)
+    )
+    released = 0
+    for order_id in expired:
+        with transaction.atomic():
+            # התנאים נבדקים שוב תחת נעילה - הזמנה ששולמה בינתיים לא תשוחרר
+            redemptions = CouponRedemption.objects.filter(order_id=order_id, order__status='pending')
+            released += _release(redemptions, now)
+    return released
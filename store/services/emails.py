@@ -0,0 +1,144 @@
+"""
+Transactional Email Service
+שירות מיילים - רינדור תבניות המייל ושליחה דרך Resend
+
+התבניות יושבות ב-store/templates/store/emails/ ויורשות מ-base.html (עיצוב inline).
+Django שומר את התבניות המקומפלות ב-cached loader, כך שכל שליחה רק מרנדרת
+את ההקשר - בלי לבנות HTML מחדש בקוד. ה-autoescape של התבניות מונע הזרקת HTML
+מערכים שהלקוח הזין (שם, כתובת, תוכן פנייה).
+
+views אסינכרוניים שולחים דרך asend_email - קריאה ישירה ל-REST API של Resend עם
+הלקוח האסינכרוני המשותף, בלי לחסום thread בזמן ההמתנה (ה-SDK של Resend סינכרוני).
+ה-SDK עצמו נטען רק בשליחה הסינכרונית הראשונה (resend_client), לא בעליית התהליך.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch, prefetch_related_objects
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from store.models import OrderItem
+from store.services.http_client import async_client
+
+# מגבלת ה-batch endpoint של Resend
+BATCH_LIMIT = 100
+
+RESEND_EMAILS_URL = 'https://api.resend.com/emails'
+
+
+def site_url():
+    """כתובת האתר בלי / בסוף - לקישורים מוחלטים במייל"""
+    return settings.SITE_URL.rstrip('/')
+
+
+def render_email(template_name, context):
+    """רינדור תבנית מתוך store/emails/ עם כתובת האתר בהקשר"""
+    return render_to_string(f'store/emails/{template_name}.html', {'site_url': site_url(), **context})
+
+
+def order_confirmation_messages(orders):
+    """
+    רינדור מיילי אישור הזמנה לכמה הזמנות יחד
+    הפריטים והמוצרים של כל ההזמנות נטענים בשתי שאילתות בסך הכל
+    
+    Returns:
+        list: הודעות מוכנות לשליחה (dict בפורמט של Resend)
+    """
+    orders = list(orders)
+    prefetch_related_objects(orders, Prefetch('items', queryset=OrderItem.objects.select_related('product')))
+    return [
+        {
+            'from': settings.DEFAULT_FROM_EMAIL,
+            'to': [order.guest_email],
+            'subject': f'אישור הזמנה #{order.id} - Arye Boutique',
+            'html': render_email('order_confirmation', {'order': order}),
+        }
+        for order in orders
+    ]
+
+
+def order_confirmation_message(order):
+    """מייל אישור הזמנה ללקוח"""
+    return order_confirmation_messages([order])[0]
+
+
+def newsletter_welcome_message(subscriber):
+    """מייל ברוכים הבאים עם קוד הקופון למנוי חדש"""
+    unsubscribe_url = site_url() + reverse('newsletter_unsubscribe', args=[subscriber.unsubscribe_token])
+    return {
+        'from': settings.DEFAULT_FROM_EMAIL,
+        'to': [subscriber.email],
+        'subject': f'ברוכים הבאים! קוד הנחה {subscriber.discount_percent}% מחכה לך 🎁',
+        'html': render_email('newsletter_welcome', {'subscriber': subscriber, 'unsubscribe_url': unsubscribe_url}),
+    }
+
+
+def contact_notification_message(contact_message):
+    """מייל לבעל האתר על פנייה חדשה מטופס צור קשר"""
+    return {
+        'from': settings.DEFAULT_FROM_EMAIL,
+        'to': [settings.CONTACT_EMAIL],
+        'subject': f'פנייה חדשה מ-{contact_message.full_name}',
+        'html': render_email('contact_notification', {'message': contact_message}),
+        'reply_to': contact_message.email,
+    }
+
+
+def resend_client():
+    """ה-SDK של Resend עם מפתח ה-API - מיובא בקריאה הראשונה"""
+    import resend
+    resend.api_key = settings.RESEND_API_KEY
+    return resend
+
+
+def send_email(message):
+    """שליחת הודעה אחת דרך Resend"""
+    return resend_client().Emails.send(message)
+
+
+async def asend_email(message):
+    """
+    שליחת הודעה אחת דרך Resend - גרסה אסינכרונית
+    
+    Raises:
+        httpx.HTTPError: שגיאת רשת או תשובת שגיאה מ-Resend
+        ValueError: לא הוגדר RESEND_API_KEY
+    """
+    if not settings.RESEND_API_KEY:
+        raise ValueError('RESEND_API_KEY is not configured')
+    async with async_client() as client:
+        response = await client.post(
+            RESEND_EMAILS_URL,
+            json=message,
+            headers={'Authorization': f'Bearer {settings.RESEND_API_KEY}'},
+        )
+    response.raise_for_status()
+    return response.json()
+
+
+def send_batch(messages):
+    """שליחת הרבה הודעות בקריאות batch של עד 100 הודעות"""
+    resend = resend_client()
+    responses = []
+    for start in range(0, len(messages), BATCH_LIMIT):
+        responses.append(resend.Batch.send(messages[start:start + BATCH_LIMIT]))
+    return responses
+
+
+def send_order_confirmation_email(order):
+    """
+    שליחת מייל אישור הזמנה ללקוח
+    """
+    if not settings.RESEND_API_KEY:
+        return
+    send_email(order_confirmation_message(order))
+
+
+async def asend_order_confirmation_email(order):
+    """
+    שליחת מייל אישור הזמנה ללקוח - גרסה אסינכרונית (הרינדור טוען פריטים מהמסד ולכן רץ ב-thread)
+    """
+    if not settings.RESEND_API_KEY:
+        return
+    message = await sync_to_async(order_confirmation_message)(order)
+    await asend_email(message)
@@ -0,0 +1,184 @@
+"""
+Product Facets Service
+שירות סינון לפי מאפיינים (facets) בעמודי קטגוריה ותת-קטגוריה
+
+סינון לפי מידה, סוג בד, טווח מחיר ומלאי, עם מספר המוצרים ליד כל אפשרות.
+כל הספירות מחושבות בשאילתה אחת (aggregate עם Count מותנה לכל אפשרות):
+הספירה של אפשרות מתחשבת בכל הסינונים האחרים, אבל לא בסינון של אותו מאפיין,
+כך שאפשר להוסיף עוד אפשרות מאותו מאפיין בלי לראות אפסים.
+התוצאה נשמרת ב-cache לפי (קטגוריה, סינונים), ומתבטלת בכל שינוי במוצרים
+(העלאת הגרסה של ה-namespace). כשמפתח חסר רק בקשה אחת מחשבת אותו.
+"""
+import hashlib
+from decimal import Decimal
+
+from django.db.models import Count, Exists, OuterRef, Q
+
+from store.cache import CacheNamespace
+from store.models import FabricType, ProductVariant, Size
+
+CACHE_TTL = 60 * 10
+FACETS_CACHE = CacheNamespace('facets', timeout=CACHE_TTL)
+
+# טווחי מחיר: (מפתח, תווית, מינימום כולל, מקסימום לא כולל)
+PRICE_BANDS = [
+    ('under-50', 'עד 50 ₪', None, Decimal('50')),
+    ('50-100', '50-100 ₪', Decimal('50'), Decimal('100')),
+    ('100-200', '100-200 ₪', Decimal('100'), Decimal('200')),
+    ('over-200', 'מעל 200 ₪', Decimal('200'), None),
+]
+PRICE_BAND_KEYS = [key for key, label, low, high in PRICE_BANDS]
+
+
+class FacetFilters:
+    """
+    הסינונים שנבחרו, מתוך פרמטרי ה-URL:
+    ?size=<slug>&fabric=<id>&band=<key>&in_stock=1 (אפשר לחזור על size/fabric/band)
+    """
+    
+    def __init__(self, sizes=(), fabrics=(), bands=(), in_stock=False, gender=''):
+        self.sizes = tuple(sorted(set(sizes)))
+        self.fabrics = tuple(sorted(set(fabrics)))
+        self.bands = tuple(band for band in PRICE_BAND_KEYS if band in bands)
+        self.in_stock = in_stock
+        self.gender = gender if gender in ('boy', 'girl') else ''
+    
+    @classmethod
+    def from_request(cls, request):
+        return cls(
+            sizes=[slug for slug in request.GET.getlist('size') if slug],
+            fabrics=[int(value) for value in request.GET.getlist('fabric') if value.isdigit()],
+            bands=request.GET.getlist('band'),
+            in_stock=request.GET.get('in_stock') == '1',
+            gender=request.GET.get('gender', ''),
+        )
+    
+    def cache_token(self):
+        raw = f'{self.sizes}|{self.fabrics}|{self.bands}|{self.in_stock}|{self.gender}'
+        return hashlib.md5(raw.encode()).hexdigest()
+    
+    def conditions(self, exclude=None):
+        """
+        תנאי הסינון לפי מאפיין (מילון), בלי המאפיין exclude
+        מידה ובד נבדקים מול וריאנטים זמינים של המוצר
+        """
+        conditions = {}
+        if self.gender:
+            conditions['gender'] = Q(gender__in=[self.gender, 'both'])
+        if self.sizes and exclude != 'size':
+            conditions['size'] = Q(Exists(_available_variants().filter(size__slug__in=self.sizes)))
+        if self.fabrics and exclude != 'fabric':
+            conditions['fabric'] = Q(Exists(_available_variants().filter(fabric_type_id__in=self.fabrics)))
+        if self.bands and exclude != 'band':
+            band_q = Q()
+            for key, label, low, high in PRICE_BANDS:
+                if key in self.bands:
+                    band_q |= _band_q(low, high)
+            conditions['band'] = band_q
+        if self.in_stock and exclude != 'in_stock':
+            conditions['in_stock'] = Q(stock_quantity__gt=0)
+        return conditions
+    
+    def apply(self, products):
+        """סינון רשימת המוצרים לפי כל הסינונים שנבחרו"""
+        for condition in self.conditions().values():
+            products = products.filter(condition)
+        return products
+
+
+def _available_variants():
+    return ProductVariant.objects.filter(product=OuterRef('pk'), is_available=True)
+
+
+def _band_q(low, high):
+    q = Q()
+    if low is not None:
+        q &= Q(price__gte=low)
+    if high is not None:
+        q &= Q(price__lt=high)
+    return q
+
+
+def _all_of(conditions):
+    q = Q()
+    for condition in conditions.values():
+        q &= condition
+    return q
+
+
+def _options():
+    """מידות וסוגי בד פעילים (משותפים לכל הקטגוריות)"""
+    return FACETS_CACHE.get_or_compute(('options',), lambda: {
+        'sizes': list(Size.objects.filter(is_active=True).order_by('order', 'name').values_list('slug', 'name')),
+        'fabrics': list(FabricType.objects.filter(is_active=True).order_by('order', 'name').values_list('id', 'name')),
+    })
+
+
+def _compute_counts(products, filters, options):
+    """כל הספירות בשאילתה אחת - Count מותנה לכל אפשרות של כל מאפיין"""
+    without = {facet: _all_of(filters.conditions(exclude=facet)) for facet in ('size', 'fabric', 'band', 'in_stock')}
+    
+    aggregates = {}
+    for index, (slug, name) in enumerate(options['sizes']):
+        has_size = Q(Exists(_available_variants().filter(size__slug=slug)))
+        aggregates[f'size_{index}'] = Count('pk', filter=without['size'] & has_size)
+    for fabric_id, name in options['fabrics']:
+        has_fabric = Q(Exists(_available_variants().filter(fabric_type_id=fabric_id)))
+        aggregates[f'fabric_{fabric_id}'] = Count('pk', filter=without['fabric'] & has_fabric)
+    for key, label, low, high in PRICE_BANDS:
+        aggregates[f'band_{key}'] = Count('pk', filter=without['band'] & _band_q(low, high))
+    aggregates['in_stock'] = Count('pk', filter=without['in_stock'] & Q(stock_quantity__gt=0))
+    
+    counts = products.order_by().aggregate(**aggregates)
+    return {
+        'sizes': [counts[f'size_{index}'] for index in range(len(options['sizes']))],
+        'fabrics': [counts[f'fabric_{fabric_id}'] for fabric_id, name in options['fabrics']],
+        'bands': [counts[f'band_{key}'] for key in PRICE_BAND_KEYS],
+        'in_stock': counts['in_stock'],
+    }
+
+
+def get_facets(scope, products, filters):
+    """
+    האפשרויות לסינון עם מספר המוצרים לכל אחת
+    
+    Args:
+        scope: מזהה הרשימה למפתח ה-cache (למשל 'c12' לקטגוריה, 's4' לתת-קטגוריה)
+        products: רשימת המוצרים לפני הסינונים (קטגוריה + פעילים)
+        filters: FacetFilters
+    
+    Returns:
+        dict: sizes / fabrics / bands - רשימות של אפשרויות (value, label, count, selected),
+              in_stock - (count, selected). אפשרויות בלי מוצרים מוסתרות אלא אם נבחרו.
+    """
+    options = _options()
+    counts = FACETS_CACHE.get_or_compute(
+        (scope, filters.cache_token()), lambda: _compute_counts(products, filters, options)
+    )
+    
+    def visible(values, labels, facet_counts, selected):
+        return [
+            {'value': value, 'label': label, 'count': count, 'selected': value in selected}
+            for value, label, count in zip(values, labels, facet_counts)
+            if count or value in selected
+        ]
+    
+    return {
+        'sizes': visible(
+            [slug for slug, name in options['sizes']], [name for slug, name in options['sizes']],
+            counts['sizes'], filters.sizes
+        ),
+        'fabrics': visible(
+            [fabric_id for fabric_id, name in options['fabrics']], [name for fabric_id, name in options['fabrics']],
+            counts['fabrics'], filters.fabrics
+        ),
+        'bands': visible(
+            PRICE_BAND_KEYS, [label for key, label, low, high in PRICE_BANDS], counts['bands'], filters.bands
+        ),
+        'in_stock': {'count': counts['in_stock'], 'selected': filters.in_stock},
+    }
+
+
+def invalidate_facets():
+    """ביטול כל הספירות השמורות - אחרי שינוי במוצרים, וריאנטים, מידות או בדים"""
+    FACETS_CACHE.invalidate()
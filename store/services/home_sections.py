@@ -0,0 +1,167 @@
+"""
+Home Page Sections Service
+שירות סקשנים לעמוד הבית - כל סקשן נטען, נשמר ב-cache ומתבטל בנפרד
+
+כל סקשן (באנר, קטגוריות, הכי נמכרים, גלריות, חנויות) מגדיר:
+    - פונקציית טעינה מהמסד ותבנית חלקית ב-store/home/
+    - מפתח cache ו-TTL משלו
+    - המודלים שהוא תלוי בהם - שמירה/מחיקה של אחד מהם מוחקת רק את הסקשנים שלו
+סקשן שלא תלוי במשתמש נשמר כ-HTML מרונדר. סקשן אישי (הכי נמכרים - הלב של
+רשימת המשאלות) שומר רק את הנתונים ומרונדר בכל בקשה, בלי שאילתות.
+
+כל הסקשנים נקראים מה-cache בקריאה אחת, והחסרים נטענים בזה אחר זה באותו thread
+ובאותו חיבור למסד (שאילתות קטנות על אינדקסים - thread לכל סקשן היה מוסיף חיבור
+קבוע לכל thread בלי לחסוך זמן). כל סקשן חסר נבנה פעם אחת בלבד גם כשהרבה בקשות
+מגיעות יחד (get_or_compute).
+זמן הטעינה/רינדור של כל סקשן נרשם ב-log ובכותרת Server-Timing של התגובה.
+"""
+import logging
+import time
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from store.cache import CacheNamespace, get_or_compute
+from store.models import (
+    BelowBestsellersGallery, Category, InstagramGallery, Product, ProductVariant, RetailerStore, SiteSettings
+)
+from store.services.bestsellers import get_bestsellers
+
+logger = logging.getLogger(__name__)
+
+HOME_CACHE = CacheNamespace('home', versioned=False)
+
+
+class HomeSection:
+    """
+    סקשן בעמוד הבית
+    
+    Args:
+        name: שם הסקשן - גם שם המשתנה בתבנית החלקית
+        template: התבנית החלקית
+        fetch: פונקציה שמחזירה את נתוני הסקשן (נשמרים ב-cache, צריכים להיות pickle-able)
+        models: מודלים ששינוי בהם מבטל את הסקשן
+        ttl: זמן שמירה ב-cache בשניות
+        per_user: הרינדור תלוי במשתמש - נשמרים רק הנתונים
+    """
+    
+    def __init__(self, name, template, fetch, models, ttl=60 * 60, per_user=False):
+        self.name = name
+        self.template = template
+        self.fetch = fetch
+        self.models = tuple(models)
+        self.ttl = ttl
+        self.per_user = per_user
+    
+    @property
+    def cache_key(self):
+        return HOME_CACHE.key('section', self.name)
+    
+    def render(self, data, context=None):
+        return render_to_string(self.template, {self.name: data, **(context or {})})
+    
+    def build(self):
+        """טעינה מהמסד (ורינדור, לסקשן שלא תלוי במשתמש) - הערך שנשמר ב-cache"""
+        data = self.fetch()
+        html = None if self.per_user else self.render(data)
+        return {'data': data, 'html': html}
+    
+    def load(self):
+        """הערך מה-cache, ואם חסר - בנייה (פעם אחת בלבד בין כל הבקשות) ושמירה"""
+        return get_or_compute(self.cache_key, self.build, self.ttl)
+
+
+def _bestseller_products():
+    products = get_bestsellers(4)
+    # המחיר לתצוגה מחושב מהווריאנטים - פעם אחת בטעינה ולא בכל רינדור
+    for product in products:
+        product.display_price = product.get_display_price()
+    return products
+
+
+HOME_SECTIONS = [
+    HomeSection(
+        'site_settings', 'store/home/_hero.html', SiteSettings.get_settings, [SiteSettings],
+    ),
+    HomeSection(
+        'categories', 'store/home/_categories.html',
+        lambda: list(Category.objects.filter(is_active=True)), [Category],
+    ),
+    HomeSection(
+        'bestseller_products', 'store/home/_bestsellers.html', _bestseller_products,
+        [Product, ProductVariant], ttl=60 * 15, per_user=True,
+    ),
+    HomeSection(
+        'below_bestsellers_gallery', 'store/home/_below_bestsellers_gallery.html',
+        BelowBestsellersGallery.get_gallery, [BelowBestsellersGallery],
+    ),
+    HomeSection(
+        'retailer_stores', 'store/home/_retailers.html',
+        lambda: list(RetailerStore.objects.filter(is_active=True).order_by('order', 'name')), [RetailerStore],
+    ),
+    HomeSection(
+        'instagram_gallery', 'store/home/_instagram_gallery.html',
+        InstagramGallery.get_gallery, [InstagramGallery],
+    ),
+]
+
+
+def _build_missing(sections):
+    """טעינת הסקשנים החסרים, כל אחד עם זמן הטעינה שלו"""
+    built = {}
+    for section in sections:
+        start = time.perf_counter()
+        value = section.load()
+        built[section.name] = (value, time.perf_counter() - start)
+    return built
+
+
+def render_home_sections(context=None, sections=HOME_SECTIONS):
+    """
+    ה-HTML של כל הסקשנים ונתוניהם
+    
+    Args:
+        context: הקשר לרינדור הסקשנים האישיים (למשל wishlist_product_ids)
+    
+    Returns:
+        tuple: (html לפי שם סקשן, נתונים לפי שם סקשן, [(שם, זמן בשניות, hit/miss)])
+    """
+    cached = cache.get_many([section.cache_key for section in sections])
+    missing = [section for section in sections if section.cache_key not in cached]
+    built = _build_missing(missing) if missing else {}
+    
+    html, data, timings = {}, {}, []
+    for section in sections:
+        if section.name in built:
+            value, elapsed = built[section.name]
+            status = 'miss'
+        else:
+            value, elapsed = cached[section.cache_key], 0.0
+            status = 'hit'
+        if section.per_user:
+            start = time.perf_counter()
+            html[section.name] = mark_safe(section.render(value['data'], context))
+            elapsed += time.perf_counter() - start
+        else:
+            html[section.name] = mark_safe(value['html'])
+        data[section.name] = value['data']
+        timings.append((section.name, elapsed, status))
+    
+    logger.debug('Home sections: ' + ', '.join(f'{name}={elapsed * 1000:.1f}ms ({status})' for name, elapsed, status in timings))
+    return html, data, timings
+
+
+def server_timing_header(timings):
+    """ערך לכותרת Server-Timing - זמן כל סקשן במילישניות (מוצג בכלי המפתחים של הדפדפן)"""
+    return ', '.join(
+        f'home-{name.replace("_", "-")};desc="{status}";dur={elapsed * 1000:.2f}'
+        for name, elapsed, status in timings
+    )
+
+
+def invalidate_home_sections(model):
+    """מחיקת הסקשנים שתלויים במודל מה-cache - אחרי שמירה/מחיקה של רשומה שלו"""
+    keys = [section.cache_key for section in HOME_SECTIONS if model in section.models]
+    if keys:
+        cache.delete_many(keys)
@@ -0,0 +1,23 @@
+"""
+Async HTTP Client
+לקוח HTTP אסינכרוני לקריאות לשירותים חיצוניים (iCredit, Resend) מתוך views אסינכרוניים
+
+בזמן ההמתנה לתשובה ה-event loop ממשיך לטפל בבקשות אחרות - worker אחד של uvicorn
+מחזיק הרבה תשלומים/הרשמות במקביל במקום להיחסם על כל אחד.
+כל קריאה פותחת לקוח משלה וסוגרת אותו ביציאה מה-async with: תחת WSGI (ברירת המחדל)
+כל view אסינכרוני רץ ב-event loop זמני משלו, ולקוח שנשמר בין בקשות היה משאיר
+מאגר חיבורים פתוח לכל בקשה. זו קריאה אחת לבקשה, כך ש-keep-alive לא חוסך דבר.
+httpx מיובא רק בקריאה הראשונה - הוא הייבוא הכבד ביותר בעליית התהליך.
+"""
+from contextlib import asynccontextmanager
+
+TIMEOUT = 30.0
+CONNECT_TIMEOUT = 10.0
+
+
+@asynccontextmanager
+async def async_client():
+    """לקוח httpx לקריאה אחת - החיבורים נסגרים ביציאה"""
+    import httpx
+    async with httpx.AsyncClient(timeout=httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT), follow_redirects=False) as client:
+        yield client
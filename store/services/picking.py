@@ -0,0 +1,93 @@
+"""
+Warehouse Pick List Service
+שירות רשימת ליקוט - איחוד כמויות מהזמנות ששולמו לפי מיקום במחסן
+"""
+from django.db.models import Case, Count, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from store.models import Order, OrderItem
+
+
+def _paid_orders(date_from, date_to):
+    """הזמנות ששולמו בחלון הזמן המבוקש"""
+    return Order.objects.filter(
+        status='paid',
+        created_at__gte=date_from,
+        created_at__lt=date_to,
+    )
+
+
+def get_pick_list(date_from, date_to):
+    """
+    רשימת ליקוט מאוחדת לכל ההזמנות ששולמו בחלון הזמן - בשאילתה אחת
+    
+    כל שורה מייצגת וריאנט (או מוצר ללא וריאנט) עם הכמות הכוללת לליקוט.
+    השורות ממוינות לפי מיקום התא במחסן כדי ליצור מסלול הליכה רציף,
+    פריטים ללא מיקום מופיעים בסוף הרשימה.
+    
+    Args:
+        date_from: תחילת החלון (כולל)
+        date_to: סוף החלון (לא כולל)
+    
+    Returns:
+        list[dict]: שורות הליקוט
+    """
+    rows = (
+        OrderItem.objects
+        .filter(
+            order__status='paid',
+            order__created_at__gte=date_from,
+            order__created_at__lt=date_to,
+        )
+        .values(
+            'product_id',
+            'product__name',
+            'variant_id',
+            'variant__warehouse_location',
+            'variant__fabric_type__name',
+            'variant__size__display_name',
+        )
+        .annotate(
+            total_quantity=Sum('quantity'),
+            orders_count=Count('order', distinct=True),
+            has_location=Case(
+                When(variant__warehouse_location__gt='', then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ),
+        )
+        .order_by('has_location', 'variant__warehouse_location', 'product__name', 'variant_id')
+    )
+    
+    pick_list = []
+    for row in rows:
+        variant_parts = [
+            part for part in (row['variant__fabric_type__name'], row['variant__size__display_name'])
+            if part
+        ]
+        pick_list.append({
+            'product_id': row['product_id'],
+            'product_name': row['product__name'],
+            'variant_id': row['variant_id'],
+            'variant_display': ', '.join(variant_parts),
+            'warehouse_location': row['variant__warehouse_location'] or '',
+            'quantity': row['total_quantity'],
+            'orders_count': row['orders_count'],
+        })
+    return pick_list
+
+
+def mark_orders_processing(date_from, date_to, generated_at=None):
+    """
+    סימון כל ההזמנות ששולמו בחלון הזמן כ"בליקוט" - UPDATE יחיד
+    
+    generated_at - זמן הפקת רשימת הליקוט. הזמנות שעודכנו אחריו (למשל שולמו
+    אחרי ההדפסה) לא מסומנות, כי הן לא הופיעו ברשימה שהמלקט מחזיק.
+    
+    Returns:
+        int: מספר ההזמנות שסומנו
+    """
+    orders = _paid_orders(date_from, date_to)
+    if generated_at is not None:
+        orders = orders.filter(updated_at__lte=generated_at)
+    return orders.update(status='processing', updated_at=timezone.now())
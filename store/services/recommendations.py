@@ -0,0 +1,150 @@
+"""
+Product Recommendations Service
+שירות המלצות מוצרים ("אולי תאהבו גם") - דמיון בין מוצרים מתוך קניות ורשימות משאלות
+
+הדמיון בין שני מוצרים הוא דמיון קוסינוס בין וקטורי ההופעה שלהם:
+    cos(a, b) = |סלים עם a ו-b| / sqrt(|סלים עם a| * |סלים עם b|)
+כאשר "סל" הוא הזמנה (קנייה משותפת) או משתמש (רשימת משאלות משותפת).
+זהו A^T·A של מטריצת סל×מוצר דלילה, מחושב ישירות מרשימות הזוגות בלי לבנות את המטריצה.
+
+החישוב רץ ב-batch (build_recommendations) ונשמר ב-ProductRecommendation -
+עמוד המוצר קורא את ההמלצות בשאילתה אחת לפי אינדקס (product, rank).
+"""
+import heapq
+import logging
+import math
+from collections import defaultdict
+from itertools import combinations, groupby
+
+from django.db import transaction
+
+from store.models import OrderItem, Product, ProductRecommendation, WishlistItem
+from store.services.analytics import REVENUE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 8
+
+# סל גדול מזה (הזמנה סיטונאית) לא נספר - מעט מידע ועלות ריבועית
+MAX_BASKET_SIZE = 50
+
+
+def _baskets(pairs, max_basket_size):
+    """קיבוץ זוגות (סל, מוצר) ממוינים לפי סל לקבוצות מוצרים"""
+    for basket_id, rows in groupby(pairs, key=lambda row: row[0]):
+        products = {product_id for basket, product_id in rows}
+        if 1 < len(products) <= max_basket_size:
+            yield products
+
+
+def cosine_similarities(baskets):
+    """
+    דמיון קוסינוס בין כל זוג מוצרים שהופיעו יחד לפחות פעם אחת
+    
+    Returns:
+        dict: {מוצר: {מוצר אחר: דמיון}}
+    """
+    occurrences = defaultdict(int)
+    co_occurrences = defaultdict(lambda: defaultdict(int))
+    for products in baskets:
+        for product_id in products:
+            occurrences[product_id] += 1
+        for a, b in combinations(products, 2):
+            co_occurrences[a][b] += 1
+            co_occurrences[b][a] += 1
+    
+    return {
+        a: {b: count / math.sqrt(occurrences[a] * occurrences[b]) for b, count in neighbours.items()}
+        for a, neighbours in co_occurrences.items()
+    }
+
+
+def compute_recommendations(top_k=DEFAULT_TOP_K, purchase_weight=1.0, wishlist_weight=0.5,
+                            max_basket_size=MAX_BASKET_SIZE):
+    """
+    K השכנים הקרובים לכל מוצר פעיל
+    מוצר עם פחות מ-K שכנים מושלם במוצרים מאותה תת-קטגוריה/קטגוריה (ציון 0)
+    
+    Returns:
+        dict: {מוצר: [(מוצר מומלץ, ציון), ...]} לפי סדר יורד
+    """
+    order_pairs = (
+        OrderItem.objects.filter(order__status__in=REVENUE_STATUSES)
+        .order_by('order_id')
+        .values_list('order_id', 'product_id')
+        .iterator(chunk_size=5000)
+    )
+    wishlist_pairs = (
+        WishlistItem.objects.order_by('user_id')
+        .values_list('user_id', 'product_id')
+        .iterator(chunk_size=5000)
+    )
+    signals = [
+        (purchase_weight, cosine_similarities(_baskets(order_pairs, max_basket_size))),
+        (wishlist_weight, cosine_similarities(_baskets(wishlist_pairs, max_basket_size))),
+    ]
+    
+    scores = defaultdict(lambda: defaultdict(float))
+    for weight, similarities in signals:
+        for a, neighbours in similarities.items():
+            for b, similarity in neighbours.items():
+                scores[a][b] += weight * similarity
+    
+    active = list(
+        Product.objects.filter(is_active=True)
+        .order_by('order', '-created_at')
+        .values_list('id', 'category_id', 'subcategory_id')
+    )
+    active_ids = {product_id for product_id, category_id, subcategory_id in active}
+    by_subcategory = defaultdict(list)
+    by_category = defaultdict(list)
+    for product_id, category_id, subcategory_id in active:
+        if subcategory_id:
+            by_subcategory[subcategory_id].append(product_id)
+        if category_id:
+            by_category[category_id].append(product_id)
+    
+    recommendations = {}
+    for product_id, category_id, subcategory_id in active:
+        candidates = ((b, score) for b, score in scores.get(product_id, {}).items() if b in active_ids)
+        neighbours = heapq.nlargest(top_k, candidates, key=lambda item: (item[1], -item[0]))
+        if len(neighbours) < top_k:
+            chosen = {product_id} | {b for b, score in neighbours}
+            for fallback in (by_subcategory.get(subcategory_id, []), by_category.get(category_id, [])):
+                for b in fallback:
+                    if len(neighbours) >= top_k:
+                        break
+                    if b not in chosen:
+                        neighbours.append((b, 0.0))
+                        chosen.add(b)
+        if neighbours:
+            recommendations[product_id] = neighbours
+    return recommendations
+
+
+def rebuild_recommendations(**options):
+    """
+    חישוב מחדש ושמירת כל ההמלצות (מחליף את הטבלה בטרנזקציה אחת)
+    
+    Returns:
+        int: מספר השורות שנשמרו
+    """
+    recommendations = compute_recommendations(**options)
+    rows = [
+        ProductRecommendation(product_id=product_id, recommended_id=recommended_id, rank=rank, score=score)
+        for product_id, neighbours in recommendations.items()
+        for rank, (recommended_id, score) in enumerate(neighbours)
+    ]
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        ProductRecommendation.objects.bulk_create(rows, batch_size=1000)
+    logger.info(f"Recommendations: {len(rows)} rows for {len(recommendations)} products")
+    return len(rows)
+
+
+def get_recommendations(product, limit=DEFAULT_TOP_K):
+    """המוצרים המומלצים לעמוד מוצר - שאילתה אחת לפי (product, rank)"""
+    return (
+        Product.objects.filter(recommended_for__product=product, is_active=True)
+        .order_by('recommended_for__rank')[:limit]
+    )
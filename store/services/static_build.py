@@ -0,0 +1,414 @@
+"""
+Static Build Service
+בניית קבצי ה-static לייצור (python manage.py build_static)
+
+- bundles: איחוד וכיווץ קבצי ה-CSS/JS לפי STATIC_BUNDLES - קובץ אחד לכל סוג במקום שבעה
+- critical CSS: הכללים של ה-top bar, ה-header והניווט (CRITICAL_CSS_NAMES) מוטמעים ב-<head>,
+  וה-CSS המלא נטען בלי לחסום את הרינדור
+- SVG sprite: כל האייקונים ב-STATIC_SPRITE_SOURCES כ-<symbol> בקובץ אחד (icons.svg),
+  כולל אייקוני Font Awesome שהאתר משתמש בהם - במקום ה-CSS והגופן של Font Awesome מ-CDN
+- Heebo: subset של הגופן (עברית ולטינית) כ-woff2 מקומי במקום Google Fonts
+
+הפלט נכתב ל-static/dist עם build.json שמתאר אותו. collectstatic (CompressedManifestStaticFilesStorage)
+מוסיף hash לשמות, ו-WhiteNoise מגיש אותם עם cache-control immutable וגרסאות gzip/brotli מוכנות מראש.
+כשאין build (פיתוח, DEBUG) התבניות טוענות את קבצי המקור ואת האייקונים inline.
+"""
+import hashlib
+import json
+import logging
+import posixpath
+import re
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from glob import glob
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+logger = logging.getLogger(__name__)
+
+BUILD_DIR_NAME = 'dist'
+MANIFEST_NAME = 'build.json'
+SPRITE_NAME = 'icons.svg'
+CRITICAL_CSS_NAME = 'critical.css'
+HEEBO_NAME = 'fonts/heebo.woff2'
+
+SVG_NS = 'http://www.w3.org/2000/svg'
+XLINK_NS = 'http://www.w3.org/1999/xlink'
+ET.register_namespace('', SVG_NS)
+ET.register_namespace('xlink', XLINK_NS)
+
+# עברית, לטינית בסיסית ו-Latin-1, פיסוק כללי, ₪
+HEEBO_UNICODES = [
+    *range(0x0020, 0x007F), *range(0x00A0, 0x0100), *range(0x0590, 0x0600),
+    *range(0x2000, 0x2070), 0x20AA, 0xFB1D, *range(0xFB1F, 0xFB50),
+]
+HEEBO_UNICODE_RANGE = 'U+0020-007E, U+00A0-00FF, U+0590-05FF, U+2000-206F, U+20AA, U+FB1D-FB4F'
+
+_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_NAME_RE = re.compile(r'[.#](-?[_a-zA-Z][\w-]*)')
+_STYLE_RULE_RE = re.compile(r'([^{}]+)\{([^}]*)\}')
+
+
+def build_dir():
+    """static/dist - בתוך תיקיית ה-static הראשית, כך ש-collectstatic אוסף אותו"""
+    return Path(settings.STATICFILES_DIRS[0]) / BUILD_DIR_NAME
+
+
+def _find(path):
+    found = finders.find(path)
+    if not found:
+        raise FileNotFoundError(f'Static file not found: {path}')
+    return Path(found)
+
+
+def _write(relative_path, content):
+    target = build_dir() / relative_path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(content, bytes):
+        target.write_bytes(content)
+    else:
+        target.write_text(content, encoding='utf-8')
+    return f'{BUILD_DIR_NAME}/{relative_path}'
+
+
+# ---------- bundles ----------
+
+def _rebase_css_urls(css, source_path):
+    """כתובות url() יחסיות בקובץ מקור - יחסית לתיקיית ה-build"""
+    source_dir = posixpath.dirname(source_path)
+    
+    def rebase(match):
+        quote, url = match.groups()
+        if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(source_dir, url))
+        return f'url({quote}{posixpath.relpath(target, BUILD_DIR_NAME)}{quote})'
+    
+    return _URL_RE.sub(rebase, css)
+
+
+def build_bundle(name, sources):
+    """איחוד וכיווץ - מחזיר את התוכן המכווץ"""
+    if name.endswith('.css'):
+        import rcssmin
+        parts = [_rebase_css_urls(_find(path).read_text(encoding='utf-8'), path) for path in sources]
+        return rcssmin.cssmin('\n'.join(parts))
+    import rjsmin
+    # ';' בין הקבצים - קובץ שמסתיים בביטוי בלי ';' לא יתחבר לקובץ הבא
+    return ';\n'.join(rjsmin.jsmin(_find(path).read_text(encoding='utf-8')) for path in sources)
+
+
+# ---------- critical CSS ----------
+
+def _css_blocks(css):
+    """
+    הבלוקים ברמה העליונה של CSS מכווץ: (prelude, body)
+    body של at-rule נשאר טקסט (לעיבוד רקורסיבי); הצהרות בלי בלוק (@import) מקבלות body=None
+    """
+    blocks = []
+    depth = 0
+    start = 0
+    brace = 0
+    i = 0
+    while i < len(css):
+        char = css[i]
+        if char in '"\'':
+            end = i + 1
+            while end < len(css) and css[end] != char:
+                end += 2 if css[end] == '\\' else 1
+            i = end + 1
+            continue
+        if char == '{':
+            if depth == 0:
+                brace = i
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((css[start:brace].strip(), css[brace + 1:i]))
+                start = i + 1
+        elif char == ';' and depth == 0:
+            blocks.append((css[start:i].strip(), None))
+            start = i + 1
+        i += 1
+    return blocks
+
+
+def _split_selectors(prelude):
+    """פיצול רשימת selectors לפי פסיקים שאינם בתוך סוגריים (:not(.a, .b))"""
+    selectors, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:i])
+            start = i + 1
+    selectors.append(prelude[start:])
+    return selectors
+
+
+def _is_critical(prelude, names):
+    """
+    כלל קריטי: לפחות selector אחד שכל ה-classes/ids שלו ברשימה
+    (selectors של תגיות בלבד - body, a, img - הם סגנונות הבסיס ונשמרים)
+    """
+    for selector in _split_selectors(prelude):
+        selector = re.sub(r'\[[^\]]*\]', '', selector)
+        if all(name in names for name in _NAME_RE.findall(selector)):
+            return True
+    return False
+
+
+def extract_critical_css(css, names):
+    """הכללים מ-CSS מכווץ שנדרשים לרינדור הראשון של החלק העליון בעמוד"""
+    kept = []
+    for prelude, body in _css_blocks(css):
+        if body is None:
+            continue
+        if prelude.startswith('@'):
+            at_rule = prelude.split(None, 1)[0].lower()
+            if at_rule in ('@media', '@supports'):
+                inner = extract_critical_css(body, names)
+                if inner:
+                    kept.append(f'{prelude}{{{inner}}}')
+            # @font-face מגיע מ-web_fonts, @keyframes לא נדרשים לרינדור הראשון
+            continue
+        if _is_critical(prelude, names):
+            kept.append(f'{prelude}{{{body}}}')
+    return ''.join(kept)
+
+
+# ---------- SVG sprite ----------
+
+def icon_id(path):
+    """שם האייקון ב-sprite: 'images/WATSAPP WHITE.svg' -> 'watsapp-white', אייקוני fontawesome עם 'fa-'"""
+    slug = re.sub(r'[^a-z0-9]+', '-', Path(path).stem.lower()).strip('-')
+    return f'fa-{slug}' if 'fontawesome' in Path(path).parts else slug
+
+
+def sprite_sources():
+    """{שם אייקון: נתיב מקור} לפי STATIC_SPRITE_SOURCES (glob יחסית לתיקיות ה-static)"""
+    sources = {}
+    for pattern in settings.STATIC_SPRITE_SOURCES:
+        for static_dir in settings.STATICFILES_DIRS:
+            for path in sorted(glob(str(Path(static_dir) / pattern))):
+                sources.setdefault(icon_id(path), Path(path))
+    return sources
+
+
+def _parse_svg_styles(root):
+    """
+    כללי <style> של Illustrator ('.cls-1, .cls-2 { fill: none; }') -> {class: {property: value}}
+    ה-classes (cls-1...) חוזרים בכל הקבצים, ולכן ב-sprite הם הופכים ל-style על כל אלמנט
+    """
+    styles = {}
+    for style in root.iter(f'{{{SVG_NS}}}style'):
+        for selectors, declarations in _STYLE_RULE_RE.findall(style.text or ''):
+            properties = dict(
+                (part.split(':', 1)[0].strip(), part.split(':', 1)[1].strip())
+                for part in declarations.split(';') if ':' in part
+            )
+            for selector in selectors.split(','):
+                selector = selector.strip()
+                if selector.startswith('.'):
+                    styles.setdefault(selector[1:], {}).update(properties)
+    return styles
+
+
+def svg_symbol(path, name):
+    """
+    קובץ SVG כ-(viewBox, רשימת אלמנטים) מוכנים ל-<symbol>:
+    בלי <style>/<defs> של סגנונות, עם style inline, ו-ids עם תחילית השם (clippath חוזר בכמה קבצים)
+    """
+    root = ET.parse(path).getroot()
+    view_box = root.get('viewBox') or f"0 0 {root.get('width', '24')} {root.get('height', '24')}"
+    styles = _parse_svg_styles(root)
+    
+    for parent in list(root.iter()):
+        for child in list(parent):
+            if child.tag == f'{{{SVG_NS}}}style':
+                parent.remove(child)
+    for defs in list(root.findall(f'{{{SVG_NS}}}defs')):
+        if len(defs) == 0:
+            root.remove(defs)
+    
+    ids = {element.get('id') for element in root.iter() if element.get('id') and element is not root}
+    for element in root.iter():
+        # ריווח בין אלמנטים (הזחה של Illustrator) - לא חלק מהציור
+        if element.text and not element.text.strip():
+            element.text = None
+        if element.tail and not element.tail.strip():
+            element.tail = None
+        classes = (element.attrib.pop('class', '') or '').split()
+        declarations = {}
+        for css_class in classes:
+            declarations.update(styles.get(css_class, {}))
+        if element.get('style'):
+            declarations.update(
+                (part.split(':', 1)[0].strip(), part.split(':', 1)[1].strip())
+                for part in element.get('style').split(';') if ':' in part
+            )
+        if declarations:
+            element.set('style', ';'.join(f'{key}:{value}' for key, value in declarations.items()))
+        element.attrib.pop('data-name', None)
+        if element is not root and element.get('id') in ids:
+            element.set('id', f"{name}-{element.get('id')}")
+        for attribute, value in list(element.attrib.items()):
+            for old_id in ids:
+                value = value.replace(f'url(#{old_id})', f'url(#{name}-{old_id})')
+                if value == f'#{old_id}':
+                    value = f'#{name}-{old_id}'
+            element.set(attribute, value)
+    return view_box, list(root)
+
+
+def build_sprite(sources):
+    """sprite אחד מכל האייקונים - מחזיר (תוכן SVG, {שם: viewBox})"""
+    sprite = ET.Element(f'{{{SVG_NS}}}svg')
+    view_boxes = {}
+    for name, path in sources.items():
+        view_box, children = svg_symbol(path, name)
+        symbol = ET.SubElement(sprite, f'{{{SVG_NS}}}symbol', {'id': name, 'viewBox': view_box})
+        symbol.extend(children)
+        view_boxes[name] = view_box
+    comment = (
+        '<!-- fa-* icons: Font Awesome Free by @fontawesome - https://fontawesome.com '
+        'License - https://fontawesome.com/license/free (Icons: CC BY 4.0) -->'
+    )
+    return comment + ET.tostring(sprite, encoding='unicode'), view_boxes
+
+
+@lru_cache(maxsize=None)
+def inline_icon(name):
+    """אייקון כ-(viewBox, תוכן SVG) ישירות מקובץ המקור - כשאין sprite בנוי (פיתוח)"""
+    path = sprite_sources().get(name)
+    if path is None:
+        raise KeyError(f'Unknown icon: {name}')
+    view_box, children = svg_symbol(path, name)
+    return view_box, ''.join(ET.tostring(child, encoding='unicode') for child in children)
+
+
+# ---------- fonts ----------
+
+def _font_checksum_error(data):
+    """הודעת שגיאה כשהגופן לא תואם ל-HEEBO_FONT_SHA256, או None"""
+    digest = hashlib.sha256(data).hexdigest()
+    if digest != settings.HEEBO_FONT_SHA256.lower():
+        return f'Heebo checksum mismatch: expected {settings.HEEBO_FONT_SHA256}, got {digest}'
+    return None
+
+
+def fetch_heebo(target):
+    """
+    הורדת קובץ המקור של Heebo (variable font) מ-commit קבוע של google/fonts
+    בלי HEEBO_FONT_REVISION ו-HEEBO_FONT_SHA256 לא מורידים - כך הגופן לא משתנה בלי שינוי בקוד
+    """
+    if not settings.HEEBO_FONT_REVISION or not settings.HEEBO_FONT_SHA256:
+        raise ValueError('HEEBO_FONT_REVISION and HEEBO_FONT_SHA256 must be set to download Heebo')
+    import httpx
+    response = httpx.get(settings.HEEBO_FONT_URL, follow_redirects=True, timeout=60)
+    response.raise_for_status()
+    error = _font_checksum_error(response.content)
+    if error:
+        raise ValueError(error)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(response.content)
+
+
+def subset_font(source, unicodes):
+    """subset של גופן ל-woff2 עם התווים שצוינו בלבד - מחזיר את הבייטים"""
+    import io
+    from fontTools import subset
+    
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    options.name_IDs = ['*']
+    font = subset.load_font(str(source), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=unicodes)
+    subsetter.subset(font)
+    output = io.BytesIO()
+    subset.save_font(font, output, options)
+    return output.getvalue()
+
+
+def font_face_css(url):
+    """@font-face של Heebo - מוטמע ב-<head> יחד עם preload לקובץ (web_fonts)"""
+    return (
+        "@font-face{font-family:'Heebo';font-style:normal;font-weight:100 900;font-display:swap;"
+        f"src:url({url}) format('woff2');unicode-range:{HEEBO_UNICODE_RANGE}}}"
+    )
+
+
+# ---------- build ----------
+
+def build(fetch_fonts=False, log=logger.info):
+    """
+    בניית כל הפלט ל-static/dist וכתיבת build.json
+    
+    Args:
+        fetch_fonts: הורדת Heebo אם קובץ המקור (HEEBO_FONT_SOURCE) חסר
+        log: פונקציה לדיווח התקדמות
+    
+    Returns:
+        dict: תוכן build.json
+    """
+    manifest = {'bundles': {}, 'critical_css': None, 'sprite': None, 'icons': {}, 'fonts': {}}
+    
+    heebo_source = Path(settings.HEEBO_FONT_SOURCE)
+    if not heebo_source.exists() and fetch_fonts:
+        try:
+            fetch_heebo(heebo_source)
+        except Exception as e:
+            log(f'Heebo download failed, keeping Google Fonts: {e}')
+    # קובץ שהוכנס ידנית נבדק מול ה-checksum כשהוא מוגדר
+    error = None
+    if heebo_source.exists() and settings.HEEBO_FONT_SHA256:
+        error = _font_checksum_error(heebo_source.read_bytes())
+    if error:
+        log(f'{HEEBO_NAME}: skipped, {error}')
+    elif heebo_source.exists():
+        data = subset_font(heebo_source, HEEBO_UNICODES)
+        manifest['fonts']['heebo'] = _write(HEEBO_NAME, data)
+        log(f'{HEEBO_NAME}: {heebo_source.stat().st_size // 1024}KB -> {len(data) // 1024}KB')
+    else:
+        log(f'{HEEBO_NAME}: skipped, no font source at {heebo_source}')
+    
+    for name, sources in settings.STATIC_BUNDLES.items():
+        content = build_bundle(name, sources)
+        manifest['bundles'][name] = _write(name, content)
+        source_size = sum(_find(path).stat().st_size for path in sources)
+        log(f'{name}: {len(sources)} files, {source_size // 1024}KB -> {len(content.encode()) // 1024}KB')
+        
+        if name == settings.CRITICAL_CSS_BUNDLE:
+            critical = extract_critical_css(content, set(settings.CRITICAL_CSS_NAMES))
+            manifest['critical_css'] = _write(CRITICAL_CSS_NAME, critical)
+            log(f'{CRITICAL_CSS_NAME}: {len(critical.encode()) // 1024}KB inlined in <head>')
+    
+    sources = sprite_sources()
+    sprite, manifest['icons'] = build_sprite(sources)
+    manifest['sprite'] = _write(SPRITE_NAME, sprite)
+    log(f'{SPRITE_NAME}: {len(sources)} icons, {len(sprite.encode()) // 1024}KB')
+    
+    _write(MANIFEST_NAME, json.dumps(manifest, indent=2))
+    load_manifest.cache_clear()
+    return manifest
+
+
+@lru_cache(maxsize=None)
+def load_manifest():
+    """build.json של ה-build האחרון, או None אם אין build או ש-STATIC_USE_BUILD כבוי"""
+    if not settings.STATIC_USE_BUILD:
+        return None
+    path = build_dir() / MANIFEST_NAME
+    if not path.exists():
+        return None
+    manifest = json.loads(path.read_text(encoding='utf-8'))
+    if manifest.get('critical_css'):
+        manifest['critical_css_text'] = (build_dir().parent / manifest['critical_css']).read_text(encoding='utf-8')
+    return manifest
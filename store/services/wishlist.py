@@ -0,0 +1,246 @@
+"""
+Wishlist Service
+שירות רשימת משאלות - קבוצת המוצרים של כל משתמש נשמרת ב-cache
+
+הקבוצה נשמרת כמערך מספרים דחוס (4 בתים למוצר) ונקראת פעם אחת לכל בקשה,
+כך שבדיקת "המוצר ברשימה?" וספירת הפריטים לא ניגשות למסד הנתונים.
+הוספה/הסרה מעדכנות את הקבוצה במקום, בלי לבנות אותה מחדש.
+
+לאורחים הרשימה נשמרת ב-cookie חתום (GuestWishlist) - בלי שורות במסד הנתונים,
+ובהתחברות היא מאוחדת לרשימת המשתמש ב-bulk_create אחד.
+"""
+from array import array
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from store.cache import CacheNamespace
+from store.models import Product, WishlistItem
+
+# הקבוצה נבנית מחדש מהמסד לכל היותר פעם ביום (למקרה של שינוי שלא עבר דרך השירות)
+CACHE_TTL = 60 * 60 * 24
+WISHLIST_CACHE = CacheNamespace('wishlist', timeout=CACHE_TTL, versioned=False)
+
+GUEST_WISHLIST_COOKIE = 'guest_wishlist'
+GUEST_WISHLIST_COOKIE_SALT = 'store.guest_wishlist'
+GUEST_WISHLIST_MAX_AGE = 60 * 60 * 24 * 90  # 90 יום
+GUEST_WISHLIST_MAX_ITEMS = 200  # שומר על ה-cookie מתחת למגבלת 4KB
+
+
+class GuestWishlist:
+    """
+    רשימת משאלות של אורח ב-cookie חתום
+    
+    פורמט דחוס: מזהי המוצרים מופרדים בנקודה ("12.40.7"), לפי סדר ההוספה.
+    ה-cookie נכתב לתגובה ע"י GuestWishlistMiddleware, ורק אם הרשימה השתנתה.
+    """
+    
+    def __init__(self, request):
+        self.request = request
+        self.modified = False
+        self.product_ids = self._load()
+    
+    def _load(self):
+        try:
+            value = signing.loads(
+                self.request.COOKIES.get(GUEST_WISHLIST_COOKIE, ''),
+                salt=GUEST_WISHLIST_COOKIE_SALT,
+                max_age=GUEST_WISHLIST_MAX_AGE,
+            )
+            return [int(product_id) for product_id in value.split('.') if product_id]
+        except (signing.BadSignature, AttributeError, ValueError):
+            return []
+    
+    def write(self, response):
+        """כתיבת הרשימה לתגובה, או מחיקת ה-cookie כשהיא ריקה"""
+        if not self.product_ids:
+            response.delete_cookie(GUEST_WISHLIST_COOKIE, samesite='Lax')
+            return
+        response.set_cookie(
+            GUEST_WISHLIST_COOKIE,
+            signing.dumps('.'.join(map(str, self.product_ids)), salt=GUEST_WISHLIST_COOKIE_SALT),
+            max_age=GUEST_WISHLIST_MAX_AGE,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite='Lax',
+        )
+    
+    def add(self, product_ids):
+        new_ids = [product_id for product_id in dict.fromkeys(product_ids) if product_id not in self.product_ids]
+        if len(self.product_ids) + len(new_ids) > GUEST_WISHLIST_MAX_ITEMS:
+            raise ValueError(f'ניתן לשמור עד {GUEST_WISHLIST_MAX_ITEMS} מוצרים ברשימת המשאלות')
+        if new_ids:
+            self.product_ids = self.product_ids + new_ids
+            self.modified = True
+    
+    def remove(self, product_ids):
+        product_ids = set(product_ids)
+        remaining = [product_id for product_id in self.product_ids if product_id not in product_ids]
+        if len(remaining) != len(self.product_ids):
+            self.product_ids = remaining
+            self.modified = True
+    
+    def clear(self):
+        if self.product_ids:
+            self.product_ids = []
+            self.modified = True
+
+
+def get_guest_wishlist(request):
+    """רשימת האורח של הבקשה (נשמרת על ה-request כדי שה-middleware יכתוב אותה)"""
+    if getattr(request, '_guest_wishlist', None) is None:
+        request._guest_wishlist = GuestWishlist(request)
+    return request._guest_wishlist
+
+
+def _cache_key(user_id):
+    return WISHLIST_CACHE.key(user_id)
+
+
+def _encode(product_ids):
+    return array('I', sorted(product_ids)).tobytes()
+
+
+def _decode(data):
+    ids = array('I')
+    ids.frombytes(data)
+    return frozenset(ids)
+
+
+def _load(user_id):
+    """קבוצת המוצרים מה-cache, ואם אין - מהמסד (ושמירה ב-cache)"""
+    data = cache.get(_cache_key(user_id))
+    if data is not None:
+        return _decode(data)
+    product_ids = frozenset(WishlistItem.objects.filter(user_id=user_id).values_list('product_id', flat=True))
+    cache.set(_cache_key(user_id), _encode(product_ids), CACHE_TTL)
+    return product_ids
+
+
+def _store(request, product_ids):
+    request._wishlist_ids = product_ids
+    if request.user.is_authenticated:
+        cache.set(_cache_key(request.user.pk), _encode(product_ids), CACHE_TTL)
+
+
+def get_wishlist_ids(request):
+    """
+    מזהי המוצרים ברשימת המשאלות - של המשתמש המחובר, או של האורח מה-cookie
+    נשמר על ה-request - קריאה אחת ל-cache גם כשה-view וה-context processor צריכים אותו
+    
+    Returns:
+        frozenset: מזהי מוצרים
+    """
+    if not hasattr(request, '_wishlist_ids'):
+        if request.user.is_authenticated:
+            request._wishlist_ids = _load(request.user.pk)
+        else:
+            request._wishlist_ids = frozenset(get_guest_wishlist(request).product_ids)
+    return request._wishlist_ids
+
+
+def toggle_wishlist(request, product_id):
+    """
+    הוספה/הסרה של מוצר - מחיקה, ואם לא נמחק דבר הכנסה (ללא שאילתת בדיקה מקדימה)
+    
+    Returns:
+        bool: True אם המוצר נוסף, False אם הוסר
+    """
+    product_ids = get_wishlist_ids(request)
+    if not request.user.is_authenticated:
+        added = product_id not in product_ids
+        update_wishlist(request, add=[product_id] if added else [], remove=[] if added else [product_id])
+        return added
+    
+    deleted, _ = WishlistItem.objects.filter(user=request.user, product_id=product_id).delete()
+    if deleted:
+        _store(request, product_ids - {product_id})
+        return False
+    
+    # ignore_conflicts - לחיצה כפולה מקבילה לא תיכשל על unique_together
+    WishlistItem.objects.bulk_create([WishlistItem(user=request.user, product_id=product_id)], ignore_conflicts=True)
+    _store(request, product_ids | {product_id})
+    return True
+
+
+def remove_from_wishlist(request, product_id):
+    """
+    הסרת מוצר מהרשימה
+    
+    Returns:
+        bool: האם המוצר היה ברשימה
+    """
+    if not request.user.is_authenticated:
+        was_listed = product_id in get_wishlist_ids(request)
+        update_wishlist(request, remove=[product_id])
+        return was_listed
+    
+    product_ids = get_wishlist_ids(request)
+    deleted, _ = WishlistItem.objects.filter(user=request.user, product_id=product_id).delete()
+    _store(request, product_ids - {product_id})
+    return bool(deleted)
+
+
+def update_wishlist(request, add=(), remove=()):
+    """
+    הוספה והסרה של כמה מוצרים בבת אחת (API הסנכרון)
+    מוצרים שלא קיימים או לא פעילים לא נוספים
+    
+    Returns:
+        frozenset: מזהי המוצרים אחרי העדכון
+    
+    Raises:
+        ValueError: חריגה ממגבלת הגודל של רשימת אורח
+    """
+    product_ids = get_wishlist_ids(request)
+    add = set(add) - product_ids
+    remove = set(remove) & product_ids
+    if add:
+        add = set(Product.objects.filter(id__in=add, is_active=True).values_list('id', flat=True))
+    
+    if not request.user.is_authenticated:
+        guest_wishlist = get_guest_wishlist(request)
+        guest_wishlist.remove(remove)
+        guest_wishlist.add(sorted(add))
+        _store(request, frozenset(guest_wishlist.product_ids))
+        return request._wishlist_ids
+    
+    if remove:
+        WishlistItem.objects.filter(user=request.user, product_id__in=remove).delete()
+    if add:
+        WishlistItem.objects.bulk_create(
+            [WishlistItem(user=request.user, product_id=product_id) for product_id in add], ignore_conflicts=True
+        )
+    if add or remove:
+        _store(request, (product_ids - remove) | add)
+    return request._wishlist_ids
+
+
+def merge_guest_wishlist_on_login(request, user):
+    """
+    איחוד רשימת האורח לרשימת המשתמש שהתחבר - הכנסה אחת, כפילויות מדולגות
+    
+    Returns:
+        int: מספר המוצרים שנשלחו לאיחוד
+    """
+    guest_wishlist = get_guest_wishlist(request)
+    if not guest_wishlist.product_ids:
+        return 0
+    
+    product_ids = list(
+        Product.objects.filter(id__in=guest_wishlist.product_ids).values_list('id', flat=True)
+    )
+    WishlistItem.objects.bulk_create(
+        [WishlistItem(user=user, product_id=product_id) for product_id in product_ids], ignore_conflicts=True
+    )
+    invalidate_wishlists([user.pk])
+    guest_wishlist.clear()
+    if hasattr(request, '_wishlist_ids'):
+        del request._wishlist_ids
+    return len(product_ids)
+
+
+def invalidate_wishlists(user_ids):
+    """מחיקת הקבוצות השמורות - אחרי שינוי שלא עבר דרך השירות (למשל מחיקת מוצר)"""
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
@@ -0,0 +1,101 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    BelowBestsellersGallery, Category, FabricType, InstagramGallery, MaterialCareInfo, Product, ProductVariant,
+    RetailerStore, SiteSettings, Size, WishlistItem
+)
+from .services.cart import merge_guest_cart_on_login
+from .services.facets import invalidate_facets
+from .services.home_sections import invalidate_home_sections
+from .services.wishlist import invalidate_wishlists, merge_guest_wishlist_on_login
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    """
+    איחוד עגלת האורח לעגלת המשתמש בעת התחברות
+    """
+    if request is None or not hasattr(request, 'session'):
+        return
+    merge_guest_cart_on_login(request, user)
+
+
+@receiver(user_logged_in)
+def merge_wishlist_on_login(sender, request, user, **kwargs):
+    """
+    איחוד רשימת המשאלות של האורח לרשימת המשתמש בעת התחברות
+    """
+    if request is None:
+        return
+    merge_guest_wishlist_on_login(request, user)
+
+
+@receiver(pre_delete, sender=Product)
+def invalidate_wishlists_on_product_delete(sender, instance, **kwargs):
+    """
+    מחיקת מוצר מוחקת אותו מרשימות המשאלות - הקבוצות השמורות של המשתמשים ייבנו מחדש
+    """
+    invalidate_wishlists(WishlistItem.objects.filter(product=instance).values_list('user_id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=WishlistItem)
+def invalidate_wishlist_on_change(sender, instance, **kwargs):
+    """
+    שינוי בפריט שלא עבר דרך השירות (למשל בפאנל הניהול) - הקבוצה השמורה של המשתמש תיבנה מחדש
+    """
+    invalidate_wishlists([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductVariant)
+@receiver([post_save, post_delete], sender=Size)
+@receiver([post_save, post_delete], sender=FabricType)
+def invalidate_facets_on_change(sender, **kwargs):
+    """
+    שינוי במוצרים או במאפיינים שלהם - ספירות הסינון השמורות נבנות מחדש
+    """
+    invalidate_facets()
+
+
+@receiver([post_save, post_delete], sender=SiteSettings)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductVariant)
+@receiver([post_save, post_delete], sender=BelowBestsellersGallery)
+@receiver([post_save, post_delete], sender=RetailerStore)
+@receiver([post_save, post_delete], sender=InstagramGallery)
+def invalidate_home_sections_on_change(sender, **kwargs):
+    """
+    שינוי בתוכן של עמוד הבית - רק הסקשנים שתלויים במודל שהשתנה נבנים מחדש
+    """
+    invalidate_home_sections(sender)
+
+
+@receiver(post_save, sender=Size)
+@receiver(post_save, sender=FabricType)
+def touch_variants_on_attribute_change(sender, instance, **kwargs):
+    """
+    שינוי במידה או בסוג בד - חותמת השינוי של הוריאנטים שלהם מתעדכנת (ETag של עמודי המוצר)
+    """
+    field = 'size' if sender is Size else 'fabric_type'
+    ProductVariant.objects.filter(**{field: instance}).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=MaterialCareInfo)
+@receiver(pre_delete, sender=MaterialCareInfo)
+def touch_products_on_material_change(sender, instance, **kwargs):
+    """
+    שינוי או מחיקה של הרכב חומרים - חותמת השינוי של המוצרים שמציגים אותו מתעדכנת
+    """
+    Product.objects.filter(material_care_info=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=ProductVariant)
+def touch_product_on_variant_delete(sender, instance, **kwargs):
+    """
+    מחיקת וריאנט לא מזיזה את MAX(updated_at) של הוריאנטים - ה-Last-Modified של ה-API נלקח מהמוצר
+    """
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
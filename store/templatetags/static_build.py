@@ -0,0 +1,85 @@
+"""
+Static build template tags - קבצי ה-build (static/dist) בתבניות
+
+    {% load static_build %}
+    {% web_fonts %}              Heebo מקומי (preload + @font-face), או Google Fonts כשאין build
+    {% bundle 'site.css' %}      critical CSS inline וה-bundle בטעינה לא חוסמת, או קבצי המקור
+    {% bundle 'site.js' %}       ה-bundle, או קבצי המקור
+    {% icon 'fa-check' %}        אייקון מה-sprite (<svg><use>), או inline מקובץ המקור
+"""
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from store.services.static_build import font_face_css, inline_icon, load_manifest
+
+register = template.Library()
+
+GOOGLE_FONTS_URL = 'https://fonts.googleapis.com/css2?family=Heebo:wght@300;400;500;600;700&display=swap'
+
+
+@register.simple_tag
+def web_fonts():
+    """הגופן של האתר - מקומי מה-build, אחרת מ-Google Fonts"""
+    manifest = load_manifest()
+    font = manifest and manifest['fonts'].get('heebo')
+    if font:
+        url = static(font)
+        return format_html(
+            '<link rel="preload" href="{}" as="font" type="font/woff2" crossorigin>\n    <style>{}</style>',
+            url, mark_safe(font_face_css(url)),
+        )
+    return format_html(
+        '<link rel="preconnect" href="https://fonts.googleapis.com">\n'
+        '    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>\n'
+        '    <link href="{}" rel="stylesheet">',
+        GOOGLE_FONTS_URL,
+    )
+
+
+@register.simple_tag
+def bundle(name):
+    """תגיות הטעינה של bundle מ-STATIC_BUNDLES"""
+    manifest = load_manifest()
+    if manifest is None or name not in manifest['bundles']:
+        tag = '<link rel="stylesheet" href="{}">' if name.endswith('.css') else '<script src="{}"></script>'
+        return format_html_join('\n    ', tag, ((static(path),) for path in settings.STATIC_BUNDLES[name]))
+    
+    url = static(manifest['bundles'][name])
+    if name.endswith('.js'):
+        return format_html('<script src="{}"></script>', url)
+    if name == settings.CRITICAL_CSS_BUNDLE and manifest.get('critical_css_text') is not None:
+        return format_html(
+            '<style>{}</style>\n'
+            '    <link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+            '    <noscript><link rel="stylesheet" href="{}"></noscript>',
+            mark_safe(manifest['critical_css_text']), url, url,
+        )
+    return format_html('<link rel="stylesheet" href="{}">', url)
+
+
+@register.simple_tag
+def icon(name, css_class='icon', label=''):
+    """
+    אייקון SVG
+    
+    Args:
+        name: שם האייקון ב-sprite ('watsapp-white', 'fa-check' - ראו icon_id)
+        css_class: class של ה-<svg> (ברירת מחדל 'icon' - בגודל הטקסט ובצבע שלו)
+        label: טקסט חלופי; בלעדיו האייקון דקורטיבי ומוסתר מקוראי מסך
+    """
+    if label:
+        attributes = format_html('role="img" aria-label="{}"', label)
+    else:
+        attributes = mark_safe('aria-hidden="true" focusable="false"')
+    
+    manifest = load_manifest()
+    if manifest and name in manifest['icons']:
+        return format_html(
+            '<svg class="{}" viewBox="{}" {}><use href="{}#{}"></use></svg>',
+            css_class, manifest['icons'][name], attributes, static(manifest['sprite']), name,
+        )
+    view_box, content = inline_icon(name)
+    return format_html('<svg class="{}" viewBox="{}" {}>{}</svg>', css_class, view_box, attributes, mark_safe(content))
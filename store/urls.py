@@ -14,6 +14,7 @@ urlpatterns = [
     # Cart URLs
     path('cart/', views.cart_view, name='cart'),
     path('cart/data/', views.cart_data, name='cart_data'),
+    path('cart/mutate/', views.cart_mutate, name='cart_mutate'),
     path('cart/add/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
     path('cart/update/<int:item_id>/', views.cart_update_quantity, name='cart_update_quantity'),
     path('cart/remove/<int:item_id>/', views.cart_remove_item, name='cart_remove_item'),
@@ -33,6 +34,7 @@ urlpatterns = [
     path('wishlist/', views.wishlist_view, name='wishlist'),
     path('wishlist/toggle/<int:product_id>/', views.wishlist_toggle, name='wishlist_toggle'),
     path('wishlist/remove/<int:product_id>/', views.wishlist_remove, name='wishlist_remove'),
+    path('wishlist/sync/', views.wishlist_sync, name='wishlist_sync'),
     
     # Blog URLs
     path('blog/', views.blog_list, name='blog_list'),
@@ -1,25 +1,48 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib import messages
-from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
+from django.db import transaction
 from django.db.models import Q
 from django.conf import settings
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from decimal import Decimal
 import json
 import uuid
-import requests
-import resend
+from asgiref.sync import sync_to_async
 from .models import (
-    Product, Category, Subcategory, SiteSettings, ProductImage, 
-    Cart, CartItem, ContactMessage, WishlistItem, Order, OrderItem, 
-    BelowBestsellersGallery, RetailerStore, InstagramGallery,
+    Product, Category, Subcategory, ProductImage, 
+    ContactMessage, WishlistItem, Order, OrderItem, 
     FabricType, ProductVariant, AboutPageSettings, FAQ, BlogPost,
-    NewsletterSubscriber, Coupon
+    NewsletterSubscriber
 )
 import string
 import random
 from .forms import ContactForm, CheckoutForm
+from .services.cart import get_cart, apply_cart_operations, CartOperationError
+from .services.campaigns import generate_unique_codes
+from .services.wishlist import (
+    get_guest_wishlist, get_wishlist_ids, toggle_wishlist, remove_from_wishlist, update_wishlist
+)
+from .services.facets import FacetFilters, get_facets
+from .services.recommendations import get_recommendations
+from .services.home_sections import render_home_sections, server_timing_header
+from .services.emails import (
+    asend_email, send_order_confirmation_email, asend_order_confirmation_email,
+    contact_notification_message, newsletter_welcome_message
+)
+from .services.http_client import async_client
+from .services.conditional import (
+    PAGE_CACHE_CONTROL, VARIANTS_CACHE_CONTROL, SEARCH_CACHE_CONTROL,
+    product_detail_etag, category_detail_etag, blog_detail_etag,
+    product_variants_etag, product_variants_last_modified, search_etag, search_last_modified
+)
+from .services.coupons import (
+    normalize_code, validate_coupon, remember_coupon, forget_coupon, get_applied_coupon,
+    reserve_coupon, redeem_coupon, release_coupon, CouponUnavailable
+)
 
 
 def coming_soon(request):
@@ -31,48 +54,27 @@ def coming_soon(request):
 
 def home(request):
     """
-    עמוד הבית
+    עמוד הבית - מורכב מסקשנים שכל אחד נשמר ב-cache ומתבטל בנפרד
     """
-    featured_products = Product.objects.filter(is_active=True, is_featured=True)[:8]
-    
-    # Fetch bestseller products (limited to 4)
-    bestseller_products = Product.objects.filter(is_active=True, is_bestseller=True)[:4]
-    
-    # Fetch all active categories for navigation and gallery
-    categories = Category.objects.filter(is_active=True)
-    
-    site_settings = SiteSettings.get_settings()
-    
-    # Get gallery below bestsellers
-    below_bestsellers_gallery = BelowBestsellersGallery.get_gallery()
-    
-    # Get retailer stores (active only, ordered)
-    retailer_stores = RetailerStore.objects.filter(is_active=True).order_by('order', 'name')
-    
-    # Get Instagram gallery
-    instagram_gallery = InstagramGallery.get_gallery()
-    
     # Get wishlist product IDs for logged-in users
-    wishlist_product_ids = []
-    if request.user.is_authenticated:
-        wishlist_product_ids = list(
-            WishlistItem.objects.filter(user=request.user).values_list('product_id', flat=True)
-        )
+    wishlist_product_ids = get_wishlist_ids(request)
+    
+    sections, data, timings = render_home_sections({'wishlist_product_ids': wishlist_product_ids})
     
     context = {
-        'featured_products': featured_products,
-        'bestseller_products': bestseller_products,
-        'categories': categories,
-        'site_settings': site_settings,
-        'below_bestsellers_gallery': below_bestsellers_gallery,
-        'retailer_stores': retailer_stores,
-        'instagram_gallery': instagram_gallery,
+        'sections': sections,
+        # Categories are also used by the navigation in base.html
+        'categories': data['categories'],
         'wishlist_product_ids': wishlist_product_ids,
     }
     
-    return render(request, 'store/home.html', context)
+    response = render(request, 'store/home.html', context)
+    response['Server-Timing'] = server_timing_header(timings)
+    return response
 
 
+@cache_control(**PAGE_CACHE_CONTROL)
+@condition(etag_func=product_detail_etag)
 def product_detail(request, slug):
     """
     עמוד מוצר בודד
@@ -174,6 +176,7 @@ def product_detail(request, slug):
         'show_fabric_selector': show_fabric_selector,
         'price_display_initial': price_display_initial,
         'categories': categories,
+        'recommended_products': get_recommendations(product, limit=4),
     }
     
     return render(request, 'store/product_detail.html', context)
@@ -227,28 +230,26 @@ def add_to_cart(request, product_id):
         messages.error(request, error_msg)
         return redirect('product_detail', slug=product.slug)
     
-    # קבלת או יצירת סל קניות
-    cart = get_or_create_cart(request)
+    # קבלת סל קניות (לאורח - עגלה ב-cookie, בלי סשן ובלי שורות במסד הנתונים)
+    cart = get_cart(request)
     
-    # הוספה או עדכון פריט בסל
-    cart_item, item_created = CartItem.objects.get_or_create(
-        cart=cart,
-        product=product,
-        variant=variant,
-        defaults={'quantity': quantity}
-    )
+    # בדיקה שהכמות הכוללת בסל לא עוברת את המלאי
+    new_quantity = cart.quantity_of(product, variant) + quantity
+    if new_quantity > product.stock_quantity:
+        error_msg = f'הכמות הכוללת גדולה מהמלאי הזמין ({product.stock_quantity})'
+        if is_ajax:
+            return JsonResponse({'success': False, 'error': error_msg})
+        messages.error(request, error_msg)
+        return redirect('product_detail', slug=product.slug)
     
-    if not item_created:
-        # הפריט כבר קיים בסל - עדכון הכמות
-        new_quantity = cart_item.quantity + quantity
-        if new_quantity > product.stock_quantity:
-            error_msg = f'הכמות הכוללת גדולה מהמלאי הזמין ({product.stock_quantity})'
-            if is_ajax:
-                return JsonResponse({'success': False, 'error': error_msg})
-            messages.error(request, error_msg)
-            return redirect('product_detail', slug=product.slug)
-        cart_item.quantity = new_quantity
-        cart_item.save()
+    # הוספה או עדכון פריט בסל
+    try:
+        cart.add(product, variant, quantity)
+    except ValueError as e:
+        if is_ajax:
+            return JsonResponse({'success': False, 'error': str(e)})
+        messages.error(request, str(e))
+        return redirect('product_detail', slug=product.slug)
     
     # Success response
     success_msg = f'המוצר "{product.name}"'
@@ -267,6 +268,8 @@ def add_to_cart(request, product_id):
     return redirect('product_detail', slug=product.slug)
 
 
+@cache_control(**PAGE_CACHE_CONTROL)
+@condition(etag_func=category_detail_etag)
 def category_detail(request, slug):
     """
     עמוד קטגוריה - הצגת תת-קטגוריות או מוצרים
@@ -294,15 +297,11 @@ def category_detail(request, slug):
     # אין תת-קטגוריות - להציג מוצרים
     products = Product.objects.filter(category=category, is_active=True).prefetch_related('images')
     
-    # סינון לפי מין
+    # סינון לפי מין, מידה, בד, טווח מחיר ומלאי ("שניהם" = ללא סינון מין)
     gender_filter = request.GET.get('gender', '')
-    if gender_filter:
-        if gender_filter == 'both':
-            # אם "שניהם", נציג את כל המוצרים
-            pass
-        else:
-            # סינון לפי מין ספציפי
-            products = products.filter(gender__in=[gender_filter, 'both'])
+    filters = FacetFilters.from_request(request)
+    facets = get_facets(f'c{category.id}', products, filters)
+    products = filters.apply(products)
     
     # מיון לפי מחיר
     price_sort = request.GET.get('price', '')
@@ -315,11 +314,7 @@ def category_detail(request, slug):
         products = products.order_by('order', '-created_at')
     
     # קבלת מוצרים ב-wishlist של המשתמש (אם מחובר)
-    wishlist_product_ids = []
-    if request.user.is_authenticated:
-        wishlist_product_ids = list(
-            WishlistItem.objects.filter(user=request.user).values_list('product_id', flat=True)
-        )
+    wishlist_product_ids = get_wishlist_ids(request)
     
     # קבלת קטגוריות לניווט
     categories = Category.objects.filter(is_active=True)
@@ -330,6 +325,8 @@ def category_detail(request, slug):
         'has_subcategories': False,
         'current_gender': gender_filter,
         'current_price_sort': price_sort,
+        'facets': facets,
+        'facet_filters': filters,
         'categories': categories,
         'wishlist_product_ids': wishlist_product_ids,
     }
@@ -352,15 +349,11 @@ def subcategory_detail(request, category_slug, subcategory_slug):
     # קבלת מוצרים של התת-קטגוריה
     products = Product.objects.filter(subcategory=subcategory, is_active=True).prefetch_related('images')
     
-    # סינון לפי מין
+    # סינון לפי מין, מידה, בד, טווח מחיר ומלאי ("שניהם" = ללא סינון מין)
     gender_filter = request.GET.get('gender', '')
-    if gender_filter:
-        if gender_filter == 'both':
-            # אם "שניהם", נציג את כל המוצרים
-            pass
-        else:
-            # סינון לפי מין ספציפי
-            products = products.filter(gender__in=[gender_filter, 'both'])
+    filters = FacetFilters.from_request(request)
+    facets = get_facets(f's{subcategory.id}', products, filters)
+    products = filters.apply(products)
     
     # מיון לפי מחיר
     price_sort = request.GET.get('price', '')
@@ -373,11 +366,7 @@ def subcategory_detail(request, category_slug, subcategory_slug):
         products = products.order_by('order', '-created_at')
     
     # קבלת מוצרים ב-wishlist של המשתמש (אם מחובר)
-    wishlist_product_ids = []
-    if request.user.is_authenticated:
-        wishlist_product_ids = list(
-            WishlistItem.objects.filter(user=request.user).values_list('product_id', flat=True)
-        )
+    wishlist_product_ids = get_wishlist_ids(request)
     
     # קבלת קטגוריות לניווט
     categories = Category.objects.filter(is_active=True)
@@ -388,6 +377,8 @@ def subcategory_detail(request, category_slug, subcategory_slug):
         'products': products,
         'current_gender': gender_filter,
         'current_price_sort': price_sort,
+        'facets': facets,
+        'facet_filters': filters,
         'categories': categories,
         'wishlist_product_ids': wishlist_product_ids,
     }
@@ -395,44 +386,21 @@ def subcategory_detail(request, category_slug, subcategory_slug):
     return render(request, 'store/subcategory_detail.html', context)
 
 
-def contact(request):
+async def contact(request):
     """
-    דף צור קשר
+    דף צור קשר (אסינכרוני - שליחת המייל לא חוסמת worker)
     """
     # קבלת קטגוריות לניווט
-    categories = Category.objects.filter(is_active=True)
+    categories = [category async for category in Category.objects.filter(is_active=True)]
     
     if request.method == 'POST':
         form = ContactForm(request.POST)
-        if form.is_valid():
-            contact_message = form.save()
+        if await sync_to_async(form.is_valid)():
+            contact_message = await sync_to_async(form.save)()
             
             # שליחת מייל לבעל האתר דרך Resend API
             try:
-                resend.api_key = settings.RESEND_API_KEY
-                
-                html_content = f'''
-                <div dir="rtl" style="font-family: Arial, sans-serif;">
-                    <h2>פנייה חדשה מטופס צור קשר</h2>
-                    <p><strong>שם:</strong> {contact_message.full_name}</p>
-                    <p><strong>טלפון:</strong> <a href="tel:{contact_message.phone}">{contact_message.phone}</a></p>
-                    <p><strong>אימייל:</strong> <a href="mailto:{contact_message.email}">{contact_message.email}</a></p>
-                    <p><strong>מספר הזמנה:</strong> {contact_message.order_number or 'לא צוין'}</p>
-                    <hr>
-                    <p><strong>תוכן הפנייה:</strong></p>
-                    <p>{contact_message.inquiry}</p>
-                    <hr>
-                    <p style="color: gray; font-size: 12px;">הודעה זו נשלחה אוטומטית מאתר Arye Boutique</p>
-                </div>
-                '''
-                
-                resend.Emails.send({
-                    "from": settings.DEFAULT_FROM_EMAIL,
-                    "to": [settings.CONTACT_EMAIL],
-                    "subject": f"פנייה חדשה מ-{contact_message.full_name}",
-                    "html": html_content,
-                    "reply_to": contact_message.email,
-                })
+                await asend_email(contact_notification_message(contact_message))
             except Exception as e:
                 # אם יש בעיה במייל, ההודעה עדיין נשמרת בDB
                 print(f'Error sending contact email: {e}')
@@ -449,7 +417,8 @@ def contact(request):
         'categories': categories,
     }
     
-    return render(request, 'store/contact.html', context)
+    # context processors (עגלה, רשימת משאלות) ניגשים למסד הנתונים
+    return await sync_to_async(render)(request, 'store/contact.html', context)
 
 
 def about_us(request):
@@ -532,14 +501,20 @@ def shipping_and_returns(request):
     return render(request, 'store/shipping.html', context)
 
 
-@login_required
 def wishlist_view(request):
     """
     דף רשימת המשאלות - הצגת כל המוצרים המועדפים
     """
-    # קבלת פריטי Wishlist של המשתמש עם התמונות הנוספות
-    wishlist_items = WishlistItem.objects.filter(user=request.user).select_related('product').prefetch_related('product__images')
-    products = [item.product for item in wishlist_items]
+    if request.user.is_authenticated:
+        # קבלת פריטי Wishlist של המשתמש עם התמונות הנוספות
+        wishlist_items = WishlistItem.objects.filter(user=request.user).select_related('product').prefetch_related('product__images')
+        products = [item.product for item in wishlist_items]
+    else:
+        # אורח - המוצרים מה-cookie, לפי סדר ההוספה (האחרון ראשון)
+        wishlist_items = []
+        guest_ids = get_guest_wishlist(request).product_ids
+        products_by_id = Product.objects.filter(id__in=guest_ids).prefetch_related('images').in_bulk()
+        products = [products_by_id[product_id] for product_id in reversed(guest_ids) if product_id in products_by_id]
     
     # קבלת קטגוריות לניווט
     categories = Category.objects.filter(is_active=True)
@@ -553,7 +528,6 @@ def wishlist_view(request):
     return render(request, 'store/wishlist.html', context)
 
 
-@login_required
 def wishlist_toggle(request, product_id):
     """
     Toggle מוצר ב-Wishlist (הוספה/הסרה) - AJAX
@@ -563,32 +537,19 @@ def wishlist_toggle(request, product_id):
     
     product = get_object_or_404(Product, id=product_id, is_active=True)
     
-    # בדיקה אם המוצר כבר ב-Wishlist
-    wishlist_item = WishlistItem.objects.filter(user=request.user, product=product).first()
-    
-    if wishlist_item:
-        # המוצר כבר קיים - נסיר אותו
-        wishlist_item.delete()
-        wishlist_count = WishlistItem.objects.filter(user=request.user).count()
-        return JsonResponse({
-            'success': True,
-            'action': 'removed',
-            'message': f'המוצר "{product.name}" הוסר מרשימת המשאלות',
-            'wishlist_count': wishlist_count
-        })
-    else:
-        # המוצר לא קיים - נוסיף אותו
-        WishlistItem.objects.create(user=request.user, product=product)
-        wishlist_count = WishlistItem.objects.filter(user=request.user).count()
-        return JsonResponse({
-            'success': True,
-            'action': 'added',
-            'message': f'המוצר "{product.name}" נוסף לרשימת המשאלות',
-            'wishlist_count': wishlist_count
-        })
+    # מחיקה או הוספה בשאילתה אחת (לאורח - ב-cookie); הספירה מתוך הקבוצה השמורה
+    try:
+        added = toggle_wishlist(request, product.id)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({
+        'success': True,
+        'action': 'added' if added else 'removed',
+        'message': f'המוצר "{product.name}" {"נוסף לרשימת המשאלות" if added else "הוסר מרשימת המשאלות"}',
+        'wishlist_count': len(get_wishlist_ids(request))
+    })
 
 
-@login_required
 def wishlist_remove(request, product_id):
     """
     הסרת מוצר מ-Wishlist - AJAX
@@ -599,14 +560,11 @@ def wishlist_remove(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     
     # הסרת המוצר מ-Wishlist
-    deleted_count, _ = WishlistItem.objects.filter(user=request.user, product=product).delete()
-    
-    if deleted_count > 0:
-        wishlist_count = WishlistItem.objects.filter(user=request.user).count()
+    if remove_from_wishlist(request, product.id):
         return JsonResponse({
             'success': True,
             'message': f'המוצר "{product.name}" הוסר מרשימת המשאלות',
-            'wishlist_count': wishlist_count
+            'wishlist_count': len(get_wishlist_ids(request))
         })
     else:
         return JsonResponse({
@@ -615,38 +573,36 @@ def wishlist_remove(request, product_id):
         }, status=404)
 
 
-def get_or_create_cart(request):
+def wishlist_sync(request):
     """
-    פונקציית עזר לקבלת או יצירת עגלת קניות
+    סנכרון רשימת המשאלות - AJAX (גם לאורחים)
+    GET מחזיר את מזהי המוצרים; POST מקבל {"add": [...], "remove": [...]} ומבצע הכל בבת אחת
     """
-    cart = None
-    if request.user.is_authenticated:
-        # משתמש מחובר - חיפוש או יצירת סל לפי משתמש
-        cart, created = Cart.objects.get_or_create(
-            user=request.user,
-            defaults={'session_key': ''}
-        )
-    else:
-        # משתמש לא מחובר - חיפוש או יצירת סל לפי session_key
-        session_key = request.session.session_key
-        if not session_key:
-            request.session.create()
-            session_key = request.session.session_key
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            add = [int(product_id) for product_id in data.get('add', [])]
+            remove = [int(product_id) for product_id in data.get('remove', [])]
+        except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'Invalid payload'}, status=400)
         
         try:
-            cart = Cart.objects.get(session_key=session_key, user__isnull=True)
-        except Cart.DoesNotExist:
-            cart = Cart.objects.create(session_key=session_key, user=None)
+            update_wishlist(request, add=add, remove=remove)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    elif request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
     
-    return cart
+    product_ids = get_wishlist_ids(request)
+    return JsonResponse({'success': True, 'ids': sorted(product_ids), 'wishlist_count': len(product_ids)})
 
 
 def cart_view(request):
     """
     עמוד עגלת הקניות
     """
-    cart = get_or_create_cart(request)
-    cart_items = cart.items.all().select_related('product', 'variant', 'variant__product')
+    cart = get_cart(request)
+    cart_items = cart.items()
     
     # חישוב סיכומים
     subtotal = cart.total_price
@@ -680,8 +636,10 @@ def cart_update_quantity(request, item_id):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
     
-    cart = get_or_create_cart(request)
-    cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
+    cart = get_cart(request)
+    cart_item = cart.get_item(item_id)
+    if cart_item is None:
+        return JsonResponse({'success': False, 'error': 'הפריט לא נמצא בעגלה'}, status=404)
     
     try:
         new_quantity = int(request.POST.get('quantity', 1))
@@ -699,11 +657,10 @@ def cart_update_quantity(request, item_id):
         }, status=400)
     
     # עדכון הכמות
-    cart_item.quantity = new_quantity
-    cart_item.save()
+    cart.set_quantity(item_id, new_quantity)
+    cart_item = cart.get_item(item_id)
     
     # חישוב סיכומים מחדש
-    cart = get_or_create_cart(request)
     subtotal = cart.total_price
     shipping_fee = Decimal('0.00')
     if subtotal > 0 and subtotal < 75:
@@ -727,14 +684,15 @@ def cart_remove_item(request, item_id):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
     
-    cart = get_or_create_cart(request)
-    cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
+    cart = get_cart(request)
+    cart_item = cart.get_item(item_id)
+    if cart_item is None:
+        return JsonResponse({'success': False, 'error': 'הפריט לא נמצא בעגלה'}, status=404)
     
     product_name = cart_item.product.name
-    cart_item.delete()
+    cart.remove(item_id)
     
     # חישוב סיכומים מחדש
-    cart = get_or_create_cart(request)
     subtotal = cart.total_price
     shipping_fee = Decimal('0.00')
     if subtotal > 0 and subtotal < 75:
@@ -755,11 +713,12 @@ def checkout(request):
     """
     עמוד ביצוע הזמנה
     """
-    cart = get_or_create_cart(request)
-    cart_items = cart.items.all().select_related('product', 'variant', 'variant__product')
+    # בצ'קאאוט עגלת האורח עוברת מה-cookie לעגלה במסד הנתונים
+    cart = get_cart(request, materialize=True)
+    cart_items = cart.items()
     
     # בדיקה שהעגלה לא ריקה
-    if not cart_items.exists():
+    if not cart_items:
         messages.warning(request, 'העגלה שלך ריקה')
         return redirect('cart')
     
@@ -769,43 +728,16 @@ def checkout(request):
     if subtotal > 0 and subtotal < 75:
         shipping_fee = Decimal('0.00')
     
-    # בדיקת קופון מהסשן
-    applied_coupon = request.session.get('applied_coupon', None)
-    discount_amount = Decimal('0.00')
-    coupon_code = ''
+    # בדיקת קופון מהסשן - אם העגלה לא השתנתה מאז האימות, בלי שאילתות נוספות
+    # לפני יצירת הזמנה (POST) הקופון תמיד מאומת מחדש
+    had_coupon = 'applied_coupon' in request.session
+    applied_coupon, discount_amount = get_applied_coupon(request, cart, revalidate=request.method == 'POST')
+    coupon_code = applied_coupon['code'] if applied_coupon else ''
     
-    if applied_coupon:
-        coupon_code = applied_coupon.get('code', '')
-        discount_amount = Decimal(str(applied_coupon.get('discount_amount', 0)))
-        
-        # וידוא שהקופון עדיין תקף
-        coupon_type = applied_coupon.get('type', '')
-        is_valid = False
-        
-        if coupon_type == 'general':
-            try:
-                coupon = Coupon.objects.get(code__iexact=coupon_code)
-                if coupon.is_valid() and (coupon.minimum_order_amount == 0 or subtotal >= coupon.minimum_order_amount):
-                    discount_amount = coupon.calculate_discount(subtotal)
-                    is_valid = True
-            except Coupon.DoesNotExist:
-                pass
-        elif coupon_type == 'newsletter':
-            try:
-                newsletter = NewsletterSubscriber.objects.get(coupon_code__iexact=coupon_code)
-                if newsletter.is_active and not newsletter.is_used:
-                    discount_amount = (subtotal * Decimal(newsletter.discount_percent)) / 100
-                    is_valid = True
-            except NewsletterSubscriber.DoesNotExist:
-                pass
-        
-        if not is_valid:
-            # הקופון לא תקף יותר - הסרה מהסשן
-            if 'applied_coupon' in request.session:
-                del request.session['applied_coupon']
-            applied_coupon = None
-            discount_amount = Decimal('0.00')
-            coupon_code = ''
+    if request.method == 'POST' and had_coupon and not applied_coupon:
+        # הקופון הפסיק להיות תקף מאז שהוחל - לא יוצרים הזמנה במחיר שהלקוח לא ראה
+        messages.error(request, 'הקופון שהוחל אינו תקף יותר והוסר מההזמנה')
+        return redirect('checkout')
     
     total = subtotal + shipping_fee - discount_amount
     
@@ -813,7 +745,7 @@ def checkout(request):
         form = CheckoutForm(request.POST)
         if form.is_valid():
             # #region agent log
-            print(f"[DEBUG] checkout: Form valid, cart_items={cart_items.count()}")
+            print(f"[DEBUG] checkout: Form valid, cart_items={len(cart_items)}")
             # #endregion
             # בדיקת מלאי לפני יצירת ההזמנה
             for cart_item in cart_items:
@@ -821,42 +753,52 @@ def checkout(request):
                     messages.error(request, f'המוצר "{cart_item.product.name}" אזל מהמלאי או שהכמות המבוקשת גדולה מהמלאי הזמין')
                     return redirect('cart')
             
-            # יצירת הזמנה
-            full_name = f"{form.cleaned_data['first_name']} {form.cleaned_data['last_name']}"
-            order = Order.objects.create(
-                user=request.user if request.user.is_authenticated else None,
-                guest_name=full_name,
-                guest_phone=form.cleaned_data['guest_phone'],
-                guest_email=form.cleaned_data['guest_email'],
-                guest_address=form.cleaned_data['guest_address'],
-                guest_city=form.cleaned_data['guest_city'],
-                notes=form.cleaned_data['notes'],
-                total_price=total,
-                coupon_code=coupon_code,
-                discount_amount=discount_amount,
-                status='pending'
-            )
-            
-            # יצירת פריטי הזמנה ועדכון מלאי
-            for cart_item in cart_items:
-                item_price = cart_item.variant.effective_price if cart_item.variant else cart_item.product.price
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    variant=cart_item.variant,
-                    quantity=cart_item.quantity,
-                    price=item_price
-                )
-                
-                # עדכון מלאי (בדיקה כפולה לבטיחות)
-                product = cart_item.product
-                product.refresh_from_db()  # רענון מבסיס הנתונים
-                if product.stock_quantity >= cart_item.quantity:
-                    product.stock_quantity -= cart_item.quantity
-                    product.save()
+            try:
+                with transaction.atomic():
+                    # יצירת הזמנה
+                    full_name = f"{form.cleaned_data['first_name']} {form.cleaned_data['last_name']}"
+                    order = Order.objects.create(
+                        user=request.user if request.user.is_authenticated else None,
+                        guest_name=full_name,
+                        guest_phone=form.cleaned_data['guest_phone'],
+                        guest_email=form.cleaned_data['guest_email'],
+                        guest_address=form.cleaned_data['guest_address'],
+                        guest_city=form.cleaned_data['guest_city'],
+                        notes=form.cleaned_data['notes'],
+                        total_price=total,
+                        coupon_code=coupon_code,
+                        discount_amount=discount_amount,
+                        status='pending'
+                    )
+                    
+                    # יצירת פריטי הזמנה ועדכון מלאי
+                    for cart_item in cart_items:
+                        item_price = cart_item.variant.effective_price if cart_item.variant else cart_item.product.price
+                        OrderItem.objects.create(
+                            order=order,
+                            product=cart_item.product,
+                            variant=cart_item.variant,
+                            quantity=cart_item.quantity,
+                            price=item_price
+                        )
+                        
+                        # עדכון מלאי (בדיקה כפולה לבטיחות)
+                        product = cart_item.product
+                        product.refresh_from_db()  # רענון מבסיס הנתונים
+                        if product.stock_quantity >= cart_item.quantity:
+                            product.stock_quantity -= cart_item.quantity
+                            product.save()
+                    
+                    # שמירת שימוש בקופון - UPDATE מותנה, כך שלא ניתן לעבור את מגבלת השימושים
+                    if applied_coupon:
+                        reserve_coupon(order, coupon_code)
+            except CouponUnavailable as e:
+                # ההזמנה לא נוצרה (rollback) - הקופון הוסר והלקוח חוזר לצ'קאאוט
+                forget_coupon(request)
+                messages.error(request, str(e))
+                return redirect('checkout')
             
-            # שמירת מידע הקופון בהזמנה לשימוש מאוחר יותר
-            # עדכון שימוש בקופון יתבצע רק אחרי תשלום מוצלח
+            # הקופון שמור להזמנה - המימוש הסופי יתבצע רק אחרי תשלום מוצלח
             if applied_coupon:
                 # שמירת סוג הקופון בסשן לשימוש אחרי תשלום
                 request.session['pending_coupon'] = applied_coupon
@@ -912,7 +854,7 @@ def apply_coupon(request):
     
     try:
         data = json.loads(request.body)
-        coupon_code = data.get('coupon_code', '').strip().upper()
+        coupon_code = normalize_code(data.get('coupon_code', ''))
     except json.JSONDecodeError:
         return JsonResponse({'success': False, 'message': 'נתונים לא חוקיים'}, status=400)
     
@@ -920,56 +862,20 @@ def apply_coupon(request):
         return JsonResponse({'success': False, 'message': 'נא להזין קוד קופון'})
     
     # קבלת סכום העגלה
-    cart = get_or_create_cart(request)
+    cart = get_cart(request)
     cart_total = cart.total_price
     
     if cart_total <= 0:
         return JsonResponse({'success': False, 'message': 'העגלה ריקה'})
     
-    discount_amount = Decimal('0.00')
-    discount_percent = 0
-    coupon_type = None
+    applied_coupon, error_message = validate_coupon(coupon_code, cart_total)
+    if error_message:
+        return JsonResponse({'success': False, 'message': error_message})
     
-    # בדיקה בקופונים כלליים
-    try:
-        coupon = Coupon.objects.get(code__iexact=coupon_code)
-        if not coupon.is_valid():
-            return JsonResponse({'success': False, 'message': 'הקופון אינו תקף או פג תוקפו'})
-        
-        if coupon.minimum_order_amount > 0 and cart_total < coupon.minimum_order_amount:
-            return JsonResponse({
-                'success': False, 
-                'message': f'סכום מינימום להזמנה עם קופון זה: {coupon.minimum_order_amount}₪'
-            })
-        
-        discount_amount = coupon.calculate_discount(cart_total)
-        if coupon.discount_type == 'percent':
-            discount_percent = int(coupon.discount_value)
-        coupon_type = 'general'
-        
-    except Coupon.DoesNotExist:
-        # בדיקה בקופוני ניוזלטר
-        try:
-            newsletter = NewsletterSubscriber.objects.get(coupon_code__iexact=coupon_code)
-            if not newsletter.is_active:
-                return JsonResponse({'success': False, 'message': 'הקופון אינו פעיל'})
-            if newsletter.is_used:
-                return JsonResponse({'success': False, 'message': 'הקופון כבר נוצל'})
-            
-            discount_percent = newsletter.discount_percent
-            discount_amount = (cart_total * Decimal(discount_percent)) / 100
-            coupon_type = 'newsletter'
-            
-        except NewsletterSubscriber.DoesNotExist:
-            return JsonResponse({'success': False, 'message': 'קוד קופון לא נמצא'})
-    
-    # שמירה בסשן
-    request.session['applied_coupon'] = {
-        'code': coupon_code,
-        'type': coupon_type,
-        'discount_amount': float(discount_amount),
-        'discount_percent': discount_percent,
-    }
+    # שמירה בסשן יחד עם טביעת האצבע של העגלה
+    applied_coupon = remember_coupon(request, cart, applied_coupon)
+    discount_amount = Decimal(str(applied_coupon['discount_amount']))
+    discount_percent = applied_coupon['discount_percent']
     
     new_total = cart_total - discount_amount
     
@@ -991,10 +897,9 @@ def remove_coupon(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'message': 'שיטה לא חוקית'}, status=405)
     
-    if 'applied_coupon' in request.session:
-        del request.session['applied_coupon']
+    forget_coupon(request)
     
-    cart = get_or_create_cart(request)
+    cart = get_cart(request)
     cart_total = cart.total_price
     
     return JsonResponse({
@@ -1004,12 +909,33 @@ def remove_coupon(request):
     })
 
 
+def _serialize_cart_item(item):
+    """נתוני פריט בעגלה עבור ה-API"""
+    variant_display = ''
+    if item.variant:
+        variant_display = item.variant.get_display_name()
+    
+    return {
+        'id': item.id,
+        'product_id': item.product.id,
+        'product_name': item.product.name,
+        'product_subtitle': item.product.subtitle or '',
+        'product_image': item.product.image.url if item.product.image else '',
+        'product_price': float(item.product.price),
+        'product_size': item.product.size or '',
+        'variant_display': variant_display,
+        'quantity': item.quantity,
+        'max_quantity': item.product.stock_quantity,
+        'subtotal': float(item.subtotal),
+    }
+
+
 def cart_data(request):
     """
     API endpoint להחזרת נתוני העגלה בפורמט JSON
     """
-    cart = get_or_create_cart(request)
-    cart_items = cart.items.all().select_related('product', 'variant', 'variant__product')
+    cart = get_cart(request)
+    cart_items = cart.items()
     
     # חישוב סיכומים
     subtotal = cart.total_price
@@ -1022,25 +948,7 @@ def cart_data(request):
     total = subtotal + shipping_fee
     
     # הכנת נתוני הפריטים
-    items_data = []
-    for item in cart_items:
-        variant_display = ''
-        if item.variant:
-            variant_display = item.variant.get_display_name()
-        
-        items_data.append({
-            'id': item.id,
-            'product_id': item.product.id,
-            'product_name': item.product.name,
-            'product_subtitle': item.product.subtitle or '',
-            'product_image': item.product.image.url if item.product.image else '',
-            'product_price': float(item.product.price),
-            'product_size': item.product.size or '',
-            'variant_display': variant_display,
-            'quantity': item.quantity,
-            'max_quantity': item.product.stock_quantity,
-            'subtotal': float(item.subtotal),
-        })
+    items_data = [_serialize_cart_item(item) for item in cart_items]
     
     return JsonResponse({
         'success': True,
@@ -1054,6 +962,98 @@ def cart_data(request):
     })
 
 
+def cart_mutate(request):
+    """
+    API endpoint לשינוי העגלה - כמה פעולות בבקשה אחת, בטרנזקציה אחת
+    
+    גוף הבקשה (JSON):
+        {"ops": [{"op": "add", "product_id": 1, "variant_id": 2, "quantity": 1},
+                 {"op": "set", "item_id": 5, "quantity": 3},
+                 {"op": "remove", "item_id": 6},
+                 {"op": "coupon", "code": "SALE10"}]}
+    
+    מחזיר רק את הפריטים שהשתנו ואת הסיכומים החדשים.
+    קופון נבדק מול סכום העגלה אחרי כל שאר הפעולות.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        operations = data.get('ops', [])
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'נתונים לא חוקיים'}, status=400)
+    
+    if not isinstance(operations, list) or not operations:
+        return JsonResponse({'success': False, 'error': 'לא נשלחו פעולות'}, status=400)
+    
+    # פעולות הפריטים עם המיקום שלהן ב-ops (op_index בשגיאה מתייחס לרשימה של הלקוח),
+    # ופעולת הקופון האחרונה ומיקומה
+    item_ops, item_indexes = [], []
+    coupon_op = coupon_index = None
+    for index, operation in enumerate(operations):
+        if isinstance(operation, dict) and operation.get('op') == 'coupon':
+            coupon_op, coupon_index = operation, index
+        else:
+            item_ops.append(operation)
+            item_indexes.append(index)
+    
+    cart = get_cart(request)
+    state = cart.snapshot()
+    try:
+        with transaction.atomic():
+            try:
+                delta = apply_cart_operations(cart, item_ops)
+            except CartOperationError as e:
+                if e.index is not None:
+                    e.index = item_indexes[e.index]
+                raise
+            
+            applied_coupon = None
+            if coupon_op is not None:
+                coupon_code = normalize_code(str(coupon_op.get('code', '')))
+                if not coupon_code:
+                    raise CartOperationError('נא להזין קוד קופון', coupon_index)
+                if cart.total_price <= 0:
+                    raise CartOperationError('העגלה ריקה', coupon_index)
+                applied_coupon, error_message = validate_coupon(coupon_code, cart.total_price)
+                if error_message:
+                    raise CartOperationError(error_message, coupon_index)
+    except CartOperationError as e:
+        cart.restore(state)
+        return JsonResponse({'success': False, 'error': e.message, 'op_index': e.index}, status=400)
+    
+    if applied_coupon:
+        applied_coupon = remember_coupon(request, cart, applied_coupon)
+    
+    subtotal = cart.total_price
+    shipping_fee = Decimal('0.00')
+    if subtotal > 0 and subtotal < 75:
+        shipping_fee = Decimal('0.00')
+    total = subtotal + shipping_fee
+    
+    response = {
+        'success': True,
+        'added': [_serialize_cart_item(item) for item in delta['added']],
+        'updated': [
+            {'id': item.id, 'quantity': item.quantity, 'subtotal': float(item.subtotal)}
+            for item in delta['updated']
+        ],
+        'removed': delta['removed'],
+        'subtotal': float(subtotal),
+        'shipping_fee': float(shipping_fee),
+        'total': float(total),
+        'total_items': cart.total_items,
+        'free_shipping_threshold': 75,
+        'remaining_for_free_shipping': float(max(0, 75 - subtotal)),
+    }
+    if applied_coupon:
+        response['coupon'] = applied_coupon
+    return JsonResponse(response)
+
+
+@cache_control(**VARIANTS_CACHE_CONTROL)
+@condition(etag_func=product_variants_etag, last_modified_func=product_variants_last_modified)
 def product_variants_api(request, product_id):
     """
     API endpoint לקבלת נתוני וריאנטים של מוצר
@@ -1145,11 +1145,7 @@ def search(request):
         ).prefetch_related('images').distinct()
     
     # קבלת מוצרים ב-wishlist של המשתמש (אם מחובר)
-    wishlist_product_ids = []
-    if request.user.is_authenticated:
-        wishlist_product_ids = list(
-            WishlistItem.objects.filter(user=request.user).values_list('product_id', flat=True)
-        )
+    wishlist_product_ids = get_wishlist_ids(request)
     
     # קבלת קטגוריות לניווט
     categories = Category.objects.filter(is_active=True)
@@ -1165,6 +1161,8 @@ def search(request):
     return render(request, 'store/search_results.html', context)
 
 
+@cache_control(**SEARCH_CACHE_CONTROL)
+@condition(etag_func=search_etag, last_modified_func=search_last_modified)
 def search_api(request):
     """
     API לחיפוש חי - מחזיר JSON עם תוצאות
@@ -1210,6 +1208,8 @@ def blog_list(request):
     return render(request, 'store/blog_list.html', context)
 
 
+@cache_control(**PAGE_CACHE_CONTROL)
+@condition(etag_func=blog_detail_etag)
 def blog_detail(request, slug):
     """
     דף פוסט בודד בבלוג
@@ -1232,15 +1232,12 @@ def generate_coupon_code():
     """
     יצירת קוד קופון ייחודי בפורמט ARYE-XXXXX
     """
-    while True:
-        code = 'ARYE-' + ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))
-        if not NewsletterSubscriber.objects.filter(coupon_code=code).exists():
-            return code
+    return generate_unique_codes(1, prefix='ARYE-', length=5)[0]
 
 
-def newsletter_subscribe(request):
+async def newsletter_subscribe(request):
     """
-    הרשמה לניוזלטר - יוצר קוד קופון ייחודי ושולח למייל
+    הרשמה לניוזלטר - יוצר קוד קופון ייחודי ושולח למייל (אסינכרוני)
     """
     if request.method != 'POST':
         return JsonResponse({'success': False, 'message': 'שיטת בקשה לא חוקית'}, status=405)
@@ -1255,7 +1252,7 @@ def newsletter_subscribe(request):
         return JsonResponse({'success': False, 'message': 'נא להזין כתובת אימייל'})
     
     # בדיקה אם המייל כבר רשום
-    existing = NewsletterSubscriber.objects.filter(email=email).first()
+    existing = await NewsletterSubscriber.objects.filter(email=email).afirst()
     if existing:
         return JsonResponse({
             'success': False, 
@@ -1264,11 +1261,11 @@ def newsletter_subscribe(request):
         })
     
     # יצירת קוד קופון ייחודי וטוקן לביטול הרשמה
-    coupon_code = generate_coupon_code()
+    coupon_code = await sync_to_async(generate_coupon_code)()
     unsubscribe_token = ''.join(random.choices(string.ascii_letters + string.digits, k=32))
     
     # שמירה במסד הנתונים
-    subscriber = NewsletterSubscriber.objects.create(
+    subscriber = await NewsletterSubscriber.objects.acreate(
         email=email,
         coupon_code=coupon_code,
         discount_percent=10,
@@ -1277,44 +1274,7 @@ def newsletter_subscribe(request):
     
     # שליחת מייל עם קוד הקופון
     try:
-        resend.api_key = settings.RESEND_API_KEY
-        
-        html_content = f'''
-        <div dir="rtl" style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <div style="text-align: center; margin-bottom: 30px;">
-                <h1 style="color: #333; margin-bottom: 10px;">ברוכים הבאים למשפחת Arye Boutique! 🎉</h1>
-            </div>
-            
-            <p style="font-size: 16px; color: #555; line-height: 1.8;">
-                תודה שהצטרפת לניוזלטר שלנו! אנחנו שמחים שבחרת להיות חלק מהמשפחה.
-            </p>
-            
-            <div style="background: linear-gradient(135deg, #7594b1, #5a7a99); color: white; padding: 30px; border-radius: 12px; text-align: center; margin: 30px 0;">
-                <p style="font-size: 14px; margin-bottom: 10px;">קוד ההנחה האישי שלך:</p>
-                <h2 style="font-size: 32px; letter-spacing: 3px; margin: 10px 0;">{coupon_code}</h2>
-                <p style="font-size: 18px; margin-top: 10px;">10% הנחה על הרכישה הראשונה!</p>
-            </div>
-            
-            <p style="font-size: 14px; color: #555; text-align: center;">
-                הזינו את הקוד בעגלת הקניות כדי לקבל את ההנחה. הקופון תקף לשימוש חד פעמי.
-            </p>
-            
-            <p style="font-size: 14px; color: #555; text-align: center; margin-top: 25px;">
-                נשמח לראות אותך באתר שלנו: <a href="https://arye-boutique.co.il" style="color: #7594b1;">www.arye-boutique.co.il</a>
-            </p>
-            
-            <p style="font-size: 13px; color: #555; text-align: center; margin-top: 30px;">
-                קיבלת מייל זה כי נרשמת לניוזלטר. לביטול ההרשמה <a href="https://arye-boutique.co.il/newsletter/unsubscribe/{unsubscribe_token}" style="color: #7594b1;">לחצו כאן</a>.
-            </p>
-        </div>
-        '''
-        
-        resend.Emails.send({
-            "from": settings.DEFAULT_FROM_EMAIL,
-            "to": [email],
-            "subject": "ברוכים הבאים! קוד הנחה 10% מחכה לך 🎁",
-            "html": html_content,
-        })
+        await asend_email(newsletter_welcome_message(subscriber))
     except Exception as e:
         # אם יש בעיה במייל, ההרשמה עדיין נשמרת בDB
         print(f'Error sending newsletter email: {e}')
@@ -1378,13 +1338,20 @@ def newsletter_unsubscribe(request, token):
 # Payment Views - iCredit Integration
 # ============================================
 
-def initiate_payment(request, order_id):
+def _remember_pending_order(request, order):
+    """שמירת פרטי ההזמנה בסשן לשימוש אחרי חזרה מהתשלום"""
+    request.session['pending_order_id'] = order.id
+    request.session['pending_order_total'] = float(order.total_price)
+
+
+async def initiate_payment(request, order_id):
     """
     יצירת בקשת תשלום ל-iCredit והפניית הלקוח לדף התשלום
     משתמש ב-API ליצירת דף תשלום ייחודי (גם בטסט וגם בפרודקשן)
+    אסינכרוני - ההמתנה ל-iCredit לא חוסמת worker
     """
     print(f"[DEBUG] initiate_payment: Called with order_id={order_id}")
-    order = get_object_or_404(Order, id=order_id)
+    order = await aget_object_or_404(Order, id=order_id)
     
     # בדיקה שההזמנה עדיין ממתינה לתשלום
     if order.status != 'pending':
@@ -1396,15 +1363,14 @@ def initiate_payment(request, order_id):
     
     # שמירת מזהה העסקה בהזמנה
     order.payment_reference = sale_id
-    order.save()
+    await order.asave()
     
-    # שמירת פרטי ההזמנה בסשן לשימוש אחרי חזרה מהתשלום
-    request.session['pending_order_id'] = order.id
-    request.session['pending_order_total'] = float(order.total_price)
+    # שמירת פרטי ההזמנה בסשן לשימוש אחרי חזרה מהתשלום (הסשן נטען מהמסד - סינכרוני)
+    await sync_to_async(_remember_pending_order)(request, order)
     
     # יצירת רשימת פריטים להזמנה - בפורמט שעובד עם iCredit
     items = []
-    for item in order.items.all():
+    async for item in order.items.select_related('product'):
         items.append({
             "UnitPrice": float(item.price),
             "Quantity": int(item.quantity),  # Must be integer, not float
@@ -1454,17 +1420,16 @@ def initiate_payment(request, order_id):
         print(f"[DEBUG] initiate_payment: Payload: {json.dumps(payload, ensure_ascii=False)}")
         
         # Send request exactly like Postman does
-        response = requests.post(
-            api_url,
-            data=json.dumps(payload),  # Use data instead of json for exact control
-            headers={
-                'Content-Type': 'application/json',
-                'User-Agent': 'PostmanRuntime/7.32.0',
-                'Accept': '*/*'
-            },
-            timeout=30,
-            allow_redirects=False
-        )
+        async with async_client() as client:
+            response = await client.post(
+                api_url,
+                content=json.dumps(payload),  # Use raw content instead of json for exact control
+                headers={
+                    'Content-Type': 'application/json',
+                    'User-Agent': 'PostmanRuntime/7.32.0',
+                    'Accept': '*/*'
+                },
+            )
         
         print(f"[DEBUG] initiate_payment: HTTP status = {response.status_code}")
         print(f"[DEBUG] initiate_payment: Headers = {dict(response.headers)}")
@@ -1501,6 +1466,33 @@ def initiate_payment(request, order_id):
         return redirect('checkout')
 
 
+def mark_order_paid(order):
+    """
+    סימון הזמנה כשולמה - UPDATE מותנה על הסטטוס
+    
+    Returns:
+        bool: True רק עבור הקריאה שביצעה את המעבר בפועל
+    """
+    updated = Order.objects.filter(pk=order.pk, status='pending').update(
+        status='paid', paid_at=timezone.now(), updated_at=timezone.now()
+    )
+    if updated:
+        order.refresh_from_db()
+    return bool(updated)
+
+
+async def amark_order_paid(order):
+    """
+    סימון הזמנה כשולמה - גרסה אסינכרונית של mark_order_paid
+    """
+    updated = await Order.objects.filter(pk=order.pk, status='pending').aupdate(
+        status='paid', paid_at=timezone.now(), updated_at=timezone.now()
+    )
+    if updated:
+        await order.arefresh_from_db()
+    return bool(updated)
+
+
 def payment_success(request):
     """
     דף הצלחת תשלום - הלקוח מגיע לכאן אחרי תשלום מוצלח
@@ -1530,24 +1522,10 @@ def payment_success(request):
     if order:
         # אם ה-IPN עדיין לא הגיע, נעדכן את הסטטוס כאן
         # (יכול לקרות אם הלקוח חזר לפני שה-IPN עובד)
-        if order.status == 'pending':
-            order.status = 'paid'
-            order.save()
-            
-            # עדכון שימוש בקופון
-            if order.coupon_code:
-                try:
-                    coupon = Coupon.objects.filter(code__iexact=order.coupon_code).first()
-                    if coupon:
-                        coupon.times_used += 1
-                        coupon.save()
-                    else:
-                        newsletter = NewsletterSubscriber.objects.filter(coupon_code__iexact=order.coupon_code).first()
-                        if newsletter:
-                            newsletter.is_used = True
-                            newsletter.save()
-                except Exception:
-                    pass
+        # עדכון מותנה - רק אחד מבין דף ההצלחה וה-IPN מבצע את המעבר לשולם
+        if mark_order_paid(order):
+            # מימוש הקופון השמור
+            redeem_coupon(order)
             
             # שליחת מייל אישור
             try:
@@ -1556,12 +1534,10 @@ def payment_success(request):
                 pass
         
         # ניקוי העגלה
-        cart = get_or_create_cart(request)
-        cart.items.all().delete()
+        get_cart(request).clear()
         
         # ניקוי הסשן
-        if 'applied_coupon' in request.session:
-            del request.session['applied_coupon']
+        forget_coupon(request)
         if 'pending_coupon' in request.session:
             del request.session['pending_coupon']
         if 'pending_order_id' in request.session:
@@ -1581,6 +1557,14 @@ def payment_failure(request):
     error_message = request.GET.get('ErrorMessage', '')
     order_id = request.GET.get('Custom1')
     
+    # שחרור הקופון שנשמר להזמנה שלא שולמה - רק להזמנה של הסשן הזה: Custom1 מגיע ב-URL
+    # וכל אחד יכול לשנות אותו. ה-IPN מטפל רק בתשלומים שהצליחו, כך שכל שמירה אחרת
+    # משתחררת רק כשזמנה פג (release_coupon_reservations).
+    if order_id and str(request.session.get('pending_order_id')) == order_id:
+        order = Order.objects.filter(id=order_id, status='pending').first()
+        if order:
+            release_coupon(order)
+    
     context = {
         'error_message': error_message,
         'order_id': order_id,
@@ -1590,10 +1574,10 @@ def payment_failure(request):
 
 
 @csrf_exempt
-def payment_notify(request):
+async def payment_notify(request):
     """
     IPN (Instant Payment Notification) - Webhook מ-iCredit
-    מקבל אישור תשלום מהשרת ומעדכן את סטטוס ההזמנה
+    מקבל אישור תשלום מהשרת ומעדכן את סטטוס ההזמנה (אסינכרוני)
     """
     if request.method == 'POST':
         try:
@@ -1610,40 +1594,22 @@ def payment_notify(request):
                 
                 if order_id:
                     try:
-                        order = Order.objects.get(id=order_id)
+                        order = await Order.objects.aget(id=order_id)
                     except Order.DoesNotExist:
                         pass
                 elif sale_id:
                     try:
-                        order = Order.objects.get(payment_reference=sale_id)
+                        order = await Order.objects.aget(payment_reference=sale_id)
                     except Order.DoesNotExist:
                         pass
                 
-                if order and order.status == 'pending':
-                    # עדכון סטטוס ההזמנה לשולם
-                    order.status = 'paid'
-                    order.save()
-                    
-                    # עדכון שימוש בקופון
-                    if order.coupon_code:
-                        try:
-                            # ניסיון למצוא קופון רגיל
-                            coupon = Coupon.objects.filter(code__iexact=order.coupon_code).first()
-                            if coupon:
-                                coupon.times_used += 1
-                                coupon.save()
-                            else:
-                                # ניסיון למצוא קופון ניוזלטר
-                                newsletter = NewsletterSubscriber.objects.filter(coupon_code__iexact=order.coupon_code).first()
-                                if newsletter:
-                                    newsletter.is_used = True
-                                    newsletter.save()
-                        except Exception:
-                            pass
+                if order and await amark_order_paid(order):
+                    # מימוש הקופון השמור (בטוח גם אם דף ההצלחה כבר מימש)
+                    await sync_to_async(redeem_coupon)(order)
                     
                     # שליחת מייל אישור הזמנה ללקוח
                     try:
-                        send_order_confirmation_email(order)
+                        await asend_order_confirmation_email(order)
                     except Exception as e:
                         # לא נכשיל את ה-IPN בגלל שגיאת מייל
                         pass
@@ -1660,75 +1626,3 @@ def payment_notify(request):
     return JsonResponse({'status': 'error', 'message': 'Method not allowed'}, status=405)
 
 
-def send_order_confirmation_email(order):
-    """
-    שליחת מייל אישור הזמנה ללקוח
-    """
-    if not settings.RESEND_API_KEY:
-        return
-    
-    resend.api_key = settings.RESEND_API_KEY
-    
-    # בניית רשימת הפריטים
-    items_html = ""
-    for item in order.items.all():
-        items_html += f"""
-        <tr>
-            <td style="padding: 10px; border-bottom: 1px solid #eee;">{item.product.name}</td>
-            <td style="padding: 10px; border-bottom: 1px solid #eee; text-align: center;">{item.quantity}</td>
-            <td style="padding: 10px; border-bottom: 1px solid #eee; text-align: left;">{item.price} ₪</td>
-        </tr>
-        """
-    
-    html_content = f"""
-    <div dir="rtl" style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-        <div style="background-color: #7594b1; padding: 20px; text-align: center;">
-            <h1 style="color: white; margin: 0;">Arye Boutique</h1>
-        </div>
-        
-        <div style="padding: 30px; background-color: #f9f9f9;">
-            <h2 style="color: #333;">תודה על ההזמנה! 🎉</h2>
-            
-            <p style="color: #555;">שלום {order.guest_name},</p>
-            <p style="color: #555;">ההזמנה שלך התקבלה בהצלחה ואנחנו מתחילים לטפל בה.</p>
-            
-            <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                <h3 style="color: #7594b1; margin-top: 0;">פרטי הזמנה #{order.id}</h3>
-                
-                <table style="width: 100%; border-collapse: collapse;">
-                    <tr style="background: #f5f5f5;">
-                        <th style="padding: 10px; text-align: right;">מוצר</th>
-                        <th style="padding: 10px; text-align: center;">כמות</th>
-                        <th style="padding: 10px; text-align: left;">מחיר</th>
-                    </tr>
-                    {items_html}
-                </table>
-                
-                <div style="margin-top: 15px; padding-top: 15px; border-top: 2px solid #7594b1;">
-                    <p style="margin: 5px 0;"><strong>סה״כ לתשלום:</strong> {order.total_price} ₪</p>
-                </div>
-            </div>
-            
-            <div style="background: white; padding: 20px; border-radius: 8px;">
-                <h3 style="color: #7594b1; margin-top: 0;">כתובת למשלוח</h3>
-                <p style="margin: 5px 0;">{order.guest_name}</p>
-                <p style="margin: 5px 0;">{order.guest_address}</p>
-                <p style="margin: 5px 0;">{order.guest_city}</p>
-                <p style="margin: 5px 0;">טלפון: {order.guest_phone}</p>
-            </div>
-            
-            <p style="color: #555; margin-top: 20px;">נעדכן אותך כשההזמנה תישלח!</p>
-        </div>
-        
-        <div style="background-color: #333; padding: 20px; text-align: center;">
-            <p style="color: #999; margin: 0; font-size: 12px;">Arye Boutique | בוטיק לתינוקות</p>
-        </div>
-    </div>
-    """
-    
-    resend.Emails.send({
-        "from": settings.DEFAULT_FROM_EMAIL,
-        "to": [order.guest_email],
-        "subject": f"אישור הזמנה #{order.id} - Arye Boutique",
-        "html": html_content
-    })
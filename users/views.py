@@ -5,9 +5,19 @@ from django.contrib import messages
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth.views import PasswordResetView, PasswordResetConfirmView
 from django.urls import reverse_lazy
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from datetime import datetime, timedelta, timezone as dt_timezone
 from .forms import RegisterForm, LoginForm, PasswordResetRequestForm, CustomSetPasswordForm, ProfileEditForm
 from store.models import Order
 
+# מספר ההזמנות בכל עמוד בהיסטוריית ההזמנות
+ORDER_HISTORY_PAGE_SIZE = 10
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
 
 def register_view(request):
     """
@@ -163,12 +173,73 @@ def profile_view(request):
     else:
         form = ProfileEditForm(instance=request.user, user=request.user)
     
-    # שליפת כל ההזמנות של המשתמש עם הפריטים
-    orders = Order.objects.filter(user=request.user).prefetch_related('items__product').order_by('-created_at')
+    orders, next_cursor = _order_history_page(request.user, request.GET.get('before'))
     
     context = {
         'form': form,
         'orders': orders,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('before'),
     }
     
     return render(request, 'users/profile.html', context)
+
+
+def _encode_cursor(order):
+    """סמן לעמוד הבא: זמן יצירה (במיקרו-שניות) ומזהה ההזמנה האחרונה בעמוד"""
+    delta = order.created_at - _EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return f'{micros}-{order.id}'
+
+
+def _decode_cursor(value):
+    """פענוח סמן - None אם הסמן לא תקין"""
+    try:
+        micros, order_id = value.split('-')
+        return _EPOCH + timedelta(microseconds=int(micros)), int(order_id)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def _order_history_page(user, cursor=None):
+    """
+    עמוד אחד מהיסטוריית ההזמנות - דפדוף keyset על (created_at, id)
+    מספר הפריטים מחושב ב-SQL (הסכום שמור בהזמנה); הפריטים עצמם נטענים רק בפתיחת ההזמנה
+    
+    Returns:
+        tuple: (הזמנות העמוד, סמן לעמוד הבא או None)
+    """
+    orders = Order.objects.filter(user=user).annotate(
+        items_count=Coalesce(Sum('items__quantity'), 0),
+    ).order_by('-created_at', '-id')
+    
+    position = _decode_cursor(cursor) if cursor else None
+    if position:
+        created_at, order_id = position
+        orders = orders.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=order_id))
+    
+    page = list(orders[:ORDER_HISTORY_PAGE_SIZE + 1])
+    if len(page) > ORDER_HISTORY_PAGE_SIZE:
+        page = page[:ORDER_HISTORY_PAGE_SIZE]
+        return page, _encode_cursor(page[-1])
+    return page, None
+
+
+@login_required
+def order_items_api(request, order_id):
+    """
+    פריטי הזמנה של המשתמש המחובר (JSON) - נטען רק כשפותחים את ההזמנה
+    """
+    order = get_object_or_404(Order, pk=order_id, user=request.user)
+    items = [
+        {
+            'name': item.product.name,
+            'variant': item.variant.get_display_name() if item.variant else '',
+            'image': item.product.image.url if item.product.image else '',
+            'quantity': item.quantity,
+            'price': str(item.price),
+            'subtotal': str(item.subtotal),
+        }
+        for item in order.items.select_related('product', 'variant__size', 'variant__fabric_type')
+    ]
+    return JsonResponse({'order_id': order.id, 'items': items})